@@ -44,15 +44,23 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    # before staticfiles so its collectstatic (which runs the static build) wins
     'cyberapp',
-    'rest_framework',
+    'django.contrib.staticfiles',
     'django_daraja',
 ]
+# Django REST framework is not used: it added ~130 ms to every cold start
+# (its template tags pull in psycopg and yaml). Install djangorestframework
+# and add 'rest_framework' above when an API needs it.
 
 MIDDLEWARE = [
+    # first, so its total covers every other middleware
+    'cyberapp.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'cyberapp.middleware.CompressionMiddleware',
+    # outside the session and auth middleware so their writes pin too
+    'cyberapp.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -86,14 +94,40 @@ WSGI_APPLICATION = 'cyber.wsgi.application'
 
 # DATABASES
 
+# SQLite fallback tuning, applied to every new connection by cyberapp.db;
+# set SQLITE_TUNING=False for stock SQLite behaviour
+SQLITE_TUNING = os.getenv('SQLITE_TUNING', 'True') == 'True'
+SQLITE_PRAGMAS = {
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    # readers no longer block the writer, nor the writer the readers
+    'journal_mode': 'wal',
+    # WAL stays consistent on power loss; only the last commits may roll back
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # negative means KiB: 64 MiB of page cache per connection
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+
+# DATABASE_POOL=True shares a psycopg connection pool between the threads
+# of each worker instead of holding one persistent connection per thread;
+# keep workers x DATABASE_POOL_MAX_SIZE under the server's connection limit
+DATABASE_POOL = os.getenv('DATABASE_POOL', 'False') == 'True'
 
 DATABASES = {
     'default': dj_database_url.parse(
-        os.getenv('DATABASE_URL'), conn_max_age=600, conn_health_checks=True, ssl_require=True
+        os.getenv('DATABASE_URL'),
+        # pooled connections go back to the pool at the end of each request
+        conn_max_age=0 if DATABASE_POOL else 600,
+        conn_health_checks=not DATABASE_POOL,
+        ssl_require=True,
     ) if os.getenv('DATABASE_URL')
     else {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # take the write lock at BEGIN, so a read-then-write transaction
+        # waits its turn instead of failing with "database is locked"
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'} if SQLITE_TUNING else {},
     }
 }
 
@@ -102,6 +136,31 @@ if os.getenv('DATABASE_URL'):
     DATABASES['default']['OPTIONS'] = {
         'sslmode': 'prefer'if DEBUG else 'require', #allow non-ssl connections locally
     }
+    if DATABASE_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', '10')),
+            # seconds a request waits for a free connection before failing
+            'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+        }
+
+# Optional read replica for dashboards, lists and reports; any URL works,
+# e.g. sqlite:////tmp/replica.sqlite3 next to the default SQLite file
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL:
+    replica = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DATABASES['default'].get('CONN_MAX_AGE', 0),
+        conn_health_checks=DATABASES['default'].get('CONN_HEALTH_CHECKS', False),
+    )
+    if replica['ENGINE'] == DATABASES['default']['ENGINE']:
+        replica['OPTIONS'] = dict(DATABASES['default'].get('OPTIONS', {}))
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES['replica'] = replica
+
+DATABASE_ROUTERS = ['cyberapp.routers.ReplicaRouter']
+# seconds a client reads from the primary after writing; longer than replica lag
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '10'))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -141,12 +200,55 @@ TIME_ZONE = 'Africa/Nairobi'
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# STATICFILES_STORAGE was removed in Django 5.1; only STORAGES is honoured.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
 
 STATICFILES_DIRS = [
     BASE_DIR / "cyberapp"/"static",
 ]
 
+# Derived assets (image variants, bundles, critical CSS) written by `collectstatic`'s build
+# step and served from here by BuildOutputFinder. Not committed.
+STATIC_BUILD_DIR = BASE_DIR / "build" / "static"
+
+# Serve the minified bundles and inline per-page critical CSS built by
+# collectstatic. Off under DEBUG so edits to the sources show up immediately.
+STATIC_BUNDLES = os.getenv('STATIC_BUNDLES', str(not DEBUG)) == 'True'
+
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'cyberapp.staticbuild.BuildOutputFinder',
+]
+
+# Dynamic response compression (cyberapp.middleware.CompressionMiddleware).
+# Static files are precompressed by WhiteNoise instead.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '512'))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+
+# Per-request Server-Timing header and budget logging
+# (cyberapp.middleware.ServerTimingMiddleware). Off, at no cost, unless
+# enabled; the header tells clients about internals, so enable it in
+# production only while investigating.
+SERVER_TIMING = os.getenv('SERVER_TIMING', str(DEBUG)) == 'True'
+# log requests exceeding any of these; times in ms, None disables a budget
+SERVER_TIMING_BUDGETS = {
+    'total': int(os.getenv('SERVER_TIMING_BUDGET_MS', '500')),
+    'db': int(os.getenv('SERVER_TIMING_DB_BUDGET_MS', '200')),
+    'queries': int(os.getenv('SERVER_TIMING_QUERY_BUDGET', '30')),
+    'tpl': None,
+    'http': None,
+}
+if SERVER_TIMING:
+    TEMPLATES[0]['BACKEND'] = 'cyberapp.timing.TimedDjangoTemplates'
+
+# Hard ceiling for the student typeahead query; slower searches return no results.
+STUDENT_SEARCH_BUDGET_MS = int(os.getenv('STUDENT_SEARCH_BUDGET_MS', '150'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -179,4 +281,9 @@ MPESA_SHORTCODE_TYPE = os.getenv('MPESA_SHORTCODE_TYPE', '4')  # '1' for Paybill
 MPESA_PASSKEY = os.getenv('MPESA_PASSKEY', 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919')
 MPESA_CALLBACK_URL = os.getenv('MPESA_CALLBACK_URL', 'https://cybercafe-0k4y.onrender.com/callback/')
 MPESA_STK_TIMEOUT = timedelta(minutes=5)
+# Route the STK push/status and callback URLs to the async views. Only worth it
+# under an ASGI server: gunicorn cyber.asgi:application -k uvicorn_worker.UvicornWorker
+MPESA_ASYNC = os.getenv('MPESA_ASYNC', 'False') == 'True'
+# Override the Daraja host picked from MPESA_ENVIRONMENT (async client, STK status, benchmarks).
+MPESA_API_BASE_URL = os.getenv('MPESA_API_BASE_URL', '')
 
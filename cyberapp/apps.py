@@ -1,6 +1,38 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+def _install_search_index(sender, using, **kwargs):
+    from .search import install_search_index
+
+    install_search_index(using=using)
+
+
+# models whose writes change what the dashboard pages show
+VERSIONED_MODELS = ("Student", "Payment", "UsageSession", "MpesaCallback")
 
 
 class CyberappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cyberapp'
+
+    def ready(self):
+        post_migrate.connect(_install_search_index, sender=self)
+
+        from . import metrics
+        from .db import pool_metrics, tune_sqlite
+        from .timing import install_query_timer
+
+        connection_created.connect(tune_sqlite, dispatch_uid="tune_sqlite")
+        metrics.register_gauges(pool_metrics)
+        if settings.SERVER_TIMING:
+            connection_created.connect(install_query_timer, dispatch_uid="server_timing_queries")
+
+        from .versioning import bump_data_version
+
+        for name in VERSIONED_MODELS:
+            model = self.get_model(name)
+            post_save.connect(bump_data_version, sender=model, dispatch_uid=f"data_version_save_{name}")
+            post_delete.connect(bump_data_version, sender=model, dispatch_uid=f"data_version_delete_{name}")
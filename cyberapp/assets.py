@@ -0,0 +1,228 @@
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.contrib.staticfiles import finders
+
+
+BUNDLE_INDEX = "bundles/index.json"
+# bundle name -> sources, concatenated in order into bundles/<name>.js; each
+# page loads one bundle so scripts keep running only where they did before
+JS_BUNDLES = {
+    "dashboard": ("js/alerts.js", "js/scripts.js", "js/student_search.js"),
+    "sessions": ("js/alerts.js", "js/scripts.js"),
+    "alerts": ("js/alerts.js",),
+    "student_search": ("js/student_search.js",),
+    "fragments": ("js/fragments.js",),
+}
+STYLESHEET = "styles/styles.css"
+# minified copy; same depth as styles/ so relative url()s keep resolving
+STYLESHEET_BUNDLE = "bundles/styles.css"
+CRITICAL_DIR = "critical"
+
+def _skip_braces(source, index):
+    depth = 1
+    while index < len(source):
+        char = source[index]
+        if char in "\"'`":
+            index = _skip_string(source, index)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if not depth:
+                return index + 1
+        index += 1
+    return index
+
+
+def _skip_string(source, index):
+    quote = source[index]
+    index += 1
+    while index < len(source):
+        char = source[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == quote:
+            return index + 1
+        if quote == "`" and source.startswith("${", index):
+            index = _skip_braces(source, index + 2)
+            continue
+        index += 1
+    return index
+
+
+def minify_js(source):
+    """Minify with rjsmin, imported here so serving pages never loads it."""
+    from rjsmin import jsmin
+
+    return jsmin(source).strip() + "\n"
+
+
+def minify_css(source):
+    """Minify with rcssmin, imported here so serving pages never loads it."""
+    from rcssmin import cssmin
+
+    return cssmin(source).strip() + "\n"
+
+
+def _parse_rules(css):
+    """
+    ``[(prelude, body)]`` for minified CSS; ``body`` is the declaration text,
+    or a nested list for block at-rules such as ``@media``.
+    """
+    rules, index, start = [], 0, 0
+    while index < len(css):
+        char = css[index]
+        if char in "\"'":
+            index = _skip_string(css, index)
+            continue
+        if char == ";" and css[start] == "@":
+            # statement at-rule (@charset, @import)
+            rules.append((css[start:index], None))
+            start = index + 1
+        elif char == "{":
+            prelude = css[start:index].strip()
+            end = _skip_braces(css, index + 1)
+            body = css[index + 1:end - 1]
+            nested = prelude.startswith(("@media", "@supports", "@layer", "@container"))
+            rules.append((prelude, _parse_rules(body) if nested else body))
+            index = start = end
+            continue
+        index += 1
+    return rules
+
+
+_SELECTOR_NAMES = re.compile(r"([.#])(-?[_a-zA-Z][\w-]*)")
+
+
+def _selector_used(selector, classes, ids, class_prefixes):
+    selector = re.sub(r"\[[^\]]*\]", "", selector)
+    for kind, name in _SELECTOR_NAMES.findall(selector):
+        if kind == "#":
+            if name not in ids:
+                return False
+        elif name not in classes and not name.startswith(class_prefixes):
+            return False
+    return True
+
+
+def _critical_rules(rules, classes, ids, class_prefixes):
+    kept = []
+    for prelude, body in rules:
+        if isinstance(body, list):
+            inner = _critical_rules(body, classes, ids, class_prefixes)
+            if inner:
+                kept.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@font-face") or prelude.startswith("@keyframes") or body is None:
+            kept.append(prelude + (";" if body is None else f"{{{body}}}"))
+        elif any(_selector_used(part, classes, ids, class_prefixes) for part in prelude.split(",")):
+            kept.append(f"{prelude}{{{body}}}")
+    return "".join(kept)
+
+
+_TEMPLATE_TAG = re.compile(r"{%.*?%}|{#.*?#}", re.S)
+_TEMPLATE_VARIABLE = re.compile(r"{{.*?}}", re.S)
+_INCLUDE = re.compile(r"""{%\s*include\s+["']([^"']+)["']""")
+_ATTRIBUTE = re.compile(r"""\b(class|id)\s*=\s*(["'])(.*?)\2""", re.S)
+
+
+def _template_source(templates_dir, name, seen=None):
+    seen = set() if seen is None else seen
+    path = Path(templates_dir) / name
+    if name in seen or not path.exists():
+        return ""
+    seen.add(name)
+    source = path.read_text()
+    included = "".join(_template_source(templates_dir, child, seen) for child in _INCLUDE.findall(source))
+    return source + included
+
+
+def template_selectors(source):
+    """
+    ``(classes, ids, class_prefixes)`` named in a template's markup. Template
+    tags inside attributes are dropped but their literal branches kept, and a
+    class such as ``status-{{ value }}`` becomes the prefix ``status-``.
+    """
+    classes, ids, prefixes = set(), set(), set()
+    for attribute, _, value in _ATTRIBUTE.findall(source):
+        # collapse "{{ var }}" so its inner spaces don't split the token
+        value = _TEMPLATE_VARIABLE.sub("{{}}", _TEMPLATE_TAG.sub(" ", value))
+        for token in value.split():
+            if "{{" in token:
+                prefix = token.split("{{", 1)[0]
+                if attribute == "class" and prefix:
+                    prefixes.add(prefix)
+                continue
+            (classes if attribute == "class" else ids).add(token)
+    return classes, ids, tuple(sorted(prefixes))
+
+
+def critical_css(css, template_source):
+    """
+    The rules of minified ``css`` a template can match on first render:
+    every rule whose classes and ids all appear in its markup (element-only
+    rules always match), plus ``@font-face`` and ``@keyframes``. Classes
+    added later by scripts are left to the full stylesheet.
+    """
+    return _critical_rules(_parse_rules(css), *template_selectors(template_source))
+
+
+def _write_if_changed(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists() and path.read_text() == content:
+        return False
+    path.write_text(content)
+    return True
+
+
+def build_bundles(source_root, templates_dir, build_root, log=print):
+    """
+    Write minified JS bundles, the minified stylesheet and one critical CSS
+    file per page template under ``build_root``, plus ``bundles/index.json``
+    mapping them for the template tags. Unchanged outputs keep their mtime so
+    collectstatic skips them. Returns the number of files rewritten.
+    """
+    source_root, build_root = Path(source_root), Path(build_root)
+    index = {"js": {}, "css": {}, "critical": {}}
+    changed = 0
+
+    for name, sources in JS_BUNDLES.items():
+        bundle = ";\n".join(minify_js((source_root / source).read_text()) for source in sources)
+        path = f"bundles/{name}.js"
+        changed += _write_if_changed(build_root / path, bundle)
+        index["js"][name] = path
+
+    stylesheet = minify_css((source_root / STYLESHEET).read_text())
+    changed += _write_if_changed(build_root / STYLESHEET_BUNDLE, stylesheet)
+    index["css"][STYLESHEET] = STYLESHEET_BUNDLE
+
+    for template in sorted(Path(templates_dir).glob("*.html")):
+        source = _template_source(templates_dir, template.name)
+        if "<head" not in source:
+            continue
+        path = f"{CRITICAL_DIR}/{template.stem}.css"
+        changed += _write_if_changed(build_root / path, critical_css(stylesheet, source))
+        index["critical"][template.name] = path
+
+    changed += _write_if_changed(build_root / BUNDLE_INDEX, json.dumps(index, indent=2, sort_keys=True))
+    bundle_index.cache_clear()
+    log(
+        f"Bundles: {len(index['js'])} script bundle(s), stylesheet "
+        f"{len(stylesheet) / 1024:.1f} KiB, {len(index['critical'])} critical CSS file(s); {changed} rewritten."
+    )
+    return changed
+
+
+@lru_cache(maxsize=1)
+def bundle_index():
+    """
+    The bundle index written by the build step, or ``{}`` if it has not run.
+    """
+    path = finders.find(BUNDLE_INDEX)
+    if not path:
+        return {}
+    return json.loads(Path(path).read_text())
@@ -0,0 +1,165 @@
+import asyncio
+import base64
+import weakref
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .timing import timed
+
+
+TOKEN_CACHE_KEY = "daraja:access-token"
+# Daraja tokens live an hour; refresh early like django_daraja does
+TOKEN_TIMEOUT = 50 * 60
+BASE_URLS = {
+    "development": "https://darajasimulator.azurewebsites.net/",
+    "sandbox": "https://sandbox.safaricom.co.ke/",
+    "production": "https://api.safaricom.co.ke/",
+}
+STK_PUSH_PATH = "mpesa/stkpush/v1/processrequest"
+STK_QUERY_PATH = "mpesa/stkpushquery/v1/query"
+TOKEN_PATH = "oauth/v1/generate?grant_type=client_credentials"
+
+
+def base_url():
+    """``MPESA_API_BASE_URL`` if set, else the Daraja host for ``MPESA_ENVIRONMENT``."""
+    return getattr(settings, "MPESA_API_BASE_URL", "") or BASE_URLS[settings.MPESA_ENVIRONMENT]
+
+
+def _short_code():
+    # same choice as django_daraja's MpesaClient
+    if settings.MPESA_ENVIRONMENT == "sandbox":
+        return settings.MPESA_EXPRESS_SHORTCODE
+    return getattr(settings, "MPESA_SHORTCODE", settings.MPESA_EXPRESS_SHORTCODE)
+
+
+def _signed():
+    """``BusinessShortCode``/``Password``/``Timestamp`` fields for an STK request."""
+    short_code = _short_code()
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    password = base64.b64encode(f"{short_code}{settings.MPESA_PASSKEY}{timestamp}".encode()).decode()
+    return {"BusinessShortCode": short_code, "Password": password, "Timestamp": timestamp}
+
+
+def stk_push_payload(phone_number, amount, account_reference, transaction_desc, callback_url):
+    signed = _signed()
+    return {
+        **signed,
+        "TransactionType": "CustomerPayBillOnline",
+        "Amount": amount,
+        "PartyA": phone_number,
+        "PartyB": signed["BusinessShortCode"],
+        "PhoneNumber": phone_number,
+        "CallBackURL": callback_url,
+        "AccountReference": account_reference,
+        "TransactionDesc": transaction_desc,
+    }
+
+
+def stk_query_payload(checkout_request_id):
+    return {**_signed(), "CheckoutRequestID": checkout_request_id}
+
+
+def _json(response):
+    try:
+        return response.json()
+    except ValueError:
+        return {}
+
+
+def query_stk(checkout_request_id, timeout=30):
+    """
+    Blocking STK push status query for the WSGI path; reuses django_daraja's
+    database-cached access token.
+    """
+    import requests
+    from django_daraja.mpesa.utils import mpesa_access_token
+
+    try:
+        with timed("http"):
+            response = requests.post(
+                base_url() + STK_QUERY_PATH,
+                json=stk_query_payload(checkout_request_id),
+                headers={"Authorization": f"Bearer {mpesa_access_token()}"},
+                timeout=timeout,
+            )
+    except requests.RequestException as exc:
+        raise RuntimeError(f"Could not query STK status: {exc}") from exc
+    return _json(response)
+
+
+class AsyncDarajaClient:
+    """
+    Non-blocking Daraja client for the ASGI views: one pooled ``httpx``
+    connection per host and one token refresh at a time, however many
+    pushes are in flight. Errors surface as ``RuntimeError`` like the
+    blocking path in the views.
+    """
+
+    def __init__(self, base=None, timeout=30.0, max_connections=50):
+        import httpx
+
+        self._httpx = httpx
+        self._http = httpx.AsyncClient(
+            base_url=base or base_url(),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections),
+        )
+        self._token_lock = asyncio.Lock()
+
+    async def access_token(self):
+        token = await cache.aget(TOKEN_CACHE_KEY)
+        if token:
+            return token
+        async with self._token_lock:
+            token = await cache.aget(TOKEN_CACHE_KEY)
+            if token:
+                return token
+            response = await self._request(
+                "GET", TOKEN_PATH, auth=(settings.MPESA_CONSUMER_KEY, settings.MPESA_CONSUMER_SECRET)
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"Could not get a Daraja access token (HTTP {response.status_code}).")
+            token = _json(response).get("access_token")
+            if not token:
+                raise RuntimeError("Daraja returned no access token.")
+            await cache.aset(TOKEN_CACHE_KEY, token, TOKEN_TIMEOUT)
+            return token
+
+    async def _request(self, method, path, **kwargs):
+        try:
+            with timed("http"):
+                return await self._http.request(method, path, **kwargs)
+        except self._httpx.HTTPError as exc:
+            raise RuntimeError(f"Daraja request failed: {exc}") from exc
+
+    async def _post(self, path, payload):
+        token = await self.access_token()
+        response = await self._request("POST", path, json=payload, headers={"Authorization": f"Bearer {token}"})
+        return _json(response)
+
+    async def stk_push(self, phone_number, amount, account_reference, transaction_desc, callback_url):
+        return await self._post(
+            STK_PUSH_PATH,
+            stk_push_payload(phone_number, amount, account_reference, transaction_desc, callback_url),
+        )
+
+    async def stk_query(self, checkout_request_id):
+        return await self._post(STK_QUERY_PATH, stk_query_payload(checkout_request_id))
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+# an httpx client is bound to the event loop it was created on
+_clients = weakref.WeakKeyDictionary()
+
+
+def async_client():
+    """The shared ``AsyncDarajaClient`` of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncDarajaClient()
+    return client
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import connections
+
+
+# psycopg_pool statistic -> reported name
+POOL_STATS = {
+    "requests_num": "checkouts",
+    "requests_queued": "checkouts_waited",
+    "requests_wait_ms": "wait_ms",
+    "requests_errors": "checkout_errors",
+    "connections_num": "connects",
+    "connections_lost": "connections_lost",
+    "returns_bad": "returns_bad",
+    "pool_size": "size",
+    "pool_available": "available",
+    "requests_waiting": "waiting",
+}
+
+
+def tune_sqlite(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver applying ``SQLITE_PRAGMAS`` to each new
+    file-backed SQLite connection. ``journal_mode`` persists in the database
+    file; the rest are per connection, hence per worker thread.
+    """
+    if connection.vendor != "sqlite" or not settings.SQLITE_TUNING or connection.is_in_memory_db():
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+def pool_metrics():
+    """
+    Checkout counts and wait times of this process's psycopg connection
+    pools (``OPTIONS["pool"]``), as ``db.pool.<alias>.*`` gauges.
+    """
+    gauges = {}
+    for alias in connections:
+        if not connections.settings[alias].get("OPTIONS", {}).get("pool"):
+            continue
+        stats = connections[alias].pool.get_stats()
+        prefix = f"db.pool.{alias}"
+        for stat, name in POOL_STATS.items():
+            gauges[f"{prefix}.{name}"] = stats.get(stat, 0)
+        if stats.get("requests_queued"):
+            gauges[f"{prefix}.wait_ms_avg"] = round(stats["requests_wait_ms"] / stats["requests_queued"], 3)
+    return gauges
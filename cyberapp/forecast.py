@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.core.cache import cache
+
+from .occupancy import HOUR, hour_of_week, integral, load_intervals, sweep
+from .timeseries import REPORT_TZ
+from .versioning import data_version
+
+
+WEEK_HOURS = 168
+DEFAULT_HISTORY_WEEKS = 8
+DEFAULT_HORIZON_DAYS = 14
+# weight of the most recent week; older weeks decay by (1 - alpha) each
+DEFAULT_ALPHA = 0.3
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def _week_start(moment):
+    local = moment.astimezone(REPORT_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+    return local - timedelta(days=local.weekday())
+
+
+def hourly_history(history_start, weeks):
+    """
+    ``(occupancy, revenue)`` arrays of shape ``(weeks, 168)``: average
+    machines in use and charges of sessions ended, per hour of each week.
+    """
+    start = int(history_start.timestamp())
+    end = start + weeks * WEEK_HOURS * HOUR
+    starts, ends, charged = load_intervals(
+        history_start, history_start + timedelta(weeks=weeks), amounts=True
+    )
+
+    times, occupancy = sweep(starts, ends, start, end)
+    edges = np.arange(start, end + 1, HOUR, dtype=np.int64)
+    busy = np.diff(integral(times, occupancy, edges)) / HOUR
+
+    ended = (ends >= start) & (ends < end)
+    revenue = np.bincount((ends[ended] - start) // HOUR, weights=charged[ended], minlength=weeks * WEEK_HOURS)
+    return busy.reshape(weeks, WEEK_HOURS), revenue.reshape(weeks, WEEK_HOURS)
+
+
+def fit(history, alpha=DEFAULT_ALPHA):
+    """
+    Expected value per hour-of-week slot from a ``(weeks, 168)`` history.
+
+    The seasonal shape is each slot's share of the average week. The level
+    applies simple exponential smoothing to the weekly totals, written as one
+    weighted sum, so a growing or shrinking shop moves the whole forecast.
+    """
+    weeks = history.shape[0]
+    totals = history.sum(axis=1)
+    grand_total = totals.sum()
+    if not grand_total:
+        return np.zeros(WEEK_HOURS)
+    shape = history.sum(axis=0) / grand_total
+
+    # SES unrolled: newest week weighted alpha, older ones by alpha * (1 - alpha)^k,
+    # the oldest carrying the remaining (1 - alpha)^(weeks - 1) as the seed
+    weights = alpha * (1 - alpha) ** np.arange(weeks - 1, -1, -1)
+    weights[0] = (1 - alpha) ** (weeks - 1)
+    level = weights @ totals
+    return shape * level
+
+
+def fitted_profiles(weeks=DEFAULT_HISTORY_WEEKS, alpha=DEFAULT_ALPHA, now=None):
+    """
+    ``(history_start, occupancy_profile, revenue_profile)`` fitted on the
+    last ``weeks`` complete weeks. Cached until the shop's data version (see
+    ``cyberapp.versioning``) or the week changes.
+    """
+    now = now or datetime.now(REPORT_TZ)
+    history_start = _week_start(now) - timedelta(weeks=weeks)
+    key = f"forecast:{weeks}:{alpha}:{history_start.date().isoformat()}:{data_version()[0]}"
+    cached = cache.get(key)
+    if cached is None:
+        occupancy, revenue = hourly_history(history_start, weeks)
+        cached = (fit(occupancy, alpha), fit(revenue, alpha))
+        cache.set(key, cached, CACHE_TIMEOUT)
+    return (history_start, *cached)
+
+
+def forecast(days=DEFAULT_HORIZON_DAYS, weeks=DEFAULT_HISTORY_WEEKS, alpha=DEFAULT_ALPHA, now=None):
+    """
+    Expected average occupancy and revenue for every local hour from the
+    current one for ``days`` days, as ``(hour_starts, occupancy, revenue)``.
+    """
+    now = now or datetime.now(REPORT_TZ)
+    _, occupancy_profile, revenue_profile = fitted_profiles(weeks, alpha, now)
+
+    first = int(now.astimezone(REPORT_TZ).replace(minute=0, second=0, microsecond=0).timestamp())
+    hours = first + HOUR * np.arange(days * 24, dtype=np.int64)
+    offset = int(now.astimezone(REPORT_TZ).utcoffset().total_seconds())
+    slots = hour_of_week(hours, offset)
+    hour_starts = [datetime.fromtimestamp(int(value), REPORT_TZ) for value in hours]
+    return hour_starts, occupancy_profile[slots], revenue_profile[slots]
@@ -1,6 +1,31 @@
 from django import forms
+from django.urls import reverse_lazy
+
 from .models import Student, Payment
 
+
+class StudentAutocompleteWidget(forms.Widget):
+    """
+    Hidden primary-key input plus a typeahead box fed by ``student_search``.
+    Never iterates the field's choices, so rendering costs at most one row.
+    """
+    template_name = "widgets/student_autocomplete.html"
+    search_url = reverse_lazy("student_search")
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        label = ""
+        if value not in (None, ""):
+            try:
+                student = Student.objects.only("firstname", "lastname", "idnumber").filter(pk=value).first()
+            except (TypeError, ValueError):
+                student = None
+            if student:
+                label = f"{student.firstname} {student.lastname} ({student.idnumber})"
+        context["widget"]["search_url"] = str(self.search_url)
+        context["widget"]["selected_label"] = label
+        return context
+
 class StudentForm(forms.ModelForm):
     class Meta:
         model = Student
@@ -31,6 +56,13 @@ class PaymentForm(forms.ModelForm):
         help_text="Leave blank to use the student number on file.",
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # validation fetches just the picked row, with only what add_payment reads
+        self.fields["student"].queryset = Student.objects.only(
+            "firstname", "lastname", "idnumber", "phonenumber"
+        )
+
     class Meta:
         model = Payment
         fields = ["amount", "balance", "date", "student"]
@@ -38,5 +70,5 @@ class PaymentForm(forms.ModelForm):
             "amount": forms.NumberInput(attrs={"class": "form-control"}),
             "balance": forms.NumberInput(attrs={"class": "form-control"}),
             "date": forms.DateInput(attrs={"class": "form-control", "type": "date"}),
-            "student": forms.Select(attrs={"class": "form-control"}),
+            "student": StudentAutocompleteWidget(attrs={"class": "form-control student-search-input"}),
         }
\ No newline at end of file
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.contrib.staticfiles import finders
+
+
+logger = logging.getLogger(__name__)
+
+
+IMAGE_DIR = "images"
+VARIANT_DIR = "images/variants"
+VARIANT_INDEX = f"{VARIANT_DIR}/index.json"
+SOURCE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+VARIANT_WIDTHS = (480, 960, 1600, 2560)
+# format -> (MIME type, Pillow save options); listed best first
+VARIANT_FORMATS = {
+    "avif": ("image/avif", {"quality": 50}),
+    "webp": ("image/webp", {"quality": 75, "method": 6}),
+}
+
+_RESPONSIVE_TAG = re.compile(r"{%\s*responsive_(?:image|background)\b(.*?)%}", re.S)
+_IMAGE_ARGUMENT = re.compile(r"""["'](images/[^"']+)["']""")
+
+
+def referenced_images(templates_dir):
+    """
+    Static paths of the images the templates pass to ``responsive_image``
+    or ``responsive_background``; only these get variants.
+    """
+    names = set()
+    for template in Path(templates_dir).rglob("*.html"):
+        for arguments in _RESPONSIVE_TAG.findall(template.read_text(encoding="utf-8")):
+            names.update(_IMAGE_ARGUMENT.findall(arguments))
+    return names
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_image_variants(source_root, build_root, names, log=logger.info):
+    """
+    Write AVIF/WebP copies of the images ``names`` (static paths under
+    ``source_root/images``, see ``referenced_images``) at each width in ``VARIANT_WIDTHS`` (never upscaled) into
+    ``build_root/images/variants`` and record them in ``index.json``.
+
+    Sources whose content hash is unchanged since the last build are
+    skipped. Returns the number of images (re)encoded, or ``None`` when
+    Pillow is not installed.
+    """
+    try:
+        from PIL import Image, features
+    except ImportError:
+        log("Pillow is not installed; skipping responsive image variants (pip install Pillow).")
+        return None
+
+    formats = {name: spec for name, spec in VARIANT_FORMATS.items() if features.check(name)}
+    source_dir = Path(source_root) / IMAGE_DIR
+    output_dir = Path(build_root) / VARIANT_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+    index_path = Path(build_root) / VARIANT_INDEX
+    previous = json.loads(index_path.read_text()) if index_path.exists() else {}
+
+    index, encoded = {}, 0
+    for source in sorted(source_dir.iterdir()):
+        name = f"{IMAGE_DIR}/{source.name}"
+        if source.suffix.lower() not in SOURCE_SUFFIXES or name not in names:
+            continue
+        source_hash = _file_hash(source)
+        entry = previous.get(name)
+        if (
+            entry
+            and entry["hash"] == source_hash
+            and set(entry["variants"]) == set(formats)
+            and all((Path(build_root) / path).exists() for paths in entry["variants"].values() for _, path in paths)
+        ):
+            index[name] = entry
+            continue
+
+        with Image.open(source) as image:
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+            widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+            entry = {"hash": source_hash, "width": image.width, "variants": {}}
+            for fmt, (_, options) in formats.items():
+                entry["variants"][fmt] = []
+                for width in widths:
+                    height = round(image.height * width / image.width)
+                    variant = f"{VARIANT_DIR}/{source.stem}-{width}w.{fmt}"
+                    image.resize((width, height), Image.LANCZOS).save(Path(build_root) / variant, fmt.upper(), **options)
+                    entry["variants"][fmt].append([width, variant])
+        index[name] = entry
+        encoded += 1
+        log(f"Encoded {name}: {len(widths)} width(s) x {len(formats)} format(s)")
+
+    # drop variants of images that were removed, are no longer used or were
+    # re-encoded at other widths
+    current = {path for entry in index.values() for paths in entry["variants"].values() for _, path in paths}
+    for stale in output_dir.iterdir():
+        if stale.name != Path(VARIANT_INDEX).name and f"{VARIANT_DIR}/{stale.name}" not in current:
+            stale.unlink()
+
+    index_path.write_text(json.dumps(index, indent=2, sort_keys=True))
+    variant_index.cache_clear()
+    return encoded
+
+
+@lru_cache(maxsize=1)
+def variant_index():
+    """
+    The variant index written by the build step, or ``{}`` if it has not run.
+    """
+    path = finders.find(VARIANT_INDEX)
+    if not path:
+        return {}
+    return json.loads(Path(path).read_text())
+
+
+def image_variants(path):
+    """
+    ``[(mime_type, [(width, static_path), ...]), ...]`` for a static image,
+    best format first; empty when no variants were built.
+    """
+    entry = variant_index().get(path)
+    if not entry:
+        return []
+    return [
+        (VARIANT_FORMATS[fmt][0], [tuple(pair) for pair in entry["variants"][fmt]])
+        for fmt in VARIANT_FORMATS
+        if fmt in entry["variants"]
+    ]
@@ -0,0 +1,219 @@
+from dataclasses import dataclass
+from datetime import datetime, time, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, router
+from django.db.models import DateTimeField, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Cast
+from django.utils.dateparse import parse_datetime
+
+from .models import Payment, Student, UsageSession
+from .pagination import DIRECTION_NEXT, KeysetPage, encode_cursor, load_cursor
+
+
+LEDGER_PAGE_SIZE = 50
+CENT = Decimal("0.01")
+
+# Entry kinds; also the tie-break when two entries share a timestamp, so a
+# session's STK payment lists above (after) its own charge.
+ENTRY_CHARGE = 0
+ENTRY_SESSION_PAYMENT = 1
+ENTRY_PAYMENT = 2
+ENTRY_LABELS = {
+    ENTRY_CHARGE: "Session charge",
+    ENTRY_SESSION_PAYMENT: "Session paid via M-Pesa",
+    ENTRY_PAYMENT: "Payment",
+}
+
+LEDGER_COLUMNS = ("entry_at", "entry_kind", "id", "student_id", "delta")
+
+
+@dataclass
+class LedgerEntry:
+    at: datetime
+    kind: int
+    source_id: int
+    student_id: int
+    amount: Decimal
+    balance: Decimal
+    student: Student = None
+
+    @property
+    def label(self):
+        return ENTRY_LABELS[self.kind]
+
+    @property
+    def is_charge(self):
+        return self.kind == ENTRY_CHARGE
+
+    @property
+    def date_only(self):
+        # payments carry a date, not a time of day
+        return self.kind == ENTRY_PAYMENT
+
+
+def _as_datetime(value):
+    # UNION output columns carry no declared type, so SQLite hands back text
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+def _as_money(value):
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def _decode_cursor(token):
+    """
+    ``((entry_at, kind, id), balance)`` from a ledger cursor, or ``None``.
+    """
+    loaded = load_cursor(token)
+    if loaded is None or len(loaded[1]) != 4:
+        return None
+    at, kind, entry_id, balance = loaded[1]
+    try:
+        at = parse_datetime(at)
+        seek = (_as_datetime(at), int(kind), int(entry_id))
+        return seek, Decimal(balance)
+    except (TypeError, ValueError, AttributeError, InvalidOperation):
+        return None
+
+
+def _session_seek(kind, at, cursor_kind, cursor_id):
+    """
+    "Older than the cursor" for a session-backed branch whose kind is fixed,
+    as a plain range on ``end_time`` so the index seek still applies.
+    """
+    if kind < cursor_kind:
+        return Q(end_time__lte=at)
+    if kind > cursor_kind:
+        return Q(end_time__lt=at)
+    return Q(end_time__lt=at) | Q(end_time=at, id__lt=cursor_id)
+
+
+def _payment_seek(at, cursor_kind, cursor_id):
+    """
+    Same for payments, which sit at midnight UTC of their ``date``: translate
+    the cursor instant back into a ``date`` range.
+    """
+    at = at.astimezone(dt_timezone.utc)
+    at_midnight = at.time() == time.min
+    older = Q(date__lt=at.date()) if at_midnight else Q(date__lte=at.date())
+    if at_midnight and cursor_kind == ENTRY_PAYMENT:
+        older |= Q(date=at.date(), id__lt=cursor_id)
+    return older
+
+
+def _branches(student_id, cursor, limit):
+    """
+    The three entry sources, each bounded to ``limit`` rows past the cursor
+    and read newest first from its covering index.
+    """
+    sessions = UsageSession.objects.filter(end_time__isnull=False)
+    payments = Payment.objects.filter(mpesa_status__in=Payment.SETTLED_STATUSES)
+    if student_id is not None:
+        sessions = sessions.filter(student_id=student_id)
+        payments = payments.filter(student_id=student_id)
+
+    charges = sessions.annotate(
+        entry_at=F("end_time"), entry_kind=Value(ENTRY_CHARGE, IntegerField()), delta=F("amount_charged")
+    )
+    session_payments = sessions.filter(payment_status="paid").annotate(
+        entry_at=F("end_time"), entry_kind=Value(ENTRY_SESSION_PAYMENT, IntegerField()), delta=-F("amount_charged")
+    )
+    payments = payments.annotate(
+        entry_at=Cast("date", DateTimeField()), entry_kind=Value(ENTRY_PAYMENT, IntegerField()), delta=-F("amount")
+    )
+
+    if cursor is not None:
+        at, cursor_kind, cursor_id = cursor
+        charges = charges.filter(_session_seek(ENTRY_CHARGE, at, cursor_kind, cursor_id))
+        session_payments = session_payments.filter(_session_seek(ENTRY_SESSION_PAYMENT, at, cursor_kind, cursor_id))
+        payments = payments.filter(_payment_seek(at, cursor_kind, cursor_id))
+
+    return [
+        charges.order_by("-end_time", "-id").values(*LEDGER_COLUMNS)[:limit],
+        session_payments.order_by("-end_time", "-id").values(*LEDGER_COLUMNS)[:limit],
+        payments.order_by("-date", "-id").values(*LEDGER_COLUMNS)[:limit],
+    ]
+
+
+def current_balance(student=None):
+    """
+    Balance after the newest ledger entry, read from the denormalized
+    ``open_balance`` column(s) rather than re-summing history.
+    """
+    if student is not None:
+        return student.open_balance
+    return Student.objects.aggregate(total=Sum("open_balance"))["total"] or Decimal("0.00")
+
+
+def ledger_page(student=None, cursor=None, page_size=LEDGER_PAGE_SIZE, balance=None, using=None):
+    """
+    One newest-first page of charges and payments with the running balance
+    after each entry; positive balances are owed to the shop.
+
+    The balance is anchored on the page's newest entry (``open_balance`` on
+    the first page, carried in the cursor afterwards) and a window ``SUM``
+    over just this page's rows walks it back, so page N of a heavy user
+    costs the same as page 1. Pass ``balance`` when the caller already has
+    ``current_balance()`` to hand. Reads the database the router picks for
+    payments unless ``using`` is given.
+    """
+    using = using or router.db_for_read(Payment)
+    decoded = _decode_cursor(cursor)
+    if decoded:
+        seek, anchor = decoded
+    else:
+        seek, anchor = None, balance if balance is not None else current_balance(student)
+
+    limit = page_size + 1
+    parts, params = [], []
+    for index, branch in enumerate(_branches(student.pk if student else None, seek, limit)):
+        sql, branch_params = branch.query.get_compiler(using=using).as_sql()
+        parts.append(f"SELECT {', '.join(LEDGER_COLUMNS)} FROM ({sql}) AS branch_{index}")
+        params.extend(branch_params)
+
+    order = "entry_at DESC, entry_kind DESC, id DESC"
+    sql = (
+        f"SELECT entry_at, entry_kind, id, student_id, delta, "
+        f"SUM(delta) OVER (ORDER BY {order} ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS newer "
+        f"FROM ({' UNION ALL '.join(parts)}) AS ledger ORDER BY {order} LIMIT %s"
+    )
+    with connections[using].cursor() as db_cursor:
+        db_cursor.execute(sql, [*params, limit])
+        rows = db_cursor.fetchall()
+
+    entries = [
+        LedgerEntry(
+            at=_as_datetime(at),
+            kind=kind,
+            source_id=source_id,
+            student_id=student_id,
+            amount=_as_money(delta),
+            balance=_as_money(anchor) - _as_money(newer),
+        )
+        for at, kind, source_id, student_id, delta, newer in rows[:page_size]
+    ]
+
+    if student is not None:
+        for entry in entries:
+            entry.student = student
+    else:
+        students = Student.objects.only("firstname", "lastname", "idnumber").in_bulk(
+            {entry.student_id for entry in entries}
+        )
+        for entry in entries:
+            entry.student = students.get(entry.student_id)
+
+    page = KeysetPage(items=entries, page_size=page_size)
+    if len(rows) > page_size and entries:
+        last = entries[-1]
+        page.next_cursor = encode_cursor(
+            [last.at.isoformat(), last.kind, last.source_id, str(last.balance - last.amount)],
+            DIRECTION_NEXT,
+        )
+    return page
+
@@ -0,0 +1,194 @@
+import logging
+import random
+import sqlite3
+import sys
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from cyberapp.models import Student
+
+
+BENCHMARK_USER = "sqlite-benchmark"
+# the students the writers start and end sessions for
+WRITER_STUDENTS = 200
+
+# the test client's own exception capture is shared by every client, so
+# each thread keeps the exception its last request raised here instead
+_last_error = threading.local()
+
+
+def _store_error(**kwargs):
+    _last_error.value = sys.exc_info()[1]
+
+
+class _Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {"read": [], "write": []}
+        self.lock_errors = {"read": 0, "write": 0}
+
+    def record(self, kind, started, locked=False):
+        with self._lock:
+            if locked:
+                self.lock_errors[kind] += 1
+            else:
+                self.latencies[kind].append(time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run dashboard readers against start_session/end_session writers on a "
+        "copy of the SQLite database, once with stock SQLite settings and once "
+        "with the SQLITE_PRAGMAS profile, and report lock errors and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=10, help="Duration of each run (default 10).")
+        parser.add_argument("--readers", type=int, default=8, help="Threads loading the active sessions page (default 8).")
+        parser.add_argument("--writers", type=int, default=4, help="Threads starting and ending sessions (default 4).")
+
+    def handle(self, *args, **options):
+        database = connections.settings["default"]
+        if database["ENGINE"] != "django.db.backends.sqlite3" or connections["default"].is_in_memory_db():
+            raise CommandError("benchmark_sqlite needs the default database to be a SQLite file.")
+        if options["readers"] < 1 or options["writers"] < 1:
+            raise CommandError("--readers and --writers must be at least 1.")
+        students = list(Student.objects.values_list("idnumber", flat=True)[:WRITER_STUDENTS])
+        if not students:
+            raise CommandError("The database has no students to start sessions for.")
+
+        got_request_exception.connect(_store_error)
+        # locked requests are counted below; don't log each one as a server error
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        rows = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, tuned in (("stock", False), ("tuned", True)):
+                path = Path(tmp) / f"{label}.sqlite3"
+                self._copy(database["NAME"], path)
+                self.stdout.write(f"Running {label} for {options['seconds']:g}s...")
+                with self._database(database, path, tuned):
+                    results = self._run(students, options)
+                rows.append((label, results))
+
+        self.stdout.write(
+            f"{'Profile':<8} {'Kind':<6} {'Ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'Locked':>7} {'Lock %':>7}"
+        )
+        for label, results in rows:
+            for kind in ("read", "write"):
+                latencies = sorted(results.latencies[kind])
+                locked = results.lock_errors[kind]
+                attempts = len(latencies) + locked
+                if latencies:
+                    timing = (
+                        f"{statistics.median(latencies) * 1000:>8.1f} "
+                        f"{latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000:>8.1f} "
+                        f"{latencies[-1] * 1000:>8.1f}"
+                    )
+                else:
+                    timing = f"{'-':>8} {'-':>8} {'-':>8}"
+                self.stdout.write(
+                    f"{label:<8} {kind:<6} {len(latencies) / options['seconds']:>8.1f} {timing} "
+                    f"{locked:>7} {locked / attempts * 100 if attempts else 0:>6.1f}%"
+                )
+
+    @staticmethod
+    def _copy(source, target):
+        # the backup API copies a consistent snapshot, WAL contents included
+        src, dst = sqlite3.connect(source), sqlite3.connect(target)
+        try:
+            src.backup(dst)
+            # start from SQLite's default rollback journal; the tuned
+            # profile switches its copy to WAL on first connection
+            dst.execute("PRAGMA journal_mode = delete")
+        finally:
+            dst.close()
+            src.close()
+
+    @staticmethod
+    @contextmanager
+    def _database(database, path, tuned):
+        """Point the default alias at ``path`` with or without the tuning profile."""
+        saved = {"NAME": database["NAME"], "OPTIONS": database.get("OPTIONS", {})}
+        options = {key: value for key, value in saved["OPTIONS"].items() if key != "transaction_mode"}
+        if tuned:
+            options["transaction_mode"] = "IMMEDIATE"
+        connections.close_all()
+        database.update(NAME=str(path), OPTIONS=options)
+        try:
+            with override_settings(SQLITE_TUNING=tuned):
+                yield
+        finally:
+            connections.close_all()
+            database.update(saved)
+
+    def _run(self, students, options):
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USER)
+        results = _Results()
+        deadline = time.perf_counter() + options["seconds"]
+        threads = [
+            threading.Thread(target=self._reader, args=(user, results, deadline)) for _ in range(options["readers"])
+        ] + [
+            threading.Thread(target=self._writer, args=(user, students, results, deadline))
+            for _ in range(options["writers"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    @staticmethod
+    def _client(user):
+        client = Client(raise_request_exception=False, HTTP_HOST="localhost")
+        client.force_login(user)
+        return client
+
+    @staticmethod
+    def _timed(results, kind, request):
+        _last_error.value = None
+        started = time.perf_counter()
+        response = request()
+        if response.status_code < 400:
+            results.record(kind, started)
+        elif isinstance(_last_error.value, OperationalError) and "locked" in str(_last_error.value):
+            results.record(kind, started, locked=True)
+        else:
+            raise CommandError(f"{kind} request failed with HTTP {response.status_code}: {_last_error.value!r}")
+
+    def _reader(self, user, results, deadline):
+        try:
+            client = self._client(user)
+            url = reverse("active_sessions")
+            while time.perf_counter() < deadline:
+                self._timed(results, "read", lambda: client.get(url))
+        finally:
+            connections.close_all()
+
+    def _writer(self, user, students, results, deadline):
+        try:
+            client = self._client(user)
+            while time.perf_counter() < deadline:
+                idnumber = random.choice(students)
+                self._timed(results, "write", lambda: client.get(reverse("start_session", args=[idnumber])))
+                # keep start_session's flash messages from piling up in the cookie
+                client.cookies.pop("messages", None)
+                self._timed(
+                    results,
+                    "write",
+                    lambda: client.post(
+                        reverse("end_session", args=[idnumber]), HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+                    ),
+                )
+        finally:
+            connections.close_all()
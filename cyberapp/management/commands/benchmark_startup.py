@@ -0,0 +1,92 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter: boot the WSGI app the way a gunicorn worker
+# does, then serve one request through it.
+BOOT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+import cyber.urls
+booted = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+environ = {"PATH_INFO": sys.argv[1], "HTTP_HOST": sys.argv[2], "SERVER_NAME": sys.argv[2]}
+setup_testing_defaults(environ)
+statuses = []
+b"".join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+responded = time.perf_counter()
+print(json.dumps({
+    "boot": booted - started,
+    "first_response": responded - booted,
+    "status": statuses[0],
+}))
+"""
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold start: boot the WSGI app in fresh interpreters, time the "
+        "first response, and attribute import time (-X importtime) to packages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time (default 5).")
+        parser.add_argument("--url", default="/login/", help="Path of the first request (default /login/).")
+        parser.add_argument("--top", type=int, default=12, help="Packages to list by import time (default 12).")
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be at least 1.")
+        host = next((host for host in settings.ALLOWED_HOSTS if not host.startswith((".", "*"))), "localhost")
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "cyber.settings")}
+
+        runs, importtime = [], ""
+        for index in range(options["runs"]):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", BOOT_SCRIPT, options["url"], host],
+                capture_output=True,
+                text=True,
+                env=env,
+                cwd=settings.BASE_DIR,
+            )
+            wall = time.perf_counter() - started
+            if result.returncode:
+                raise CommandError(f"Boot failed:\n{result.stderr[-2000:]}")
+            runs.append({**json.loads(result.stdout.strip().splitlines()[-1]), "wall": wall})
+            if index == 0:
+                importtime = result.stderr
+
+        self.stdout.write(f"{'Phase':<34} {'median ms':>10} {'min ms':>8}")
+        for key, label in (
+            ("wall", "process start to exit"),
+            ("boot", "django + project import"),
+            ("first_response", f"first response ({runs[0]['status']})"),
+        ):
+            values = [run[key] * 1000 for run in runs]
+            self.stdout.write(f"{label:<34} {statistics.median(values):>10.0f} {min(values):>8.0f}")
+
+        self.stdout.write("\nImport time by package, first run (self time, ms):")
+        for package, micros in self._by_package(importtime)[: options["top"]]:
+            self.stdout.write(f"  {package:<30} {micros / 1000:>8.1f}")
+
+    @staticmethod
+    def _by_package(importtime):
+        totals = defaultdict(int)
+        for line in importtime.splitlines():
+            match = _IMPORTTIME.match(line)
+            if match:
+                totals[match.group(4).split(".")[0]] += int(match.group(1))
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from cyberapp.models import UsageSession
+
+
+BENCHMARK_USER = "stk-benchmark"
+PHONE_NUMBER = "0708374149"
+
+
+def _fake_daraja(latency):
+    """Local stand-in for Daraja that answers every call after ``latency`` seconds."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, body):
+            time.sleep(latency)
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._reply({"access_token": "benchmark", "expires_in": "3599"})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._reply({"ResponseCode": "0", "CheckoutRequestID": "ws_CO_benchmark"})
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare STK pushes per worker: the send_stk view behind a WSGI handler "
+        "(one push per thread at a time) against send_stk_async behind an ASGI "
+        "handler on one event loop. Each runs in a fresh interpreter on a copy of "
+        "the SQLite database, against a local fake Daraja with fixed latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pushes", type=int, default=50, help="Concurrent pushes to send (default 50).")
+        parser.add_argument("--latency-ms", type=int, default=300, help="Fake Daraja response time (default 300).")
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=1,
+            help="Threads of the sync worker, i.e. gunicorn --threads (default 1).",
+        )
+        # set by the parent process for each worker it starts
+        parser.add_argument("--worker", choices=("sync", "async"), help=argparse.SUPPRESS)
+        parser.add_argument("--database-copy", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["pushes"] < 1 or options["threads"] < 1:
+            raise CommandError("--pushes and --threads must be at least 1.")
+        if options["worker"]:
+            return self._worker(options)
+
+        database = connections.settings["default"]
+        if database["ENGINE"] != "django.db.backends.sqlite3" or connections["default"].is_in_memory_db():
+            raise CommandError("benchmark_stk needs the default database to be a SQLite file.")
+        if not UsageSession.objects.filter(end_time__isnull=False, is_active=False, amount_charged__gt=0).exists():
+            raise CommandError("The database has no ended, charged session to push for.")
+
+        server = _fake_daraja(options["latency_ms"] / 1000)
+        rows = []
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                for mode, label in (("sync", f"WSGI, {options['threads']} thread(s)"), ("async", "ASGI, 1 event loop")):
+                    self.stdout.write(f"Running {label}...")
+                    rows.append((label, self._run_worker(mode, database["NAME"], Path(tmp), server, options)))
+        finally:
+            server.shutdown()
+
+        self.stdout.write(f"{'Worker':<22} {'Pushes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'Wall s':>7}")
+        for label, (elapsed, latencies) in rows:
+            latencies.sort()
+            self.stdout.write(
+                f"{label:<22} {len(latencies) / elapsed:>9.1f} {statistics.median(latencies) * 1000:>8.0f} "
+                f"{latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000:>8.0f} {elapsed:>7.2f}"
+            )
+        sync_elapsed, async_elapsed = (elapsed for _, (elapsed, _) in rows)
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['pushes']} pushes at {options['latency_ms']} ms Daraja latency: "
+            f"async worker {sync_elapsed / async_elapsed:.1f}x the sync worker's throughput"
+        ))
+
+    def _run_worker(self, mode, source, tmp, server, options):
+        path = tmp / f"{mode}.sqlite3"
+        # the backup API copies a consistent snapshot, WAL contents included
+        src, dst = sqlite3.connect(source), sqlite3.connect(path)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "cyber.settings"),
+            # urls.py picks the sync or async STK views from this at import
+            "MPESA_ASYNC": "True" if mode == "async" else "False",
+            "MPESA_API_BASE_URL": f"http://127.0.0.1:{server.server_port}/",
+        }
+        result = subprocess.run(
+            [
+                sys.executable, "-m", "django", "benchmark_stk",
+                "--worker", mode,
+                "--database-copy", str(path),
+                "--pushes", str(options["pushes"]),
+                "--threads", str(options["threads"]),
+            ],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=settings.BASE_DIR,
+        )
+        if result.returncode:
+            raise CommandError(f"The {mode} worker failed:\n{result.stderr[-2000:]}")
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        failed = {status: count for status, count in report["statuses"].items() if not status.startswith("200")}
+        if failed:
+            raise CommandError(f"The {mode} worker got non-200 responses: {failed}")
+        return report["elapsed"], report["latencies"]
+
+    def _worker(self, options):
+        database = connections.settings["default"]
+        connections.close_all()
+        database["NAME"] = options["database_copy"]
+
+        session = (
+            UsageSession.objects.filter(end_time__isnull=False, is_active=False, amount_charged__gt=0)
+            .order_by("-id")
+            .first()
+        )
+        request = self._request(reverse("send_stk", args=[session.pk]))
+        if options["worker"] == "sync":
+            elapsed, latencies, statuses = self._push_wsgi(request, options["pushes"], options["threads"])
+        else:
+            elapsed, latencies, statuses = asyncio.run(self._push_asgi(request, options["pushes"]))
+        connections.close_all()
+        self.stdout.write(json.dumps({"elapsed": elapsed, "latencies": latencies, "statuses": dict(statuses)}))
+
+    @staticmethod
+    def _request(path):
+        """The headers and body of a logged-in, CSRF-valid STK push POST."""
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USER)
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store[SESSION_KEY] = str(user.pk)
+        store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store.create()
+        csrf_secret = get_random_string(32)
+        host = next((host for host in settings.ALLOWED_HOSTS if not host.startswith((".", "*"))), "localhost")
+        return {
+            "path": path,
+            "host": host,
+            "cookie": f"{settings.SESSION_COOKIE_NAME}={store.session_key}; {settings.CSRF_COOKIE_NAME}={csrf_secret}",
+            "csrf_token": csrf_secret,
+            "body": json.dumps({"phone_number": PHONE_NUMBER}).encode(),
+        }
+
+    @staticmethod
+    def _push_wsgi(request, pushes, threads):
+        from django.core.wsgi import get_wsgi_application
+        from django_daraja.mpesa import core, utils
+        from django_daraja.mpesa.utils import mpesa_access_token
+
+        # django_daraja has no base URL setting; send it to the fake Daraja too
+        core.api_base_url = utils.api_base_url = lambda: settings.MPESA_API_BASE_URL
+        application = get_wsgi_application()
+        # django_daraja keeps its token in the database, so pushes don't refetch it
+        mpesa_access_token()
+        connections.close_all()
+
+        statuses = Counter()
+        # all pushes arrive at once; latency includes time queued for a free thread
+        started = time.perf_counter()
+
+        def push(_):
+            environ = {
+                "REQUEST_METHOD": "POST",
+                "PATH_INFO": request["path"],
+                "HTTP_HOST": request["host"],
+                "SERVER_NAME": request["host"],
+                "CONTENT_TYPE": "application/json",
+                "CONTENT_LENGTH": str(len(request["body"])),
+                "HTTP_COOKIE": request["cookie"],
+                "HTTP_X_CSRFTOKEN": request["csrf_token"],
+                "wsgi.input": io.BytesIO(request["body"]),
+            }
+            setup_testing_defaults(environ)
+            status = []
+            response = application(environ, lambda line, headers, exc_info=None: status.append(line))
+            try:
+                b"".join(response)
+            finally:
+                # request_finished: closes this thread's connection like gunicorn would
+                response.close()
+            statuses[status[0]] += 1
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(threads) as pool:
+            latencies = list(pool.map(push, range(pushes)))
+        return time.perf_counter() - started, latencies, statuses
+
+    @staticmethod
+    async def _push_asgi(request, pushes):
+        from django.core.asgi import get_asgi_application
+
+        from cyberapp.daraja import async_client
+
+        application = get_asgi_application()
+        # the async views cache the token per worker
+        await async_client().access_token()
+        statuses = Counter()
+        started = time.perf_counter()
+
+        async def push():
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": request["path"],
+                "raw_path": request["path"].encode(),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [
+                    (b"host", request["host"].encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(request["body"])).encode()),
+                    (b"cookie", request["cookie"].encode()),
+                    (b"x-csrftoken", request["csrf_token"].encode()),
+                ],
+                "client": ("127.0.0.1", 0),
+                "server": (request["host"], 80),
+            }
+            messages = [{"type": "http.request", "body": request["body"], "more_body": False}]
+            status = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # the client stays connected; Django cancels this wait
+                await asyncio.Future()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            await application(scope, receive, send)
+            statuses[f"{status[0]}"] += 1
+            return time.perf_counter() - started
+
+        latencies = await asyncio.gather(*(push() for _ in range(pushes)))
+        return time.perf_counter() - started, list(latencies), statuses
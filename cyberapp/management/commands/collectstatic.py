@@ -0,0 +1,20 @@
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectStaticCommand
+
+from cyberapp.staticbuild import run_build
+
+
+class Command(CollectStaticCommand):
+    help = CollectStaticCommand.help + " Runs the cyberapp static build step first."
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--skip-build",
+            action="store_true",
+            help="Collect existing files without regenerating image variants and bundles.",
+        )
+
+    def handle(self, **options):
+        if not options["skip_build"]:
+            run_build(log=lambda message: self.stdout.write(message) if options["verbosity"] else None)
+        return super().handle(**options)
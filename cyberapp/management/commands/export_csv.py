@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from cyberapp.exports import DEFAULT_CHUNK_SIZE, EXPORT_DATASETS, gzip_stream, iter_csv
+
+
+def _date_arg(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise CommandError(f"Invalid date {value!r}, use YYYY-MM-DD.")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Stream payments or sessions to CSV with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(EXPORT_DATASETS))
+        parser.add_argument("--start", type=_date_arg, help="First day to include (YYYY-MM-DD).")
+        parser.add_argument("--end", type=_date_arg, help="Last day to include (YYYY-MM-DD).")
+        parser.add_argument("-o", "--output", help="Destination file; defaults to stdout.")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output on the fly.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        stream = iter_csv(
+            options["dataset"],
+            start=options["start"],
+            end=options["end"],
+            chunk_size=options["chunk_size"],
+        )
+        if options["gzip"]:
+            stream = gzip_stream(stream)
+
+        if options["output"]:
+            with open(options["output"], "wb") as handle:
+                for chunk in stream:
+                    handle.write(chunk)
+        else:
+            for chunk in stream:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
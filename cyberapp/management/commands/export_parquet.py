@@ -0,0 +1,196 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cyberapp.models import Payment, Student, UsageSession
+
+
+STATE_FILE = "_watermarks.json"
+UNPARTITIONED = "all"
+
+
+def _month_of(value):
+    if value is None:
+        return UNPARTITIONED
+    if isinstance(value, datetime):
+        value = timezone.localtime(value)
+    return value.strftime("%Y-%m")
+
+
+class Command(BaseCommand):
+    help = (
+        "Incrementally export students, payments and sessions to Parquet, "
+        "partitioned by month (payments by date, sessions by start_time). "
+        "Requires pyarrow."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output_dir", help="Root directory of the Parquet dataset.")
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignore stored watermarks and rebuild every table, dropping deleted rows.",
+        )
+        parser.add_argument(
+            "--lookback-minutes",
+            type=int,
+            default=5,
+            help="Re-read this much history before each watermark to catch late commits.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise CommandError("export_parquet needs pyarrow: pip install pyarrow") from exc
+
+        self.pa, self.pc, self.pq = pa, pc, pq
+        root = Path(options["output_dir"])
+        root.mkdir(parents=True, exist_ok=True)
+        state_path = root / STATE_FILE
+        state = {} if options["full"] or not state_path.exists() else json.loads(state_path.read_text())
+        lookback = timedelta(minutes=options["lookback_minutes"])
+
+        money = pa.decimal128(10, 2)
+        stamp = pa.timestamp("us", tz="UTC")
+        # table -> (model, partition column or None, arrow schema)
+        tables = {
+            "students": (
+                Student,
+                None,
+                pa.schema([
+                    ("id", pa.int64()),
+                    ("firstname", pa.string()),
+                    ("lastname", pa.string()),
+                    ("idnumber", pa.string()),
+                    ("phonenumber", pa.string()),
+                    ("updated_at", stamp),
+                ]),
+            ),
+            "payments": (
+                Payment,
+                "date",
+                pa.schema([
+                    ("id", pa.int64()),
+                    ("student_id", pa.int64()),
+                    ("date", pa.date32()),
+                    ("amount", money),
+                    ("balance", money),
+                    ("mpesa_status", pa.string()),
+                    ("mpesa_receipt_number", pa.string()),
+                    ("mpesa_phone_number", pa.string()),
+                    ("updated_at", stamp),
+                ]),
+            ),
+            "sessions": (
+                UsageSession,
+                "start_time",
+                pa.schema([
+                    ("id", pa.int64()),
+                    ("student_id", pa.int64()),
+                    ("start_time", stamp),
+                    ("end_time", stamp),
+                    ("is_active", pa.bool_()),
+                    ("amount_charged", money),
+                    ("payment_status", pa.string()),
+                    ("mpesa_receipt_number", pa.string()),
+                    ("mpesa_phone_number", pa.string()),
+                    ("updated_at", stamp),
+                ]),
+            ),
+        }
+
+        for name, (model, partition_field, schema) in tables.items():
+            watermark = state.get(name)
+            since = datetime.fromisoformat(watermark) - lookback if watermark else None
+            table_dir = root / name
+            if options["full"]:
+                # rebuild beside the old copy so readers never see a half-written table
+                staging_dir = root / f"{name}.full"
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                exported, new_watermark = self._export_table(
+                    staging_dir, model, partition_field, schema, since, options["chunk_size"]
+                )
+                staging_dir.mkdir(exist_ok=True)
+                shutil.rmtree(table_dir, ignore_errors=True)
+                os.replace(staging_dir, table_dir)
+            else:
+                exported, new_watermark = self._export_table(
+                    table_dir, model, partition_field, schema, since, options["chunk_size"]
+                )
+            if new_watermark:
+                state[name] = new_watermark.isoformat()
+            self.stdout.write(f"{name}: {exported} row(s) exported")
+
+        tmp_state = state_path.with_suffix(".tmp")
+        tmp_state.write_text(json.dumps(state, indent=2))
+        os.replace(tmp_state, state_path)
+        self.stdout.write(self.style.SUCCESS(f"Parquet dataset updated in {root}"))
+
+    def _export_table(self, table_dir, model, partition_field, schema, since, chunk_size):
+        """
+        Pull rows changed since the watermark (one indexed range on
+        ``updated_at``), group them by month and merge each group into its
+        partition, removing older copies of the same ids from every
+        partition so a row whose date moved is not left behind.
+        """
+        columns = schema.names
+        queryset = model.objects.order_by("updated_at", "id").values_list(*columns)
+        if since is not None:
+            queryset = queryset.filter(updated_at__gt=since)
+
+        partitions = {}
+        watermark = None
+        exported = 0
+        for row in queryset.iterator(chunk_size=chunk_size):
+            record = dict(zip(columns, row))
+            month = _month_of(record[partition_field]) if partition_field else UNPARTITIONED
+            partitions.setdefault(month, []).append(record)
+            watermark = record["updated_at"]
+            exported += 1
+
+        if not partitions:
+            return exported, watermark
+        changed_ids = self.pa.array(
+            [record["id"] for records in partitions.values() for record in records], self.pa.int64()
+        )
+        for partition_dir in table_dir.glob("month=*"):
+            month = partition_dir.name.split("=", 1)[1]
+            if month not in partitions:
+                self._merge_partition(table_dir, month, schema, [], changed_ids)
+        for month, records in partitions.items():
+            self._merge_partition(table_dir, month, schema, records, changed_ids)
+        return exported, watermark
+
+    def _merge_partition(self, table_dir, month, schema, records, changed_ids):
+        pa, pc, pq = self.pa, self.pc, self.pq
+        partition_dir = table_dir / f"month={month}"
+        target = partition_dir / "data.parquet"
+
+        fresh = pa.Table.from_pylist(records, schema=schema)
+        if target.exists():
+            if not records:
+                # a partition the batch has no rows for: read only its ids
+                stored_ids = pq.read_table(target, columns=["id"])["id"]
+                if not pc.any(pc.is_in(stored_ids, value_set=changed_ids)).as_py():
+                    return
+            existing = pq.read_table(target, schema=schema)
+            keep = pc.invert(pc.is_in(existing["id"], value_set=changed_ids))
+            fresh = pa.concat_tables([existing.filter(keep), fresh])
+        if not fresh.num_rows:
+            shutil.rmtree(partition_dir, ignore_errors=True)
+            return
+        fresh = fresh.sort_by("id")
+
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        tmp_target = target.with_suffix(".tmp")
+        pq.write_table(fresh, tmp_target, compression="zstd")
+        os.replace(tmp_target, target)
@@ -0,0 +1,67 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cyberapp.forecast import DEFAULT_ALPHA, DEFAULT_HISTORY_WEEKS, DEFAULT_HORIZON_DAYS, forecast
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast expected concurrent machines and revenue per hour for the coming "
+        "days from hour-of-week seasonality in recent weeks. Requires numpy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=DEFAULT_HORIZON_DAYS, help="Horizon in days (default 14).")
+        parser.add_argument(
+            "--weeks",
+            type=int,
+            default=DEFAULT_HISTORY_WEEKS,
+            help="Complete weeks of history to learn from (default 8).",
+        )
+        parser.add_argument(
+            "--alpha",
+            type=float,
+            default=DEFAULT_ALPHA,
+            help="Smoothing factor for the weekly level, 0-1; higher reacts faster (default 0.3).",
+        )
+        parser.add_argument("--hourly", action="store_true", help="Print every hour instead of a daily summary.")
+        parser.add_argument("--json", action="store_true", help="Print the hourly forecast as JSON.")
+
+    def handle(self, *args, **options):
+        if options["days"] < 1 or options["weeks"] < 1:
+            raise CommandError("--days and --weeks must be at least 1.")
+        if not 0 < options["alpha"] <= 1:
+            raise CommandError("--alpha must be in (0, 1].")
+
+        started = time.perf_counter()
+        hours, occupancy, revenue = forecast(options["days"], options["weeks"], options["alpha"])
+        elapsed = time.perf_counter() - started
+
+        if options["json"]:
+            self.stdout.write(json.dumps([
+                {"hour": hour.isoformat(), "occupancy": round(float(busy), 2), "revenue": round(float(amount), 2)}
+                for hour, busy, amount in zip(hours, occupancy, revenue)
+            ], indent=2))
+            return
+
+        if options["hourly"]:
+            self.stdout.write(f"{'Hour':<17} {'Machines':>8} {'Revenue':>10}")
+            for hour, busy, amount in zip(hours, occupancy, revenue):
+                self.stdout.write(f"{hour:%Y-%m-%d %H:%M} {busy:>8.2f} {amount:>10.2f}")
+        else:
+            self.stdout.write(f"{'Day':<14} {'Avg busy':>8} {'Peak hour':>9} {'Peak busy':>9} {'Revenue':>10}")
+            for first in range(0, len(hours), 24):
+                day = slice(first, first + 24)
+                peak = first + int(occupancy[day].argmax())
+                peak_hour = f"{hours[peak]:%H:%M}"
+                self.stdout.write(
+                    f"{hours[first]:%a %Y-%m-%d} {occupancy[day].mean():>8.2f} {peak_hour:>9} "
+                    f"{occupancy[peak]:>9.2f} {revenue[day].sum():>10.2f}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast for {options['days']} day(s) from {options['weeks']} week(s) of history "
+            f"in {elapsed * 1000:.0f} ms"
+        ))
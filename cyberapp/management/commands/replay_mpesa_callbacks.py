@@ -0,0 +1,122 @@
+import json
+import sys
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from cyberapp.models import MpesaCallback
+from cyberapp.mpesa import (
+    CALLBACK_DUPLICATE,
+    CALLBACK_INVALID,
+    apply_stk_callback,
+    extract_stk_callback,
+    process_stk_callback,
+)
+
+
+def _iter_payloads(handle):
+    """
+    Yield callback bodies from a JSON document, a JSON array, or JSON lines.
+    """
+    text = handle.read()
+    stripped = text.lstrip()
+    if not stripped:
+        return
+    if stripped[0] == "[":
+        yield from json.loads(stripped)
+        return
+    try:
+        yield json.loads(stripped)
+    except json.JSONDecodeError:
+        for line in text.splitlines():
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-feed archived M-Pesa STK callback payloads (JSON, JSON array or JSON lines) "
+        "through the same dedupe-and-apply path as /mpesa/callback/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*", help="Archive files to replay; '-' reads stdin.")
+        parser.add_argument(
+            "--from-db",
+            action="store_true",
+            help="Re-apply every payload already stored in the MpesaCallback log.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true", help="Roll back instead of committing.")
+
+    def handle(self, *args, **options):
+        paths = options["paths"]
+        if not paths and not options["from_db"]:
+            raise CommandError("Pass at least one archive path or --from-db.")
+
+        batch_size = max(1, options["batch_size"])
+        counts = Counter()
+
+        if options["from_db"]:
+            payloads = (
+                MpesaCallback.objects.order_by("pk")
+                .values_list("payload", flat=True)
+                .iterator(chunk_size=batch_size)
+            )
+            self._replay(payloads, batch_size, counts, options["dry_run"], reapply=True)
+
+        for path in paths:
+            try:
+                handle = sys.stdin if path == "-" else open(path, encoding="utf-8")
+            except OSError as exc:
+                raise CommandError(str(exc)) from exc
+            with handle:
+                try:
+                    self._replay(_iter_payloads(handle), batch_size, counts, options["dry_run"])
+                except json.JSONDecodeError as exc:
+                    raise CommandError(f"{path}: {exc}") from exc
+
+        summary = ", ".join(f"{key}={counts[key]}" for key in sorted(counts)) or "nothing to replay"
+        self.stdout.write(self.style.SUCCESS(f"Replay finished: {summary}"))
+
+    def _replay(self, payloads, batch_size, counts, dry_run, reapply=False):
+        batch = []
+        for payload in payloads:
+            batch.append(payload)
+            if len(batch) >= batch_size:
+                self._flush(batch, counts, dry_run, reapply)
+                batch = []
+        if batch:
+            self._flush(batch, counts, dry_run, reapply)
+
+    def _flush(self, batch, counts, dry_run, reapply):
+        """
+        Apply one batch inside a single transaction; each callback still gets
+        its own savepoint so a duplicate never aborts its neighbours.
+        """
+        known = set()
+        if not reapply:
+            checkout_ids = {extract_stk_callback(body).get("CheckoutRequestID") for body in batch}
+            checkout_ids.discard(None)
+            known = set(
+                MpesaCallback.objects.filter(checkout_request_id__in=checkout_ids)
+                .values_list("checkout_request_id", flat=True)
+            )
+
+        with transaction.atomic():
+            for body in batch:
+                callback = extract_stk_callback(body)
+                checkout_request_id = callback.get("CheckoutRequestID")
+                if not checkout_request_id:
+                    counts[CALLBACK_INVALID] += 1
+                elif reapply:
+                    counts["applied" if apply_stk_callback(callback) else "unknown"] += 1
+                elif checkout_request_id in known:
+                    counts[CALLBACK_DUPLICATE] += 1
+                else:
+                    known.add(checkout_request_id)
+                    counts[process_stk_callback(body)] += 1
+            if dry_run:
+                transaction.set_rollback(True)
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+OUTPUT = Path(settings.BASE_DIR) / "cyberapp" / "static" / "fonts" / "inter-latin.woff2"
+# keep in sync with the unicode-range of the @font-face rule in styles.css
+UNICODE_RANGES = (
+    (0x0020, 0x007E),  # Basic Latin
+    (0x00A0, 0x017F),  # Latin-1 Supplement, Latin Extended-A (student names)
+    (0x2013, 0x2014),  # en/em dash
+    (0x2018, 0x201E),  # curly quotes
+    (0x2022, 0x2022),  # bullet
+    (0x2026, 0x2026),  # ellipsis
+    (0x20AC, 0x20AC),  # euro sign
+    (0x2190, 0x2193),  # arrows used in pagers and sort links
+    (0x2212, 0x2212),  # minus
+)
+WEIGHTS = (400, 700)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the vendored Inter font (static/fonts/inter-latin.woff2) from an "
+        "Inter variable TTF: keep only the glyphs the UI uses and the 400-700 "
+        "weight range. Requires fonttools and brotli."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Path to an Inter variable font (.ttf).")
+        parser.add_argument("--output", default=str(OUTPUT))
+
+    def handle(self, *args, **options):
+        try:
+            from fontTools import subset
+            from fontTools.ttLib import TTFont
+            from fontTools.varLib import instancer
+        except ImportError as exc:
+            raise CommandError("subset_font needs fonttools: pip install fonttools brotli") from exc
+
+        font = TTFont(options["source"])
+        if "fvar" not in font:
+            raise CommandError(f"{options['source']} is not a variable font.")
+        limits = {"wght": WEIGHTS}
+        # pin every other axis (slant, optical size) to its default
+        limits.update({axis.axisTag: None for axis in font["fvar"].axes if axis.axisTag != "wght"})
+        font = instancer.instantiateVariableFont(font, limits)
+
+        subset_options = subset.Options()
+        subset_options.flavor = "woff2"
+        subset_options.layout_features = ["kern", "liga", "calt", "tnum"]
+        # the name table carries the OFL copyright and licence notices
+        subset_options.name_IDs = ["*"]
+        subsetter = subset.Subsetter(subset_options)
+        subsetter.populate(unicodes=[code for low, high in UNICODE_RANGES for code in range(low, high + 1)])
+        subsetter.subset(font)
+
+        output = Path(options["output"])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        font.flavor = "woff2"
+        font.save(output)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output} ({output.stat().st_size / 1024:.1f} KiB, "
+            f"{len(font.getGlyphOrder())} glyphs)"
+        ))
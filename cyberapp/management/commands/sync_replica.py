@@ -0,0 +1,33 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from cyberapp.routers import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the default SQLite database over the replica SQLite file, to "
+        "stand in for replication when trying DATABASE_REPLICA_URL locally."
+    )
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in connections:
+            raise CommandError("No replica configured; set DATABASE_REPLICA_URL.")
+        paths = []
+        for alias in (DEFAULT_DB_ALIAS, REPLICA_ALIAS):
+            connection = connections[alias]
+            if connection.vendor != "sqlite" or connection.is_in_memory_db():
+                raise CommandError(f"sync_replica only copies between SQLite files; {alias!r} is not one.")
+            paths.append(str(connection.settings_dict["NAME"]))
+            connection.close()
+
+        # the backup API copies a consistent snapshot while the primary is in use
+        primary, replica = (sqlite3.connect(path) for path in paths)
+        try:
+            primary.backup(replica)
+        finally:
+            replica.close()
+            primary.close()
+        self.stdout.write(self.style.SUCCESS(f"Copied {paths[0]} to {paths[1]}."))
@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.utils import timezone
+
+from cyberapp.models import Student
+
+
+# stored column -> recomputed annotation from Student.objects.with_lifetime_totals()
+CHECKED_FIELDS = {
+    "last_seen": "lifetime_last_seen",
+    "total_time": "lifetime_time",
+    "total_charged": "lifetime_charged",
+    "total_paid": "lifetime_paid",
+    "open_balance": "lifetime_balance",
+}
+ADDITIVE_FIELDS = ("total_time", "total_charged", "total_paid", "open_balance")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every student's lifetime stats from sessions and payments and "
+        "report rows whose denormalized columns have drifted. --fix repairs them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Write the recomputed values back.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--show",
+            type=int,
+            default=20,
+            help="Print at most this many drifted students (default 20).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        students = (
+            Student.objects.with_lifetime_totals()
+            .only("idnumber", *CHECKED_FIELDS)
+            .order_by("pk")
+        )
+
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            # keyset batches rather than iterator(): --fix writes to the table being read
+            batch = list(students.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            checked += len(batch)
+            for student in batch:
+                diffs = {
+                    field: (getattr(student, field), getattr(student, annotation))
+                    for field, annotation in CHECKED_FIELDS.items()
+                    if getattr(student, field) != getattr(student, annotation)
+                }
+                if not diffs:
+                    continue
+                drifted += 1
+                if drifted <= options["show"]:
+                    details = ", ".join(
+                        f"{field} {stored} != {expected}" for field, (stored, expected) in diffs.items()
+                    )
+                    self.stdout.write(f"{student.idnumber}: {details}")
+                if options["fix"]:
+                    self._repair(student.pk, diffs)
+
+        summary = f"{checked} student(s) checked, {drifted} drifted"
+        if drifted and options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"{summary}, all repaired"))
+        elif drifted:
+            raise CommandError(f"{summary}; rerun with --fix to repair")
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def _repair(self, student_id, diffs):
+        """
+        Apply the correction as a delta on top of the current value, so
+        sessions ended while the check was running are not lost.
+        """
+        fields = {"updated_at": timezone.now()}
+        for field, (stored, expected) in diffs.items():
+            if field in ADDITIVE_FIELDS:
+                fields[field] = F(field) + (expected - stored)
+            else:
+                fields[field] = expected
+        Student.objects.filter(pk=student_id).update(**fields)
@@ -0,0 +1,62 @@
+import os
+import threading
+from collections import defaultdict
+
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+# name -> [count, total, max]
+_timings = {}
+# callables returning {name: value} read at snapshot time
+_gauge_sources = []
+
+
+def incr(name, value=1):
+    """Add ``value`` to the counter ``name``."""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, value):
+    """Record one sample (a duration in ms, a ratio, a size) under ``name``."""
+    with _lock:
+        summary = _timings.setdefault(name, [0, 0.0, 0.0])
+        summary[0] += 1
+        summary[1] += value
+        summary[2] = max(summary[2], value)
+
+
+def register_gauges(source):
+    """
+    Report the ``{name: value}`` dict returned by ``source()`` in every
+    snapshot, for state another component already counts.
+    """
+    if source not in _gauge_sources:
+        _gauge_sources.append(source)
+
+
+def snapshot():
+    """
+    Counters and sample summaries recorded by this worker process since it
+    started, plus the registered gauges. Each gunicorn worker keeps its own;
+    ``pid`` tells them apart.
+    """
+    gauges = {}
+    for source in _gauge_sources:
+        gauges.update(source())
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "counters": dict(_counters),
+            "samples": {
+                name: {"count": count, "total": round(total, 3), "avg": round(total / count, 3), "max": round(peak, 3)}
+                for name, (count, total, peak) in _timings.items()
+            },
+            "gauges": gauges,
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
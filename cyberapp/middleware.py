@@ -0,0 +1,240 @@
+import logging
+import re
+import time
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from . import metrics, timing
+
+try:
+    import brotli
+except ImportError:  # gzip only; pip install Brotli to offer br
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+_ACCEPT_ENCODING = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*")
+
+
+def accepted_encodings(header):
+    """Encodings in an ``Accept-Encoding`` header with a non-zero q-value."""
+    accepted = set()
+    for part in header.split(","):
+        match = _ACCEPT_ENCODING.fullmatch(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        if quality > 0:
+            accepted.add(match.group(1).lower())
+    return accepted
+
+
+class _Compressor:
+    """Incremental gzip or Brotli compressor that tracks bytes and CPU time."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._engine = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self._compress, self._finish = self._engine.process, self._engine.finish
+        else:
+            self._engine = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress, self._finish = self._engine.compress, self._engine.flush
+        self.bytes_in = self.bytes_out = 0
+        self.cpu = 0.0
+
+    def _timed(self, method, *args):
+        started = time.thread_time()
+        data = method(*args)
+        self.cpu += time.thread_time() - started
+        self.bytes_out += len(data)
+        return data
+
+    def compress(self, data):
+        self.bytes_in += len(data)
+        return self._timed(self._compress, data)
+
+    def finish(self):
+        data = self._timed(self._finish)
+        metrics.incr(f"compression.{self.encoding}.responses")
+        metrics.incr(f"compression.{self.encoding}.bytes_in", self.bytes_in)
+        metrics.incr(f"compression.{self.encoding}.bytes_out", self.bytes_out)
+        metrics.observe(f"compression.{self.encoding}.cpu_ms", self.cpu * 1000)
+        if self.bytes_in:
+            metrics.observe(f"compression.{self.encoding}.ratio", self.bytes_out / self.bytes_in)
+        return data
+
+
+class CompressionMiddleware:
+    """
+    Compress dynamic HTML/JSON/CSV responses with Brotli (when installed and
+    accepted) or gzip, per ``Accept-Encoding``. Bodies below
+    ``COMPRESSION_MIN_SIZE`` are sent as-is; streaming responses are
+    compressed chunk by chunk. Bytes saved and CPU time per encoding go to
+    ``cyberapp.metrics``. Runs natively under both WSGI and ASGI.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._compress_response(request, await self.get_response(request))
+
+    def _compress_response(self, request, response):
+        encoding = self._negotiate(request, response)
+        if encoding is None:
+            return response
+        if response.status_code == 304:
+            # revalidating a compressed copy: echo the ETag it was sent with
+            self._weaken_etag(response)
+            return response
+
+        compressor = _Compressor(encoding)
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self._compress_async(compressor, response.streaming_content)
+            else:
+                response.streaming_content = self._compress_stream(compressor, response.streaming_content)
+            del response.headers["Content-Length"]
+        else:
+            compressed = compressor.compress(response.content) + compressor.finish()
+            if len(compressed) >= len(response.content):
+                metrics.incr("compression.skipped.no_gain")
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        self._weaken_etag(response)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    @staticmethod
+    def _weaken_etag(response):
+        # a compressed body is a different byte sequence than the one a
+        # strong ETag was computed for
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+    def _negotiate(self, request, response):
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if response.has_header("Content-Encoding") or response.status_code == 204:
+            return None
+        if response.status_code != 304:
+            if not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES):
+                return None
+            if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                metrics.incr("compression.skipped.small")
+                return None
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    @staticmethod
+    def _compress_stream(compressor, chunks):
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+    @staticmethod
+    async def _compress_async(compressor, chunks):
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ServerTimingMiddleware:
+    """
+    Report each request's query count, DB time, template render time and
+    external HTTP (Daraja) time in a ``Server-Timing`` header, and log
+    requests over ``SERVER_TIMING_BUDGETS``. Removed from the stack unless
+    ``SERVER_TIMING`` is on. Queries run while a streaming response is
+    consumed are not included.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budgets = settings.SERVER_TIMING_BUDGETS
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        timings, token = timing.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        return self._report(request, response, timings, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        timings, token = timing.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.stop(token)
+        return self._report(request, response, timings, started)
+
+    def _report(self, request, response, timings, started):
+        total = (time.perf_counter() - started) * 1000
+        durations = timings.durations
+        response.headers["Server-Timing"] = ", ".join([
+            f'db;dur={durations["db"]:.1f};desc="{timings.queries} queries"',
+            f"tpl;dur={durations['tpl']:.1f}",
+            f"http;dur={durations['http']:.1f}",
+            f"total;dur={total:.1f}",
+        ])
+
+        measured = {**durations, "total": total, "queries": timings.queries}
+        over = [
+            f"{name} {measured[name]:.0f} > {budget}"
+            for name, budget in self.budgets.items()
+            if budget is not None and measured.get(name, 0) > budget
+        ]
+        if over:
+            metrics.incr("server_timing.over_budget")
+            logger.warning(
+                "Over budget: %s %s (%s) took %.0f ms, %d queries in %.0f ms, tpl %.0f ms, http %.0f ms",
+                request.method,
+                request.get_full_path(),
+                ", ".join(over),
+                total,
+                timings.queries,
+                durations["db"],
+                durations["tpl"],
+                durations["http"],
+            )
+        return response
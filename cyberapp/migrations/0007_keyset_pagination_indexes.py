@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cyberapp', '0006_mpesacallback_and_checkout_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-date', '-id'], name='payment_date_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['lastname', 'firstname', 'id'], name='student_name_seek_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cyberapp', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usagesession',
+            index=models.Index(fields=['start_time', 'id'], name='session_start_idx'),
+        ),
+    ]
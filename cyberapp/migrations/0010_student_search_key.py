@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:26
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copies of cyberapp.models helpers as of this migration, so later changes
+# to them don't alter what the backfill writes.
+def normalize_search_text(value):
+    value = unicodedata.normalize("NFKD", str(value or ""))
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[\W_]+", " ", value.lower()).split())
+
+
+def phone_search_variants(phone):
+    digits = re.sub(r"\D", "", str(phone or ""))
+    if not digits:
+        return []
+    variants = [digits]
+    if digits.startswith("254"):
+        variants.append(f"0{digits[3:]}")
+    elif digits.startswith("0"):
+        variants.append(f"254{digits[1:]}")
+    elif len(digits) == 9 and digits.startswith("7"):
+        variants.extend([f"0{digits}", f"254{digits}"])
+    return variants
+
+
+def backfill_search_key(apps, schema_editor):
+    Student = apps.get_model('cyberapp', 'Student')
+    students = list(Student.objects.using(schema_editor.connection.alias).all())
+    for student in students:
+        parts = [student.firstname, student.lastname, student.idnumber, *phone_search_variants(student.phonenumber)]
+        student.search_key = " " + normalize_search_text(" ".join(str(part) for part in parts if part))
+    Student.objects.using(schema_editor.connection.alias).bulk_update(students, ['search_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cyberapp', '0009_updated_at_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='search_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=160),
+        ),
+        migrations.RunPython(backfill_search_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cyberapp', '0010_student_search_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['student', '-date', '-id'], name='payment_student_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usagesession',
+            index=models.Index(fields=['student', '-start_time', '-id'], name='session_student_seek_idx'),
+        ),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:33
+
+import datetime
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+STATS_FIELDS = ['last_seen', 'total_time', 'total_charged', 'total_paid', 'open_balance']
+BATCH_SIZE = 2000
+# Payment.SETTLED_STATUSES as of this migration
+SETTLED_STATUSES = ('paid', 'not_requested')
+
+
+def _student_total(queryset, expression, output_field):
+    total = (
+        queryset.filter(student=OuterRef('pk'))
+        .order_by()
+        .values('student')
+        .annotate(total=Sum(expression, output_field=output_field))
+        .values('total')
+    )
+    return Subquery(total, output_field=output_field)
+
+
+def lifetime_total_annotations(UsageSession, Payment):
+    # a copy of cyberapp.models.lifetime_total_annotations as of this
+    # migration, so later changes to the model helpers don't alter it
+    money = models.DecimalField(max_digits=12, decimal_places=2)
+    duration = models.DurationField()
+    zero = Value(Decimal('0.00'), output_field=money)
+    ended = UsageSession.objects.filter(end_time__isnull=False)
+
+    total_charged = Coalesce(_student_total(ended, F('amount_charged'), money), zero)
+    paid_payments = Coalesce(
+        _student_total(Payment.objects.filter(mpesa_status__in=SETTLED_STATUSES), F('amount'), money), zero
+    )
+    paid_sessions = Coalesce(_student_total(ended.filter(payment_status='paid'), F('amount_charged'), money), zero)
+    last_seen = (
+        UsageSession.objects.filter(student=OuterRef('pk'))
+        .order_by()
+        .values('student')
+        .annotate(last=Max(Coalesce('end_time', 'start_time')))
+        .values('last')
+    )
+    return {
+        'lifetime_time': Coalesce(
+            _student_total(ended, ExpressionWrapper(F('end_time') - F('start_time'), output_field=duration), duration),
+            Value(datetime.timedelta(0), output_field=duration),
+        ),
+        'lifetime_charged': total_charged,
+        'lifetime_paid': ExpressionWrapper(paid_payments + paid_sessions, output_field=money),
+        'lifetime_balance': ExpressionWrapper(total_charged - paid_payments - paid_sessions, output_field=money),
+        'lifetime_last_seen': Subquery(last_seen, output_field=models.DateTimeField()),
+    }
+
+
+def backfill_lifetime_stats(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Student = apps.get_model('cyberapp', 'Student')
+    students = Student.objects.using(alias).annotate(**lifetime_total_annotations(
+        apps.get_model('cyberapp', 'UsageSession'),
+        apps.get_model('cyberapp', 'Payment'),
+    )).order_by('pk')
+    # walk by pk rather than iterator(): SQLite gives no isolation between a
+    # cursor and writes to the same table on one connection
+    last_pk = 0
+    while True:
+        batch = list(students.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for student in batch:
+            student.last_seen = student.lifetime_last_seen
+            student.total_time = student.lifetime_time
+            student.total_charged = student.lifetime_charged
+            student.total_paid = student.lifetime_paid
+            student.open_balance = student.lifetime_balance
+        Student.objects.using(alias).bulk_update(batch, STATS_FIELDS, batch_size=250)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cyberapp', '0011_student_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='open_balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='total_charged',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='total_time',
+            field=models.DurationField(default=datetime.timedelta(0), editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['-last_seen', '-id'], name='student_last_seen_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['-total_time', '-id'], name='student_total_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['-open_balance', '-id'], name='student_open_balance_idx'),
+        ),
+        migrations.RunPython(backfill_lifetime_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cyberapp', '0012_student_lifetime_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['date', 'id', 'student', 'amount', 'mpesa_status'], name='payment_ledger_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['student', 'date', 'id', 'amount', 'mpesa_status'], name='payment_ledger_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usagesession',
+            index=models.Index(fields=['end_time', 'id', 'student', 'amount_charged', 'payment_status'], name='session_ledger_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usagesession',
+            index=models.Index(fields=['student', 'end_time', 'id', 'amount_charged', 'payment_status'], name='session_ledger_student_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cyberapp', '0013_ledger_covering_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mpesacallback',
+            name='received_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
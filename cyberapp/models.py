@@ -1,14 +1,180 @@
+import re
+import unicodedata
+from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
 
 from django.db import models
+from django.db.models import DecimalField, DurationField, ExpressionWrapper, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 
+def normalize_search_text(value):
+    """
+    Lowercase, strip accents and collapse punctuation/whitespace so search
+    terms and stored keys compare the same way.
+    """
+    value = unicodedata.normalize("NFKD", str(value or ""))
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[\W_]+", " ", value.lower()).split())
+
+
+def phone_search_variants(phone):
+    """
+    Local (07...) and international (2547...) spellings of one number.
+    """
+    digits = re.sub(r"\D", "", str(phone or ""))
+    if not digits:
+        return []
+    variants = [digits]
+    if digits.startswith("254"):
+        variants.append(f"0{digits[3:]}")
+    elif digits.startswith("0"):
+        variants.append(f"254{digits[1:]}")
+    elif len(digits) == 9 and digits.startswith("7"):
+        variants.extend([f"0{digits}", f"254{digits}"])
+    return variants
+
+
+def _student_total(queryset, expression, output_field):
+    """
+    Correlated ``SUM`` for one student, so several totals can be annotated
+    onto a Student query without join fan-out.
+    """
+    total = (
+        queryset.filter(student=OuterRef("pk"))
+        .order_by()
+        .values("student")
+        .annotate(total=Sum(expression, output_field=output_field))
+        .values("total")
+    )
+    return Subquery(total, output_field=output_field)
+
+
+def lifetime_total_annotations(session_model, payment_model):
+    """
+    ``lifetime_time``, ``lifetime_charged``, ``lifetime_paid``,
+    ``lifetime_balance`` and ``lifetime_last_seen`` as correlated subqueries.
+
+    Charges are ended sessions. Paid means settled payments (M-Pesa
+    confirmed, or recorded without an STK request) plus sessions paid
+    directly by STK. Takes the models so migrations can pass historical ones.
+    """
+    money = DecimalField(max_digits=12, decimal_places=2)
+    zero = Value(Decimal("0.00"), output_field=money)
+    ended = session_model.objects.filter(end_time__isnull=False)
+
+    total_charged = Coalesce(_student_total(ended, F("amount_charged"), money), zero)
+    paid_payments = Coalesce(
+        _student_total(
+            payment_model.objects.filter(mpesa_status__in=Payment.SETTLED_STATUSES), F("amount"), money
+        ),
+        zero,
+    )
+    paid_sessions = Coalesce(
+        _student_total(ended.filter(payment_status="paid"), F("amount_charged"), money),
+        zero,
+    )
+    last_seen = (
+        session_model.objects.filter(student=OuterRef("pk"))
+        .order_by()
+        .values("student")
+        .annotate(last=Max(Coalesce("end_time", "start_time")))
+        .values("last")
+    )
+    return {
+        "lifetime_time": Coalesce(
+            _student_total(
+                ended,
+                ExpressionWrapper(F("end_time") - F("start_time"), output_field=DurationField()),
+                DurationField(),
+            ),
+            Value(timedelta(0), output_field=DurationField()),
+        ),
+        "lifetime_charged": total_charged,
+        "lifetime_paid": ExpressionWrapper(paid_payments + paid_sessions, output_field=money),
+        "lifetime_balance": ExpressionWrapper(total_charged - paid_payments - paid_sessions, output_field=money),
+        "lifetime_last_seen": Subquery(last_seen, output_field=models.DateTimeField()),
+    }
+
+
+class VersionedQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        ``update()`` sends no signals, so bump the data version here like
+        the post_save/post_delete receivers do for saves and deletes.
+        """
+        updated = super().update(**kwargs)
+        if updated:
+            from .versioning import bump_data_version
+
+            bump_data_version(using=self.db)
+        return updated
+
+    update.alters_data = True
+
+
+class StudentQuerySet(VersionedQuerySet):
+    def with_lifetime_totals(self):
+        """
+        Annotate the recomputed lifetime totals (see
+        ``lifetime_total_annotations``) in the same SELECT as the students
+        themselves; the source of truth for the denormalized stat columns.
+        """
+        return self.annotate(**lifetime_total_annotations(UsageSession, Payment))
+
+
 class Student(models.Model):
     firstname = models.CharField(max_length=20)
     lastname = models.CharField(max_length=20)
     idnumber = models.CharField(max_length=20, unique=True)
     phonenumber = models.CharField(max_length=15)  # store as string to keep leading zeros
+    # change tracking for incremental exports; set explicitly in queryset update()s
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # normalized " first last id phone..." text; indexed by cyberapp.search
+    search_key = models.CharField(max_length=160, blank=True, default="", editable=False)
+    # Denormalized lifetime stats for sorting the roster. Maintained with F()
+    # updates by cyberapp.stats; `manage.py verify_student_stats` recomputes them.
+    last_seen = models.DateTimeField(null=True, blank=True, editable=False)
+    total_time = models.DurationField(default=timedelta(0), editable=False)
+    total_charged = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    open_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+
+    STATS_FIELDS = ("last_seen", "total_time", "total_charged", "total_paid", "open_balance")
+
+    objects = StudentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # keyset pagination for students_list
+            models.Index(fields=["lastname", "firstname", "id"], name="student_name_seek_idx"),
+            # roster sorts: "last visit", "total hours", "amount owed"
+            models.Index(fields=["-last_seen", "-id"], name="student_last_seen_idx"),
+            models.Index(fields=["-total_time", "-id"], name="student_total_time_idx"),
+            models.Index(fields=["-open_balance", "-id"], name="student_open_balance_idx"),
+        ]
+
+    def build_search_key(self):
+        parts = [self.firstname, self.lastname, self.idnumber, *phone_search_variants(self.phonenumber)]
+        # leading space lets "contains ' term'" act as a word-prefix match
+        return " " + normalize_search_text(" ".join(str(part) for part in parts if part))
+
+    def save(self, *args, **kwargs):
+        self.search_key = self.build_search_key()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None and not self._state.adding:
+            # a form save must not write back stats loaded before a concurrent F() update
+            update_fields = kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.STATS_FIELDS
+            ]
+        if update_fields is not None and "search_key" not in update_fields:
+            kwargs["update_fields"] = [*update_fields, "search_key"]
+        super().save(*args, **kwargs)
+
+    def total_hours(self):
+        return self.total_time.total_seconds() / 3600
 
     def __str__(self):
         return f"{self.firstname} {self.lastname} {self.idnumber}"
@@ -26,6 +192,8 @@ class Payment(models.Model):
         (STATUS_PAID, "Paid"),
         (STATUS_FAILED, "Failed"),
     ]
+    # money actually received: confirmed by M-Pesa, or recorded without an STK request
+    SETTLED_STATUSES = (STATUS_PAID, STATUS_NOT_REQUESTED)
 
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     balance = models.DecimalField(max_digits=10, decimal_places=2)
@@ -36,9 +204,25 @@ class Payment(models.Model):
         choices=PAYMENT_STATUS_CHOICES,
         default=STATUS_NOT_REQUESTED,
     )
-    mpesa_checkout_request_id = models.CharField(max_length=64, blank=True, null=True)
+    mpesa_checkout_request_id = models.CharField(max_length=64, blank=True, null=True, db_index=True)
     mpesa_receipt_number = models.CharField(max_length=32, blank=True, null=True)
     mpesa_phone_number = models.CharField(max_length=15, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # keyset pagination for payment_list
+            models.Index(fields=["-date", "-id"], name="payment_date_seek_idx"),
+            # per-student history on student_detail
+            models.Index(fields=["student", "-date", "-id"], name="payment_student_seek_idx"),
+            # covering indexes for the running-balance ledger (cyberapp.ledger)
+            models.Index(fields=["date", "id", "student", "amount", "mpesa_status"], name="payment_ledger_idx"),
+            models.Index(
+                fields=["student", "date", "id", "amount", "mpesa_status"], name="payment_ledger_student_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.student.firstname} - {self.amount}"
@@ -60,9 +244,28 @@ class UsageSession(models.Model):
     is_active = models.BooleanField(default=True)
     amount_charged = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default="not_requested")
-    mpesa_checkout_request_id = models.CharField(max_length=64, blank=True, null=True)
+    mpesa_checkout_request_id = models.CharField(max_length=64, blank=True, null=True, db_index=True)
     mpesa_receipt_number = models.CharField(max_length=32, blank=True, null=True)
     mpesa_phone_number = models.CharField(max_length=15, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # date-range exports and reports
+            models.Index(fields=["start_time", "id"], name="session_start_idx"),
+            # per-student history on student_detail
+            models.Index(fields=["student", "-start_time", "-id"], name="session_student_seek_idx"),
+            # covering indexes for the running-balance ledger (cyberapp.ledger)
+            models.Index(
+                fields=["end_time", "id", "student", "amount_charged", "payment_status"], name="session_ledger_idx"
+            ),
+            models.Index(
+                fields=["student", "end_time", "id", "amount_charged", "payment_status"],
+                name="session_ledger_student_idx",
+            ),
+        ]
 
     def duration_in_hours(self):
         """
@@ -90,4 +293,38 @@ class UsageSession(models.Model):
         return self.billable_amount()
 
     def __str__(self):
-        return f"{self.student.firstname} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.student.firstname} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
+
+
+class MpesaCallback(models.Model):
+    """
+    Append-only log of every distinct STK callback Safaricom delivered.
+
+    The unique indexes on ``checkout_request_id`` and ``receipt_number`` are the
+    dedupe key: a redelivered callback fails the insert and is acknowledged
+    without touching ``UsageSession``/``Payment`` again. The raw ``payload`` is
+    kept so callbacks can be replayed after a restore.
+    """
+    checkout_request_id = models.CharField(max_length=64, unique=True)
+    receipt_number = models.CharField(max_length=32, unique=True, blank=True, null=True)
+    result_code = models.IntegerField(null=True, blank=True)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    objects = VersionedQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.checkout_request_id} ({self.result_code})"
+
+
+class DataVersion(models.Model):
+    """
+    Single-row change counter for the shop data, bumped on every write (see
+    ``cyberapp.versioning``). Page ETags derive from it, so an unchanged
+    dashboard can answer ``304`` before running any of its queries.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"v{self.version} at {self.changed_at:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,149 @@
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import MpesaCallback, Payment, UsageSession
+from .stats import (
+    PAYMENT_STATS_FIELDS,
+    SESSION_STATS_FIELDS,
+    record_payment_change,
+    record_session_change,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+CALLBACK_APPLIED = "applied"
+CALLBACK_DUPLICATE = "duplicate"
+CALLBACK_UNKNOWN = "unknown"
+CALLBACK_INVALID = "invalid"
+
+
+def extract_stk_callback(body):
+    """
+    Pull the ``stkCallback`` dict out of a Daraja callback body.
+    """
+    if not isinstance(body, dict):
+        return {}
+    return body.get('Body', {}).get('stkCallback', {}) or {}
+
+
+def callback_metadata(callback):
+    items = callback.get('CallbackMetadata', {}).get('Item', [])
+    return {item.get('Name'): item.get('Value') for item in items if item.get('Name')}
+
+
+def apply_stk_callback(callback):
+    """
+    Write the outcome of an STK callback onto the matching session or payment.
+
+    Uses queryset ``update()`` so only the few columns needed for the
+    student's lifetime stats are read; returns the number of rows touched (0
+    when the CheckoutRequestID is unknown).
+    """
+    checkout_request_id = callback.get('CheckoutRequestID')
+    result_code = callback.get('ResultCode')
+
+    if result_code == 0:
+        metadata_map = callback_metadata(callback)
+        receipt_number = metadata_map.get('MpesaReceiptNumber')
+        phone_number = metadata_map.get('PhoneNumber')
+        amount_value = metadata_map.get('Amount')
+
+        session_fields = {'payment_status': 'paid', 'mpesa_receipt_number': receipt_number}
+        payment_fields = {'mpesa_status': Payment.STATUS_PAID, 'mpesa_receipt_number': receipt_number}
+        if phone_number:
+            session_fields['mpesa_phone_number'] = str(phone_number)
+            payment_fields['mpesa_phone_number'] = str(phone_number)
+        if amount_value is not None:
+            try:
+                session_fields['amount_charged'] = Decimal(str(amount_value))
+            except InvalidOperation:
+                pass
+    else:
+        session_fields = {'payment_status': 'failed'}
+        payment_fields = {'mpesa_status': Payment.STATUS_FAILED}
+        logger.info(
+            "STK payment failed for checkout %s: %s",
+            checkout_request_id,
+            callback.get('ResultDesc', 'Payment failed'),
+        )
+
+    now = timezone.now()
+    session_fields['updated_at'] = now
+    payment_fields['updated_at'] = now
+
+    updated = _update_with_stats(
+        UsageSession.objects.filter(mpesa_checkout_request_id=checkout_request_id),
+        session_fields,
+        SESSION_STATS_FIELDS,
+        record_session_change,
+    )
+    if not updated:
+        updated = _update_with_stats(
+            Payment.objects.filter(mpesa_checkout_request_id=checkout_request_id),
+            payment_fields,
+            PAYMENT_STATS_FIELDS,
+            record_payment_change,
+        )
+    if not updated:
+        logger.warning("Received callback for unknown CheckoutRequestID %s", checkout_request_id)
+    return updated
+
+
+def _update_with_stats(queryset, fields, stats_fields, record_change):
+    """
+    ``update()`` the rows, then fold the change into the owning students'
+    lifetime stats. Rows are locked first so the before/after pair is exact;
+    callers run inside a transaction.
+    """
+    before = list(queryset.select_for_update().values(*stats_fields))
+    if not before:
+        return 0
+    updated = queryset.update(**fields)
+    for row in before:
+        record_change(row, {**row, **{key: fields[key] for key in stats_fields if key in fields}})
+    return updated
+
+
+def process_stk_callback(body):
+    """
+    Record a callback body in the dedupe log and apply it exactly once.
+
+    The log insert and the session/payment update share one transaction, so a
+    failure while applying lets Safaricom's retry go through again. Only the
+    insert is treated as a duplicate check; a callback that matches no
+    session or payment leaves no log row, so a redelivery that arrives once
+    the row exists is still applied. Returns one of the ``CALLBACK_*``
+    outcome constants.
+    """
+    callback = extract_stk_callback(body)
+    checkout_request_id = callback.get('CheckoutRequestID')
+    if not checkout_request_id:
+        logger.warning("Received callback without a CheckoutRequestID")
+        return CALLBACK_INVALID
+
+    result_code = callback.get('ResultCode')
+    receipt_number = callback_metadata(callback).get('MpesaReceiptNumber') if result_code == 0 else None
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                MpesaCallback.objects.create(
+                    checkout_request_id=checkout_request_id,
+                    receipt_number=receipt_number or None,
+                    result_code=result_code if isinstance(result_code, int) else None,
+                    payload=body,
+                )
+        except IntegrityError:
+            logger.info("Ignoring duplicate callback for checkout %s", checkout_request_id)
+            return CALLBACK_DUPLICATE
+
+        if not apply_stk_callback(callback):
+            transaction.set_rollback(True)
+            return CALLBACK_UNKNOWN
+
+    return CALLBACK_APPLIED
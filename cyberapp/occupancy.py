@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+from itertools import chain
+
+import numpy as np
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import UsageSession
+from .timeseries import REPORT_TZ
+
+
+MINUTE = 60
+HOUR = 3600
+# rows fetched per round trip while streaming intervals out of the database
+STREAM_CHUNK_SIZE = 5000
+
+
+def load_intervals(start, end, now=None, amounts=False):
+    """
+    ``(starts, ends)`` as int64 epoch-second arrays for every session that
+    overlaps ``[start, end)``, in one streaming query. Running sessions end
+    at ``now``. With ``amounts=True`` a third float array of
+    ``amount_charged`` is returned too.
+    """
+    now = now or timezone.now()
+    rows = (
+        UsageSession.objects.filter(start_time__lt=end)
+        .filter(Q(end_time__gt=start) | Q(end_time__isnull=True))
+        .order_by()
+        .values_list("start_time", "end_time", "amount_charged")
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    open_end = now.timestamp()
+    flat = np.fromiter(
+        chain.from_iterable(
+            (started.timestamp(), ended.timestamp() if ended else open_end, charged or 0)
+            for started, ended, charged in rows
+        ),
+        dtype=np.float64,
+    )
+    columns = flat.reshape(-1, 3)
+    starts, ends = columns[:, 0].astype(np.int64), columns[:, 1].astype(np.int64)
+    if amounts:
+        return starts, ends, columns[:, 2]
+    return starts, ends
+
+
+def sweep(starts, ends, range_start, range_end):
+    """
+    Sorted sweep-line over interval endpoints clipped to the range.
+
+    Returns ``(times, occupancy)``: event times (seconds) and the number of
+    concurrent sessions from each time until the next. Ends sort before
+    starts at the same instant, so back-to-back sessions are not counted as
+    overlapping.
+    """
+    starts = np.clip(starts, range_start, range_end)
+    ends = np.clip(ends, range_start, range_end)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+
+    times = np.concatenate([ends, starts])
+    deltas = np.concatenate([np.full(ends.size, -1, np.int64), np.ones(starts.size, np.int64)])
+    order = np.lexsort((deltas, times))
+    times = np.concatenate([[range_start], times[order]])
+    occupancy = np.concatenate([[0], np.cumsum(deltas[order])])
+    return times, occupancy
+
+
+def hour_of_week(epoch_seconds, offset):
+    # 0 = Monday 00:00 local; the epoch (day 0) was a Thursday
+    local = epoch_seconds + offset
+    return ((local // 86400 + 3) % 7) * 24 + (local % 86400) // HOUR
+
+
+def integral(times, occupancy, at):
+    """
+    Machine-seconds in use from the range start up to each instant in ``at``.
+    """
+    widths = np.diff(times, append=times[-1])
+    cumulative = np.concatenate([[0], np.cumsum(occupancy[:-1] * widths[:-1])])
+    index = np.searchsorted(times, at, side="right") - 1
+    return cumulative[index] + occupancy[index] * (at - times[index])
+
+
+def per_minute_peak(times, occupancy, range_start, range_end):
+    """
+    Most machines busy at any moment within each minute of the range.
+    """
+    minutes = (range_end - range_start) // MINUTE
+    grid = range_start + MINUTE * np.arange(minutes, dtype=np.int64)
+    peaks = occupancy[np.searchsorted(times, grid, side="right") - 1].copy()
+    inside = (times >= range_start) & (times < range_start + minutes * MINUTE)
+    np.maximum.at(peaks, (times[inside] - range_start) // MINUTE, occupancy[inside])
+    return peaks
+
+
+def occupancy_profile(starts, ends, range_start, range_end, include_minutes=False):
+    """
+    Peak and time-weighted average concurrency over ``[range_start,
+    range_end)`` plus 7x24 hour-of-week heatmaps (Monday first, Nairobi
+    time) of the average and peak machines in use.
+    """
+    range_start, range_end = int(range_start), int(range_end)
+    times, occupancy = sweep(starts, ends, range_start, range_end)
+
+    peak_index = int(np.argmax(occupancy))
+    profile = {
+        "peak": int(occupancy[peak_index]),
+        "peak_at": datetime.fromtimestamp(times[peak_index], REPORT_TZ).isoformat() if occupancy[peak_index] else None,
+        "average": float(integral(times, occupancy, np.array([range_end]))[0] / (range_end - range_start)),
+    }
+
+    # hour slots aligned to local wall-clock hours; Nairobi has no DST so the
+    # offset is fixed for the whole range
+    offset = int(datetime.fromtimestamp(range_start, REPORT_TZ).utcoffset().total_seconds())
+    first_hour = (range_start + offset) // HOUR * HOUR - offset
+    edges = np.arange(first_hour, range_end + HOUR, HOUR, dtype=np.int64)
+    edges = np.clip(edges, range_start, range_end)
+    busy = np.diff(integral(times, occupancy, edges))
+    spans = np.diff(edges)
+    slot = hour_of_week(edges[:-1], offset)
+
+    totals = np.bincount(slot, weights=busy, minlength=168)
+    seconds = np.bincount(slot, weights=spans, minlength=168)
+    average = np.divide(totals, seconds, out=np.zeros(168), where=seconds > 0)
+
+    minute_peaks = per_minute_peak(times, occupancy, range_start, range_end)
+    minute_starts = range_start + MINUTE * np.arange(minute_peaks.size, dtype=np.int64)
+    hour_peaks = np.zeros(168, dtype=np.int64)
+    np.maximum.at(hour_peaks, hour_of_week(minute_starts, offset), minute_peaks)
+
+    profile["heatmap_average"] = np.round(average, 2).reshape(7, 24).tolist()
+    profile["heatmap_peak"] = hour_peaks.reshape(7, 24).tolist()
+    if include_minutes:
+        profile["minutes"] = minute_peaks.tolist()
+    return profile
+
+
+def occupancy_for_dates(first_day, last_day, include_minutes=False, now=None):
+    """
+    ``occupancy_profile`` for whole local days ``first_day``..``last_day``.
+    """
+    start = datetime.combine(first_day, datetime.min.time(), REPORT_TZ)
+    end = datetime.combine(last_day + timedelta(days=1), datetime.min.time(), REPORT_TZ)
+    starts, ends = load_intervals(start, end, now=now)
+    profile = occupancy_profile(starts, ends, start.timestamp(), end.timestamp(), include_minutes)
+    profile.update(start=start.isoformat(), end=end.isoformat(), sessions=int(starts.size))
+    return profile
@@ -0,0 +1,165 @@
+import base64
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 50
+
+DIRECTION_NEXT = "n"
+DIRECTION_PREV = "p"
+
+
+@dataclass
+class KeysetPage:
+    items: list
+    next_cursor: str = None
+    prev_cursor: str = None
+    page_size: int = DEFAULT_PAGE_SIZE
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def _parse_ordering(ordering):
+    return [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+
+
+def _key_values(obj, keys):
+    values = []
+    for name, _ in keys:
+        value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+        values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+    return values
+
+
+def encode_cursor(values, direction=DIRECTION_NEXT):
+    raw = json.dumps([direction, values], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def load_cursor(token):
+    """
+    Raw ``(direction, values)`` from an opaque cursor, or ``None`` if it is
+    malformed. Values are still JSON primitives.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        direction, raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if direction not in (DIRECTION_NEXT, DIRECTION_PREV) or not isinstance(raw_values, list):
+        return None
+    return direction, raw_values
+
+
+def decode_cursor(token, model, keys):
+    """
+    Turn an opaque cursor back into ``(direction, values)``; returns ``None``
+    for anything malformed so callers fall back to the first page.
+    """
+    loaded = load_cursor(token)
+    if loaded is None or len(loaded[1]) != len(keys):
+        return None
+    direction, raw_values = loaded
+    try:
+        values = [
+            model._meta.get_field(name).to_python(value)
+            for (name, _), value in zip(keys, raw_values)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        return None
+    return direction, values
+
+
+def _seek_filter(keys, values, forward):
+    """
+    Lexicographic "row comes after (values)" predicate, e.g. for
+    ``(-date, -id)``: ``date < d OR (date = d AND id < i)``.
+    """
+    condition = Q()
+    for position, (name, descending) in enumerate(keys):
+        lookup = "gt" if descending != forward else "lt"
+        clause = Q(**{prior: values[i] for i, (prior, _) in enumerate(keys[:position])})
+        condition |= clause & Q(**{f"{name}__{lookup}": values[position]})
+    return condition
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Seek-based pagination: every page is one indexed range scan of
+    ``page_size + 1`` rows, so page N costs the same as page 1.
+
+    ``ordering`` must end in a unique column (usually ``id``) and should match
+    a composite index on the model.
+    """
+    keys = _parse_ordering(ordering)
+    decoded = decode_cursor(cursor, queryset.model, keys)
+    direction, values = decoded if decoded else (DIRECTION_NEXT, None)
+    forward = direction == DIRECTION_NEXT
+
+    if forward:
+        order_by = list(ordering)
+    else:
+        order_by = [name[1:] if name.startswith("-") else f"-{name}" for name in ordering]
+
+    page_qs = queryset.order_by(*order_by)
+    if values is not None:
+        page_qs = page_qs.filter(_seek_filter(keys, values, forward))
+
+    rows = list(page_qs[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+
+    page = KeysetPage(items=rows, page_size=page_size)
+    if rows:
+        if forward:
+            more_after, more_before = has_more, values is not None
+        else:
+            more_after, more_before = True, has_more
+        if more_after:
+            page.next_cursor = encode_cursor(_key_values(rows[-1], keys), DIRECTION_NEXT)
+        if more_before:
+            page.prev_cursor = encode_cursor(_key_values(rows[0], keys), DIRECTION_PREV)
+    return page
+
+
+def estimated_count(model, using=None):
+    """
+    Cheap row estimate for "about N rows" labels. Uses planner statistics on
+    Postgres/MySQL and falls back to ``COUNT(*)`` elsewhere (SQLite). Reads
+    the database the router picks for ``model`` unless ``using`` is given.
+    """
+    using = using or router.db_for_read(model)
+    connection = connections[using]
+    table = model._meta.db_table
+    estimate = None
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            estimate = row[0] if row else None
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+            row = cursor.fetchone()
+            estimate = row[0] if row else None
+    # reltuples is -1 for never-analyzed tables; trust an exact count then.
+    if estimate is None or estimate < 0:
+        estimate = model.objects.using(using).count()
+    return estimate
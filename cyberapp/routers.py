@@ -0,0 +1,128 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICA_ALIAS = "replica"
+# sessions and users always come from the primary: a login that has not
+# replicated yet must not look like a logged-out client
+REPLICA_APPS = {"cyberapp"}
+PIN_COOKIE = "primary_pin"
+
+# per-request routing state, set by ReplicaPinningMiddleware
+_request_state = ContextVar("replica_request_state", default=None)
+
+
+class _RequestState:
+    def __init__(self, pinned):
+        # the client wrote within REPLICA_PIN_SECONDS: read from the primary
+        self.pinned = pinned
+        self.use_replica = False
+        self.wrote = False
+
+
+def read_from_replica(view):
+    """
+    Send the view's reads to the replica unless the client is pinned to the
+    primary. Apply outside ``conditional_page`` so the ETag's data version
+    is read from the same database as the page.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _request_state.get()
+        if state is None or state.pinned:
+            return view(request, *args, **kwargs)
+        state.use_replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.use_replica = False
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Route reads of shop data in ``read_from_replica`` views to the
+    ``replica`` alias, and everything else, writes included, to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        # reads inside a transaction must see that transaction's writes
+        if (
+            state is not None
+            and state.use_replica
+            and model._meta.app_label in REPLICA_APPS
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes for the replica: a request that writes sets a cookie
+    pinning that client to the primary for ``REPLICA_PIN_SECONDS``, long
+    enough for replication to catch up. Unused without a replica alias.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._pin(request, response, state)
+
+    async def __acall__(self, request):
+        # sync views run in a copy of this context and mutate the same state
+        state = _RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._pin(request, response, state)
+
+    @staticmethod
+    def _pin(request, response, state):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,176 @@
+import logging
+import re
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, connections, transaction
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+from .models import Student, normalize_search_text
+from .pagination import KeysetPage, paginate_keyset
+
+
+logger = logging.getLogger(__name__)
+
+
+FTS_TABLE = "cyberapp_student_fts"
+TRIGRAM_INDEX = "cyberapp_student_search_trgm"
+MAX_RESULTS = 20
+# same ordering as students_list, served by student_name_seek_idx
+SEARCH_ORDERING = ("lastname", "firstname", "id")
+
+_FTS_TRIGGERS = {
+    f"{FTS_TABLE}_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON cyberapp_student BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key);
+        END
+    """,
+    f"{FTS_TABLE}_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON cyberapp_student BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) VALUES ('delete', old.id, old.search_key);
+        END
+    """,
+    f"{FTS_TABLE}_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_key ON cyberapp_student BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_key) VALUES ('delete', old.id, old.search_key);
+            INSERT INTO {FTS_TABLE}(rowid, search_key) VALUES (new.id, new.search_key);
+        END
+    """,
+}
+
+# vendor availability, cached per alias after the first lookup
+_fts_ready = {}
+
+
+def install_search_index(using="default"):
+    """
+    Create the vendor-specific index behind ``search_key``: an FTS5 table kept
+    in sync by triggers on SQLite, a pg_trgm GIN index on Postgres.
+
+    Idempotent; runs after every ``migrate`` because SQLite table rebuilds in
+    later migrations silently drop the triggers.
+    """
+    connection = connections[using]
+    _fts_ready.pop(using, None)
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    "search_key, content='cyberapp_student', content_rowid='id', prefix='2 3')"
+                )
+                cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'cyberapp_student'"
+                )
+                existing = {row[0] for row in cursor.fetchall()}
+                missing = [name for name in _FTS_TRIGGERS if name not in existing]
+                for name in missing:
+                    cursor.execute(_FTS_TRIGGERS[name])
+                if missing:
+                    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            elif connection.vendor == "postgresql":
+                with transaction.atomic(using=using):
+                    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                    cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} "
+                        "ON cyberapp_student USING gin (search_key gin_trgm_ops)"
+                    )
+    except DatabaseError:
+        logger.warning("Student search index unavailable on %s; using plain LIKE lookups", using, exc_info=True)
+
+
+def _has_fts(connection):
+    alias = connection.alias
+    if alias not in _fts_ready:
+        ready = False
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+                ready = cursor.fetchone() is not None
+        _fts_ready[alias] = ready
+    return _fts_ready[alias]
+
+
+def _search_tokens(term):
+    # Phone numbers are often typed with spaces ("0712 345 678"): keep them whole.
+    if re.fullmatch(r"[\d\s+\-()]+", term or ""):
+        digits = re.sub(r"\D", "", term)
+        return [digits] if digits else []
+    return normalize_search_text(term).split()
+
+
+@contextmanager
+def _deadline(connection, budget_ms):
+    """
+    Abort the query once ``budget_ms`` has elapsed: via a progress handler on
+    SQLite and ``statement_timeout`` on Postgres. Other backends run unbounded.
+    """
+    if connection.vendor == "sqlite":
+        connection.ensure_connection()
+        raw = connection.connection
+        cutoff = time.monotonic() + budget_ms / 1000
+        raw.set_progress_handler(lambda: int(time.monotonic() > cutoff), 1000)
+        try:
+            yield
+        finally:
+            raw.set_progress_handler(None, 0)
+    elif connection.vendor == "postgresql":
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", [int(budget_ms)])
+            yield
+    else:
+        yield
+
+
+def student_search_queryset(term, using="default"):
+    """
+    Students whose names, ID number or phone start with every word of
+    ``term``; an empty term matches everyone.
+    """
+    queryset = Student.objects.using(using).only("firstname", "lastname", "idnumber", "phonenumber")
+    tokens = _search_tokens(term)
+    if not tokens:
+        return queryset
+
+    if _has_fts(connections[using]):
+        match = " AND ".join(f'"{token}"*' for token in tokens)
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+        ))
+    # Postgres serves these through the trigram index on search_key.
+    for token in tokens:
+        queryset = queryset.filter(search_key__contains=f" {token}")
+    return queryset
+
+
+def search_students(term, limit=10, cursor=None, using="default"):
+    """
+    One keyset page of matches in directory order (lastname, firstname, id).
+
+    Returns ``(page, timed_out)``; when the latency budget
+    (``STUDENT_SEARCH_BUDGET_MS``) is exceeded the page is empty rather than
+    late.
+    """
+    limit = max(1, min(int(limit), MAX_RESULTS))
+    queryset = student_search_queryset(term, using=using)
+    budget_ms = getattr(settings, "STUDENT_SEARCH_BUDGET_MS", 150)
+    try:
+        with _deadline(connections[using], budget_ms):
+            return paginate_keyset(queryset, SEARCH_ORDERING, cursor=cursor, page_size=limit), False
+    except OperationalError:
+        # "interrupted" on SQLite, "canceling statement due to statement timeout" on Postgres
+        logger.warning("Student search for %r exceeded %sms budget", term, budget_ms)
+        return KeysetPage(items=[], page_size=limit), True
+
+
+def serialize_student(student):
+    return {
+        "id": student.pk,
+        "idnumber": student.idnumber,
+        "name": f"{student.firstname} {student.lastname}",
+        "phonenumber": student.phonenumber,
+        "url": reverse("student_detail", args=[student.idnumber]),
+    }
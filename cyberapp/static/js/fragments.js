@@ -0,0 +1,41 @@
+// Lazily fill <ul class="lazy-fragment" data-src="..."> lists with server-rendered
+// <li> fragments; "load more" links inside a fragment append the next page.
+document.addEventListener('DOMContentLoaded', function () {
+    function load(container, url, replaceNode) {
+        return fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.text();
+            })
+            .then(html => {
+                const template = document.createElement('template');
+                template.innerHTML = html.trim();
+                if (replaceNode) {
+                    replaceNode.replaceWith(template.content);
+                } else {
+                    container.replaceChildren(template.content);
+                }
+            })
+            .catch(error => {
+                console.error('Could not load fragment:', error);
+                const failed = document.createElement('li');
+                failed.className = 'empty-state';
+                failed.textContent = 'Could not load this list. Refresh to try again.';
+                (replaceNode || container).replaceWith(failed);
+            });
+    }
+
+    document.querySelectorAll('.lazy-fragment').forEach(function (container) {
+        load(container, container.dataset.src);
+
+        container.addEventListener('click', function (event) {
+            const link = event.target.closest('.fragment-more a');
+            if (!link) return;
+            event.preventDefault();
+            link.textContent = 'Loading…';
+            load(container, link.href, link.closest('.fragment-more'));
+        });
+    });
+});
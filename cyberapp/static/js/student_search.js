@@ -0,0 +1,161 @@
+// Debounced student typeahead backed by /search/students/
+// data-mode="pick" turns it into a form picker that fills a hidden pk input.
+document.addEventListener('DOMContentLoaded', function () {
+    const DEBOUNCE_MS = 200;
+
+    document.querySelectorAll('.student-search').forEach(function (widget) {
+        const input = widget.querySelector('.student-search-input');
+        const list = widget.querySelector('.student-search-results');
+        const hiddenValue = widget.querySelector('.student-picker-value');
+        const url = widget.dataset.searchUrl;
+        const pickMode = widget.dataset.mode === 'pick';
+        let timer = null;
+        let controller = null;
+        let activeIndex = -1;
+
+        function hideResults() {
+            list.hidden = true;
+            list.innerHTML = '';
+            activeIndex = -1;
+        }
+
+        function options() {
+            return list.querySelectorAll('.student-search-option');
+        }
+
+        function choose(option) {
+            if (!pickMode) {
+                window.location.href = option.href;
+                return;
+            }
+            hiddenValue.value = option.dataset.id;
+            input.value = option.dataset.label;
+            hideResults();
+        }
+
+        function buildOption(student) {
+            const option = document.createElement(pickMode ? 'button' : 'a');
+            option.className = 'student-search-option';
+            option.setAttribute('role', 'option');
+            if (pickMode) {
+                option.type = 'button';
+                option.dataset.id = student.id;
+                option.dataset.label = `${student.name} (${student.idnumber})`;
+                option.addEventListener('click', () => choose(option));
+            } else {
+                option.href = student.url;
+            }
+            const name = document.createElement('strong');
+            name.textContent = student.name;
+            const meta = document.createElement('span');
+            meta.textContent = `ID ${student.idnumber} • ${student.phonenumber}`;
+            option.append(name, meta);
+            return option;
+        }
+
+        function render(data, append) {
+            if (!append) {
+                list.innerHTML = '';
+                activeIndex = -1;
+            }
+            const more = list.querySelector('.student-search-more');
+            if (more) more.remove();
+
+            if (!append && !data.results.length) {
+                const empty = document.createElement('li');
+                empty.className = 'student-search-empty';
+                empty.textContent = data.timed_out
+                    ? 'Search is busy, keep typing to narrow it down.'
+                    : `No students match “${data.query}”.`;
+                list.appendChild(empty);
+            }
+            data.results.forEach(function (student) {
+                const item = document.createElement('li');
+                item.appendChild(buildOption(student));
+                list.appendChild(item);
+            });
+            if (data.next_cursor) {
+                const item = document.createElement('li');
+                item.className = 'student-search-more';
+                const button = document.createElement('button');
+                button.type = 'button';
+                button.textContent = 'More results…';
+                button.addEventListener('click', () => search(data.query, data.next_cursor));
+                item.appendChild(button);
+                list.appendChild(item);
+            }
+            list.hidden = false;
+        }
+
+        function search(query, cursor) {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            const params = new URLSearchParams({ q: query });
+            if (cursor) params.set('cursor', cursor);
+            fetch(`${url}?${params}`, {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' },
+                signal: controller.signal
+            })
+                .then(response => response.json())
+                .then(data => {
+                    // ignore answers for a query the user has already moved past
+                    if (data.query === input.value.trim()) {
+                        render(data, Boolean(cursor));
+                    }
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') {
+                        console.error('Student search failed:', error);
+                    }
+                });
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            if (pickMode) {
+                // typing invalidates the previous pick until a new one is chosen
+                hiddenValue.value = '';
+            }
+            const query = input.value.trim();
+            if (!query && !pickMode) {
+                hideResults();
+                return;
+            }
+            timer = setTimeout(() => search(query), DEBOUNCE_MS);
+        });
+
+        if (pickMode) {
+            input.addEventListener('focus', function () {
+                if (list.hidden && !hiddenValue.value) {
+                    search(input.value.trim());
+                }
+            });
+        }
+
+        input.addEventListener('keydown', function (event) {
+            const choices = options();
+            if (event.key === 'Escape') {
+                hideResults();
+                return;
+            }
+            if (!choices.length) return;
+            if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+                event.preventDefault();
+                const step = event.key === 'ArrowDown' ? 1 : -1;
+                activeIndex = (activeIndex + step + choices.length) % choices.length;
+                choices.forEach((choice, index) => choice.classList.toggle('active', index === activeIndex));
+            } else if (event.key === 'Enter' && activeIndex >= 0) {
+                event.preventDefault();
+                choose(choices[activeIndex]);
+            }
+        });
+
+        document.addEventListener('click', function (event) {
+            if (!widget.contains(event.target)) {
+                hideResults();
+            }
+        });
+    });
+});
@@ -0,0 +1,46 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import BaseStorageFinder
+from django.core.files.storage import FileSystemStorage
+
+from .assets import build_bundles
+from .images import build_image_variants, referenced_images
+
+
+SOURCE_ROOT = os.path.join(settings.BASE_DIR, "cyberapp", "static")
+TEMPLATES_DIR = os.path.join(settings.BASE_DIR, "cyberapp", "templates")
+
+
+class BuildOutputFinder(BaseStorageFinder):
+    """
+    Exposes files generated by the static build step (``STATIC_BUILD_DIR``)
+    to ``collectstatic`` and the dev server, so they get manifest hashes
+    like any hand-written asset. A missing build directory simply yields
+    nothing.
+    """
+    def __init__(self, *args, **kwargs):
+        self.storage = FileSystemStorage(location=settings.STATIC_BUILD_DIR)
+        super().__init__(*args, **kwargs)
+
+    def find(self, path, find_all=False, **kwargs):
+        if not os.path.isdir(self.storage.location):
+            return [] if find_all else None
+        return super().find(path, find_all=find_all, **kwargs)
+
+    def list(self, ignore_patterns):
+        if os.path.isdir(self.storage.location):
+            yield from super().list(ignore_patterns)
+
+
+def run_build(log):
+    """
+    Generate derived static assets into ``STATIC_BUILD_DIR``. Runs offline
+    as the first step of ``collectstatic``; every step is incremental.
+    """
+    build_root = settings.STATIC_BUILD_DIR
+    os.makedirs(build_root, exist_ok=True)
+    encoded = build_image_variants(SOURCE_ROOT, build_root, referenced_images(TEMPLATES_DIR), log=log)
+    if encoded is not None:
+        log(f"Image variants: {encoded} image(s) encoded, others up to date.")
+    build_bundles(SOURCE_ROOT, TEMPLATES_DIR, build_root, log=log)
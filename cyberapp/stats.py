@@ -0,0 +1,111 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Payment, Student
+
+
+ZERO = Decimal("0.00")
+# values() needed to work out what a session/payment contributes to its student
+SESSION_STATS_FIELDS = ("id", "student_id", "start_time", "end_time", "amount_charged", "payment_status")
+PAYMENT_STATS_FIELDS = ("id", "student_id", "amount", "mpesa_status")
+
+
+@dataclass(frozen=True)
+class StatsDelta:
+    """
+    Change to one student's denormalized lifetime stats.
+
+    ``last_seen`` only ever moves forward, so subtracting keeps the newer one.
+    """
+    time: timedelta = timedelta(0)
+    charged: Decimal = ZERO
+    paid: Decimal = ZERO
+    last_seen: datetime | None = None
+
+    def __sub__(self, other):
+        return StatsDelta(
+            time=self.time - other.time,
+            charged=self.charged - other.charged,
+            paid=self.paid - other.paid,
+            last_seen=self.last_seen,
+        )
+
+    def __bool__(self):
+        return bool(self.time or self.charged or self.paid or self.last_seen)
+
+
+def session_contribution(start_time, end_time, amount_charged, payment_status, **_):
+    """
+    What a session adds to its student, matching ``with_lifetime_totals``:
+    only ended sessions are charged, and STK-paid ones count as paid.
+    """
+    if end_time is None:
+        return StatsDelta(last_seen=start_time)
+    amount = amount_charged or ZERO
+    return StatsDelta(
+        time=end_time - start_time,
+        charged=amount,
+        paid=amount if payment_status == "paid" else ZERO,
+        last_seen=end_time,
+    )
+
+
+def payment_contribution(amount, mpesa_status, **_):
+    if mpesa_status in Payment.SETTLED_STATUSES:
+        return StatsDelta(paid=amount)
+    return StatsDelta()
+
+
+def apply_stats_delta(student_id, delta):
+    """
+    Fold ``delta`` into the student's row with a single F() ``UPDATE`` so
+    concurrent session ends and callbacks never overwrite each other.
+    """
+    if not delta:
+        return 0
+    fields = {"updated_at": timezone.now()}
+    if delta.time:
+        fields["total_time"] = F("total_time") + delta.time
+    if delta.charged:
+        fields["total_charged"] = F("total_charged") + delta.charged
+    if delta.paid:
+        fields["total_paid"] = F("total_paid") + delta.paid
+    if delta.charged != delta.paid:
+        fields["open_balance"] = F("open_balance") + (delta.charged - delta.paid)
+    if delta.last_seen is not None:
+        seen = Value(delta.last_seen)
+        # GREATEST() is NULL-poisoned on SQLite, so seed an empty last_seen first
+        fields["last_seen"] = Greatest(Coalesce(F("last_seen"), seen), seen)
+    return Student.objects.filter(pk=student_id).update(**fields)
+
+
+def record_session_change(before, after):
+    """
+    Apply the difference between two ``SESSION_STATS_FIELDS`` snapshots of
+    the same session; ``before`` is ``None`` for a new session.
+    """
+    delta = session_contribution(**after)
+    if before is not None:
+        delta = delta - session_contribution(**before)
+    return apply_stats_delta(after["student_id"], delta)
+
+
+def record_payment_change(before, after):
+    """
+    Like ``record_session_change`` for payments; ``after`` is ``None`` when
+    the payment was deleted.
+    """
+    delta = payment_contribution(**after) if after is not None else StatsDelta()
+    if before is not None:
+        delta = delta - payment_contribution(**before)
+    student_id = (after or before)["student_id"]
+    return apply_stats_delta(student_id, delta)
+
+
+def stats_snapshot(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
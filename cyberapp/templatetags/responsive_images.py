@@ -0,0 +1,58 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from cyberapp.images import image_variants
+
+
+register = template.Library()
+
+
+def _srcset(paths):
+    return ", ".join(f"{static(path)} {width}w" for width, path in paths)
+
+
+@register.simple_tag
+def responsive_image(path, alt="", sizes="100vw", **attrs):
+    """
+    ``<picture>`` with an AVIF and a WebP ``srcset`` per built width and the
+    original file as the ``<img>`` fallback. Extra keyword arguments become
+    ``<img>`` attributes (``class_`` for ``class``).
+    """
+    sources = format_html_join(
+        "", '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, _srcset(paths), sizes) for mime, paths in image_variants(path)),
+    )
+    extra = format_html_join(
+        "", ' {}="{}"', ((name.rstrip("_").replace("_", "-"), value) for name, value in attrs.items())
+    )
+    return format_html(
+        '<picture>{}<img src="{}" alt="{}" loading="lazy" decoding="async"{}></picture>',
+        sources, static(path), alt, extra,
+    )
+
+
+@register.simple_tag
+def responsive_background(selector, path, layers=""):
+    """
+    ``<style>`` block giving ``selector`` a background of ``path`` through
+    ``image-set()``, stepping up to the next variant width at each viewport
+    breakpoint. ``layers`` (e.g. a gradient) is painted on top. Browsers
+    without ``image-set()`` type support keep the stylesheet's own image.
+    """
+    variants = image_variants(path)
+    if not variants:
+        return ""
+    prefix = f"{layers}, " if layers else ""
+    by_width = {}
+    for mime, paths in variants:
+        for width, variant in paths:
+            by_width.setdefault(width, []).append(f'url("{static(variant)}") type("{mime}")')
+
+    rules, previous = [], None
+    for width in sorted(by_width):
+        rule = f"{selector} {{ background-image: {prefix}image-set({', '.join(by_width[width])}); }}"
+        rules.append(rule if previous is None else f"@media (min-width: {previous + 1}px) {{ {rule} }}")
+        previous = width
+    return mark_safe(f"<style>{' '.join(rules)}</style>")
@@ -0,0 +1,30 @@
+from django import template
+from django.utils.html import format_html
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def sparkline(values, width=120, height=32, label=""):
+    """
+    Inline SVG polyline for a short series; gaps (``None``) are skipped.
+    No script or chart library, so it adds a few hundred bytes per chart.
+    """
+    points = [(index, value) for index, value in enumerate(values or []) if value is not None]
+    if not points:
+        return ""
+    low = min(value for _, value in points)
+    high = max(value for _, value in points)
+    spread = (high - low) or 1
+    step = width / max(len(values) - 1, 1)
+    pad = 2
+    coords = " ".join(
+        f"{index * step:.1f},{pad + (height - 2 * pad) * (1 - (value - low) / spread):.1f}"
+        for index, value in points
+    )
+    return format_html(
+        '<svg class="sparkline" viewBox="0 0 {} {}" width="{}" height="{}" role="img" aria-label="{}" '
+        'preserveAspectRatio="none"><polyline points="{}" /></svg>',
+        width, height, width, height, label, coords,
+    )
@@ -0,0 +1,67 @@
+import posixpath
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from cyberapp.assets import CRITICAL_DIR, JS_BUNDLES, STYLESHEET, bundle_index
+
+
+register = template.Library()
+
+_RELATIVE_URL = re.compile(r"""url\((["']?)(?![a-z]+:|/|data:|#)([^"')]+)\1\)""")
+
+
+@lru_cache(maxsize=None)
+def _inline_css(path):
+    """
+    A built critical CSS file with its relative ``url()``s rewritten to
+    (hashed) static URLs, since inline CSS resolves them against the page.
+    """
+    found = finders.find(path)
+    if not found:
+        return ""
+    css = Path(found).read_text()
+    return _RELATIVE_URL.sub(
+        lambda match: f'url("{static(posixpath.normpath(posixpath.join(CRITICAL_DIR, match.group(2))))}")', css
+    )
+
+
+@register.simple_tag(takes_context=True)
+def stylesheet(context):
+    """
+    The site stylesheet. With ``STATIC_BUNDLES`` and a build available, the
+    page's critical CSS is inlined and the minified stylesheet loads without
+    blocking render; otherwise a plain ``<link>`` to the source file.
+    """
+    index = bundle_index() if settings.STATIC_BUNDLES else {}
+    if not index:
+        return format_html('<link rel="stylesheet" href="{}">', static(STYLESHEET))
+    href = static(index["css"][STYLESHEET])
+    critical = index["critical"].get(context.template.name)
+    if not critical:
+        return format_html('<link rel="stylesheet" href="{}">', href)
+    return format_html(
+        '<style>{}</style>'
+        '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        mark_safe(_inline_css(critical)), href, href,
+    )
+
+
+@register.simple_tag
+def script_bundle(name):
+    """
+    Deferred ``<script>`` for a bundle in ``JS_BUNDLES``: the minified build
+    output when ``STATIC_BUNDLES`` is on, else each source file in order.
+    """
+    index = bundle_index() if settings.STATIC_BUNDLES else {}
+    built = index.get("js", {}).get(name)
+    sources = [built] if built else JS_BUNDLES[name]
+    return format_html_join("\n", '<script defer src="{}"></script>', ((static(path),) for path in sources))
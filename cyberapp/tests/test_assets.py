@@ -0,0 +1,113 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from ..assets import BUNDLE_INDEX, JS_BUNDLES, build_bundles, critical_css, minify_css, minify_js, template_selectors
+from .utils import PLAIN_STATIC
+
+
+SOURCE_ROOT = Path(settings.BASE_DIR) / "cyberapp" / "static"
+TEMPLATES_DIR = Path(settings.BASE_DIR) / "cyberapp" / "templates"
+INDEX = {
+    "js": {"alerts": "bundles/alerts.js"},
+    "css": {"styles/styles.css": "bundles/styles.css"},
+    "critical": {"page.html": "critical/page.css"},
+}
+
+
+class CriticalCssTests(SimpleTestCase):
+    css = minify_css("""
+        @font-face { font-family: 'Inter'; src: url('../fonts/inter-latin.woff2') format('woff2'); }
+        body { margin: 0; }
+        .card, .unused { padding: 1rem; }
+        .card .title { font-weight: 700; }
+        .modal .title { color: red; }
+        #main { display: grid; }
+        #sidebar { display: none; }
+        .status-paid { color: green; }
+        input[type="search"].search-box { border: 1px solid; }
+        @media (max-width: 600px) { .card { padding: 0; } .modal { inset: 0; } }
+        @media print { .modal { display: none; } }
+        @keyframes spin { to { transform: rotate(360deg); } }
+    """)
+    template = """
+        <main id="main" class="card {% if wide %}wide{% endif %}">
+          <h1 class="title">{{ title }}</h1>
+          <span class="status-{{ session.payment_status }}"></span>
+          <input type="search" class="search-box">
+        </main>
+    """
+
+    def test_template_selectors(self):
+        classes, ids, prefixes = template_selectors(self.template)
+        self.assertEqual(classes, {"card", "wide", "title", "search-box"})
+        self.assertEqual(ids, {"main"})
+        self.assertEqual(prefixes, ("status-",))
+
+    def test_keeps_only_rules_the_page_can_match(self):
+        critical = critical_css(self.css, self.template)
+        for kept in ("@font-face", "body{", ".card,.unused{", ".card .title{", "#main{", ".status-paid{",
+                     'input[type="search"].search-box{', "@media (max-width:600px){.card{padding:0}}", "@keyframes"):
+            self.assertIn(kept, critical)
+        for dropped in (".modal", "#sidebar", "@media print"):
+            self.assertNotIn(dropped, critical)
+
+    def test_minifiers(self):
+        self.assertEqual(minify_js("var  answer = 42 ;  // comment\n"), "var answer=42;\n")
+        self.assertEqual(minify_css("a {  color : red ; }  /* note */"), "a{color:red}\n")
+
+
+class BuildBundlesTests(SimpleTestCase):
+    def test_builds_bundles_and_per_page_critical_css(self):
+        with tempfile.TemporaryDirectory() as build:
+            build = Path(build)
+            changed = build_bundles(SOURCE_ROOT, TEMPLATES_DIR, build, log=lambda message: None)
+            index = json.loads((build / BUNDLE_INDEX).read_text())
+            self.assertEqual(set(index["js"]), set(JS_BUNDLES))
+            self.assertIn("login.html", index["critical"])
+            # fragments have no <head>
+            self.assertNotIn("student_payments_fragment.html", index["critical"])
+
+            stylesheet = (build / index["css"]["styles/styles.css"]).read_text()
+            login = (build / index["critical"]["login.html"]).read_text()
+            self.assertLess(len(login), len(stylesheet) / 2)
+            self.assertIn(".login-container", login)
+            self.assertEqual(changed, len(list(build.rglob("*.*"))))
+            # unchanged sources leave every output alone
+            self.assertEqual(build_bundles(SOURCE_ROOT, TEMPLATES_DIR, build, log=lambda message: None), 0)
+
+
+@override_settings(STORAGES=PLAIN_STATIC, STATIC_URL="/static/")
+class StaticBundleTagTests(SimpleTestCase):
+    def _render(self, source, name="page.html"):
+        template = Template("{% load static_bundles %}" + source)
+        template.name = name
+        return template.render(Context())
+
+    @override_settings(STATIC_BUNDLES=False)
+    def test_sources_without_bundles(self):
+        self.assertEqual(
+            self._render("{% script_bundle 'sessions' %}"),
+            '<script defer src="/static/js/alerts.js"></script>\n<script defer src="/static/js/scripts.js"></script>',
+        )
+        self.assertEqual(self._render("{% stylesheet %}"), '<link rel="stylesheet" href="/static/styles/styles.css">')
+
+    @override_settings(STATIC_BUNDLES=True)
+    @mock.patch("cyberapp.templatetags.static_bundles.bundle_index", return_value=INDEX)
+    @mock.patch("cyberapp.templatetags.static_bundles._inline_css", return_value=".card{padding:1rem}")
+    def test_bundles(self, *_):
+        self.assertEqual(self._render("{% script_bundle 'alerts' %}"), '<script defer src="/static/bundles/alerts.js"></script>')
+        html = self._render("{% stylesheet %}")
+        self.assertTrue(html.startswith("<style>.card{padding:1rem}</style>"))
+        self.assertIn('<link rel="preload" href="/static/bundles/styles.css" as="style"', html)
+        self.assertIn('<noscript><link rel="stylesheet" href="/static/bundles/styles.css"></noscript>', html)
+        # pages without critical CSS get a plain link to the bundle
+        self.assertEqual(
+            self._render("{% stylesheet %}", name="other.html"),
+            '<link rel="stylesheet" href="/static/bundles/styles.css">',
+        )
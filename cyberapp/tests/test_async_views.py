@@ -0,0 +1,150 @@
+import asyncio
+import json
+from datetime import timedelta
+from unittest import mock
+
+import httpx
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .. import daraja, views
+from ..models import MpesaCallback, UsageSession
+from .test_mpesa import stk_callback
+from .utils import ended_session, make_student
+
+
+def _client(handler):
+    """An ``AsyncDarajaClient`` whose requests go to ``handler``."""
+    client = daraja.AsyncDarajaClient(base="https://daraja.test/")
+    client._http = httpx.AsyncClient(base_url="https://daraja.test/", transport=httpx.MockTransport(handler))
+    return client
+
+
+class AsyncDarajaClientTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    async def test_concurrent_pushes_share_one_token(self):
+        paths = []
+
+        async def handler(request):
+            paths.append(request.url.path)
+            if request.method == "GET":
+                await asyncio.sleep(0.01)
+                return httpx.Response(200, json={"access_token": "token", "expires_in": "3599"})
+            self.assertEqual(request.headers["Authorization"], "Bearer token")
+            return httpx.Response(200, json={"ResponseCode": "0", "CheckoutRequestID": "ws_CO_1"})
+
+        client = _client(handler)
+        responses = await asyncio.gather(*(
+            client.stk_push("254712345678", 100, "Session-1", "Session 1", "https://cafe.test/callback/")
+            for _ in range(5)
+        ))
+        await client.aclose()
+        self.assertEqual({response["CheckoutRequestID"] for response in responses}, {"ws_CO_1"})
+        self.assertEqual(paths.count("/oauth/v1/generate"), 1)
+        self.assertEqual(paths.count("/" + daraja.STK_PUSH_PATH), 5)
+
+    async def test_stk_query_payload(self):
+        async def handler(request):
+            if request.method == "GET":
+                return httpx.Response(200, json={"access_token": "token"})
+            body = json.loads(request.content)
+            self.assertEqual(body["CheckoutRequestID"], "ws_CO_1")
+            self.assertEqual(set(body), {"BusinessShortCode", "Password", "Timestamp", "CheckoutRequestID"})
+            return httpx.Response(200, json={"ResultCode": "0", "ResultDesc": "Paid"})
+
+        client = _client(handler)
+        self.assertEqual((await client.stk_query("ws_CO_1"))["ResultDesc"], "Paid")
+        await client.aclose()
+
+    async def test_token_failure_raises_runtime_error(self):
+        client = _client(lambda request: httpx.Response(401, json={}))
+        with self.assertRaisesRegex(RuntimeError, "HTTP 401"):
+            await client.access_token()
+        await client.aclose()
+
+    async def test_transport_error_raises_runtime_error(self):
+        def handler(request):
+            raise httpx.ConnectError("unreachable", request=request)
+
+        client = _client(handler)
+        with self.assertRaisesRegex(RuntimeError, "Daraja request failed"):
+            await client.access_token()
+        await client.aclose()
+
+    async def test_one_client_per_event_loop(self):
+        client = daraja.async_client()
+        self.assertIs(daraja.async_client(), client)
+        await client.aclose()
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("clerk", password="pw")
+        self.student = make_student()
+        end = timezone.now()
+        self.session = ended_session(self.student, end - timedelta(hours=1), end, "100.00")
+        self.factory = AsyncRequestFactory()
+
+    def _as_clerk(self, request):
+        # what AuthenticationMiddleware would attach
+        async def auser():
+            return self.user
+
+        request.user, request.auser = self.user, auser
+        return request
+
+    def _post(self, path, body):
+        return self._as_clerk(self.factory.post(path, json.dumps(body), content_type="application/json"))
+
+    async def test_send_stk_async_marks_session_pending(self):
+        client = mock.Mock(stk_push=mock.AsyncMock(return_value={"ResponseCode": "0", "CheckoutRequestID": "ws_CO_7"}))
+        with mock.patch("cyberapp.views.async_client", return_value=client):
+            response = await views.send_stk_async(self._post("/stk/", {"phone_number": "0712345678"}), self.session.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.stk_push.await_args.kwargs["phone_number"], "254712345678")
+        self.assertEqual(client.stk_push.await_args.kwargs["amount"], 100)
+        session = await UsageSession.objects.aget(pk=self.session.pk)
+        self.assertEqual((session.payment_status, session.mpesa_checkout_request_id), ("pending", "ws_CO_7"))
+
+    async def test_send_stk_async_reports_daraja_errors(self):
+        client = mock.Mock(stk_push=mock.AsyncMock(side_effect=RuntimeError("Daraja request failed")))
+        with mock.patch("cyberapp.views.async_client", return_value=client), self.assertLogs("cyberapp", "ERROR"):
+            response = await views.send_stk_async(self._post("/stk/", {}), self.session.pk)
+        self.assertEqual(response.status_code, 502)
+        session = await UsageSession.objects.aget(pk=self.session.pk)
+        self.assertEqual(session.payment_status, "not_requested")
+
+    async def test_send_stk_async_rejects_running_session(self):
+        await UsageSession.objects.filter(pk=self.session.pk).aupdate(is_active=True, end_time=None)
+        response = await views.send_stk_async(self._post("/stk/", {}), self.session.pk)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_stk_status_async(self):
+        await UsageSession.objects.filter(pk=self.session.pk).aupdate(mpesa_checkout_request_id="ws_CO_1")
+        client = mock.Mock(stk_query=mock.AsyncMock(return_value={"ResultCode": "1032", "ResultDesc": "Cancelled"}))
+        request = self._as_clerk(self.factory.get("/stk/status/"))
+        with mock.patch("cyberapp.views.async_client", return_value=client):
+            response = await views.stk_status_async(request, self.session.pk)
+        client.stk_query.assert_awaited_once_with("ws_CO_1")
+        self.assertEqual(json.loads(response.content)["message"], "Cancelled")
+
+    async def test_mpesa_callback_async(self):
+        await UsageSession.objects.filter(pk=self.session.pk).aupdate(
+            payment_status="pending", mpesa_checkout_request_id="ws_CO_1"
+        )
+        for _ in range(2):
+            response = await views.mpesa_callback_async(self._post("/callback/", stk_callback("ws_CO_1")))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content)["ResultCode"], 0)
+        self.assertEqual(await MpesaCallback.objects.acount(), 1)
+        session = await UsageSession.objects.aget(pk=self.session.pk)
+        self.assertEqual(session.payment_status, "paid")
+
+    async def test_mpesa_callback_async_rejects_bad_json(self):
+        request = self.factory.post("/callback/", "{", content_type="application/json")
+        response = await views.mpesa_callback_async(request)
+        self.assertEqual(response.status_code, 400)
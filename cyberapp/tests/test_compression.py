@@ -0,0 +1,82 @@
+import gzip
+import json
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import middleware
+from ..middleware import CompressionMiddleware, accepted_encodings
+
+
+@override_settings(COMPRESSION_MIN_SIZE=512)
+class CompressionTests(SimpleTestCase):
+    body = json.dumps({"rows": [{"id": i, "name": "student"} for i in range(200)]}).encode()
+
+    def _respond(self, accept_encoding=None, response=None, **meta):
+        request = RequestFactory().get("/", **meta)
+        if accept_encoding is not None:
+            request.META["HTTP_ACCEPT_ENCODING"] = accept_encoding
+        if response is None:
+            response = HttpResponse(self.body, content_type="application/json")
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings("gzip, br;q=0.8, deflate;q=0"), {"gzip", "br"})
+        self.assertEqual(accepted_encodings(""), set())
+
+    def test_gzip(self):
+        response = self._respond("gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_brotli_preferred(self):
+        if middleware.brotli is None:
+            self.skipTest("Brotli is not installed")
+        response = self._respond("gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(middleware.brotli.decompress(response.content), self.body)
+
+    def test_not_accepted(self):
+        for header in (None, "identity", "gzip;q=0"):
+            response = self._respond(header)
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertEqual(response.content, self.body)
+            # caches must still key on the header
+            self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_small_and_binary_bodies_are_left_alone(self):
+        small = HttpResponse(b"{}", content_type="application/json")
+        self.assertFalse(self._respond("gzip", small).has_header("Content-Encoding"))
+        image = HttpResponse(self.body, content_type="image/png")
+        self.assertFalse(self._respond("gzip", image).has_header("Content-Encoding"))
+
+    def test_html_with_csrf_cookie_is_compressed(self):
+        # Django masks the CSRF token per response, so pages carrying it compress too
+        page = HttpResponse(self.body, content_type="text/html; charset=utf-8")
+        page.set_cookie("csrftoken", "secret")
+        response = self._respond("gzip", page, CSRF_COOKIE_NEEDS_UPDATE=True)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_strong_etag_is_weakened(self):
+        response = HttpResponse(self.body, content_type="application/json")
+        response["ETag"] = '"abc"'
+        self.assertEqual(self._respond("gzip", response)["ETag"], 'W/"abc"')
+
+    def test_streaming(self):
+        stream = StreamingHttpResponse(iter([self.body[:100], self.body[100:]]), content_type="text/csv")
+        response = self._respond("gzip", stream)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.body)
+
+    async def test_async_handler(self):
+        async def get_response(request):
+            return HttpResponse(self.body, content_type="application/json")
+
+        compression = CompressionMiddleware(get_response)
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        response = await compression(request)
+        self.assertEqual(gzip.decompress(response.content), self.body)
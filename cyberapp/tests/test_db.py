@@ -0,0 +1,105 @@
+import os
+import runpy
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..db import pool_metrics
+
+
+def _pragmas(*names):
+    """PRAGMA values of a fresh connection to a new SQLite file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = ConnectionHandler({
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": Path(tmp) / "cafe.sqlite3"},
+        })
+        try:
+            with handler["default"].cursor() as cursor:
+                values = {}
+                for name in names:
+                    cursor.execute(f"PRAGMA {name}")
+                    values[name] = cursor.fetchone()[0]
+                return values
+        finally:
+            handler.close_all()
+
+
+class SqliteTuningTests(TestCase):
+    def test_file_database_is_tuned(self):
+        self.assertEqual(
+            _pragmas("journal_mode", "synchronous", "busy_timeout", "cache_size", "temp_store"),
+            # synchronous NORMAL is 1, temp_store MEMORY is 2
+            {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000, "cache_size": -64 * 1024, "temp_store": 2},
+        )
+
+    @override_settings(SQLITE_PRAGMAS={"busy_timeout": 250, "journal_mode": "wal"})
+    def test_pragmas_follow_settings(self):
+        self.assertEqual(_pragmas("busy_timeout")["busy_timeout"], 250)
+
+    @override_settings(SQLITE_TUNING=False)
+    def test_tuning_can_be_turned_off(self):
+        # SQLite's defaults: rollback journal, synchronous FULL
+        self.assertEqual(_pragmas("journal_mode", "synchronous"), {"journal_mode": "delete", "synchronous": 2})
+
+    def test_in_memory_test_database_is_left_alone(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "memory")
+
+
+class _FakeConnections:
+    """Stands in for ``django.db.connections`` with one pooled alias."""
+
+    def __init__(self, stats):
+        self.settings = {"default": {"OPTIONS": {}}, "pooled": {"OPTIONS": {"pool": {"max_size": 4}}}}
+        self._pooled = mock.Mock(**{"pool.get_stats.return_value": stats})
+
+    def __iter__(self):
+        return iter(self.settings)
+
+    def __getitem__(self, alias):
+        return self._pooled
+
+
+class PoolMetricsTests(SimpleTestCase):
+    def test_gauges_for_pooled_aliases_only(self):
+        stats = {"requests_num": 40, "requests_queued": 4, "requests_wait_ms": 10, "pool_size": 4, "pool_available": 1}
+        with mock.patch("cyberapp.db.connections", _FakeConnections(stats)):
+            gauges = pool_metrics()
+        self.assertEqual(gauges["db.pool.pooled.checkouts"], 40)
+        self.assertEqual(gauges["db.pool.pooled.checkouts_waited"], 4)
+        self.assertEqual(gauges["db.pool.pooled.wait_ms_avg"], 2.5)
+        self.assertEqual(gauges["db.pool.pooled.available"], 1)
+        # statistics psycopg_pool hasn't reported yet read as zero
+        self.assertEqual(gauges["db.pool.pooled.connections_lost"], 0)
+        self.assertFalse([name for name in gauges if name.startswith("db.pool.default.")])
+
+    def test_no_wait_average_before_anyone_waited(self):
+        with mock.patch("cyberapp.db.connections", _FakeConnections({"requests_num": 3})):
+            self.assertNotIn("db.pool.pooled.wait_ms_avg", pool_metrics())
+
+    def test_unpooled_process_reports_nothing(self):
+        self.assertEqual(pool_metrics(), {})
+
+
+class PoolSettingsTests(SimpleTestCase):
+    def _databases(self, **env):
+        with mock.patch.dict(os.environ, {"DATABASE_URL": "postgres://cafe:pw@db.example/cafe", **env}):
+            return runpy.run_path(str(Path(settings.BASE_DIR) / "cyber" / "settings.py"))["DATABASES"]
+
+    def test_pool_is_opt_in(self):
+        default = self._databases(DATABASE_POOL="False")["default"]
+        self.assertNotIn("pool", default["OPTIONS"])
+        self.assertEqual(default["CONN_MAX_AGE"], 600)
+
+    def test_pool_sizes_from_environment(self):
+        default = self._databases(DATABASE_POOL="True", DATABASE_POOL_MIN_SIZE="1", DATABASE_POOL_MAX_SIZE="4")["default"]
+        self.assertEqual(default["OPTIONS"]["pool"], {"min_size": 1, "max_size": 4, "timeout": 10.0})
+        # Django refuses persistent connections together with a pool
+        self.assertEqual(default["CONN_MAX_AGE"], 0)
+        self.assertFalse(default["CONN_HEALTH_CHECKS"])
@@ -0,0 +1,77 @@
+import io
+import json
+import tempfile
+from datetime import date
+from pathlib import Path
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Payment
+from .utils import make_student
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+@skipIf(pq is None, "pyarrow is not installed")
+class ExportParquetTests(TestCase):
+    def setUp(self):
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.student = make_student()
+        self.january = Payment.objects.create(student=self.student, date=date(2024, 1, 15), amount=50, balance=0)
+        self.february = Payment.objects.create(student=self.student, date=date(2024, 2, 3), amount=70, balance=0)
+
+    def _export(self, *args):
+        call_command("export_parquet", str(self.root), *args, stdout=io.StringIO())
+
+    def _partitions(self, table="payments"):
+        return {
+            path.parent.name: sorted(pq.read_table(path)["id"].to_pylist())
+            for path in (self.root / table).glob("month=*/data.parquet")
+        }
+
+    def test_first_run_partitions_by_month(self):
+        self._export()
+        self.assertEqual(
+            self._partitions(),
+            {"month=2024-01": [self.january.pk], "month=2024-02": [self.february.pk]},
+        )
+        self.assertEqual(self._partitions("students"), {"month=all": [self.student.pk]})
+        state = json.loads((self.root / "_watermarks.json").read_text())
+        # no sessions yet, so no sessions watermark
+        self.assertEqual(set(state), {"students", "payments"})
+
+    def test_incremental_run_replaces_changed_rows(self):
+        self._export()
+        self.january.amount = 80
+        self.january.save()
+        march = Payment.objects.create(student=self.student, date=date(2024, 3, 1), amount=10, balance=0)
+        self._export()
+
+        partitions = self._partitions()
+        self.assertEqual(partitions["month=2024-01"], [self.january.pk])
+        self.assertEqual(partitions["month=2024-03"], [march.pk])
+        amounts = pq.read_table(self.root / "payments" / "month=2024-01" / "data.parquet")["amount"].to_pylist()
+        self.assertEqual([str(amount) for amount in amounts], ["80.00"])
+
+    def test_moved_row_leaves_its_old_partition(self):
+        self._export()
+        self.january.date = date(2024, 2, 20)
+        self.january.save()
+        self._export()
+        # the emptied January partition is removed
+        self.assertEqual(self._partitions(), {"month=2024-02": [self.january.pk, self.february.pk]})
+
+    def test_full_rebuild_drops_deleted_rows(self):
+        self._export()
+        self.february.delete()
+        self._export()
+        self.assertIn("month=2024-02", self._partitions())
+
+        self._export("--full")
+        self.assertEqual(self._partitions(), {"month=2024-01": [self.january.pk]})
+        self.assertFalse((self.root / "payments.full").exists())
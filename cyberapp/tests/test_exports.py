@@ -0,0 +1,59 @@
+import csv
+import gzip
+import io
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Payment
+from .utils import ended_session, make_student
+
+
+class ExportCsvTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("clerk", password="pw")
+        self.client.force_login(self.user)
+        self.student = make_student()
+        for on in (date(2024, 1, 31), date(2024, 2, 1), date(2024, 2, 29), date(2024, 3, 1)):
+            Payment.objects.create(student=self.student, date=on, amount=50, balance=0)
+
+    def _rows(self, response):
+        return list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+    def test_bounds_are_inclusive(self):
+        response = self.client.get(reverse("export_csv", args=["payments"]), {"start": "2024-02-01", "end": "2024-02-29"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["date"] for row in self._rows(response)], ["2024-02-01", "2024-02-29"])
+
+    def test_gzip_export(self):
+        response = self.client.get(reverse("export_csv", args=["payments"]), {"gzip": "1"})
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        body = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(body)))), 4)
+
+    def test_invalid_dates_are_rejected(self):
+        url = reverse("export_csv", args=["payments"])
+        # 2024-02-30 is well-formed, so parse_date raises instead of returning None
+        for params in ({"start": "2024-02-30"}, {"end": "yesterday"}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()["success"])
+
+    def test_unknown_dataset(self):
+        self.assertEqual(self.client.get(reverse("export_csv", args=["students"])).status_code, 404)
+
+    def test_command_end_day_includes_the_whole_day(self):
+        late = datetime(2024, 2, 29, 23, 30, tzinfo=dt_timezone.utc)
+        ended_session(self.student, late, late + timedelta(minutes=20), "20.00")
+        ended_session(self.student, late + timedelta(days=1), late + timedelta(days=1, minutes=20), "20.00")
+        with tempfile.NamedTemporaryFile(suffix=".csv") as output:
+            with self.settings(TIME_ZONE="UTC"):
+                call_command("export_csv", "sessions", "--end", "2024-02-29", "--chunk-size", "1", "-o", output.name)
+            rows = list(csv.DictReader(io.StringIO(Path(output.name).read_text(encoding="utf-8"))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["amount_charged"], "20.00")
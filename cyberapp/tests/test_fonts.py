@@ -0,0 +1,68 @@
+import re
+import tempfile
+from pathlib import Path
+from unittest import skipIf
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from ..management.commands.subset_font import OUTPUT, UNICODE_RANGES, WEIGHTS
+
+try:
+    from fontTools.ttLib import TTFont
+except ImportError:
+    TTFont = None
+
+
+STYLES = Path(settings.BASE_DIR) / "cyberapp" / "static" / "styles" / "styles.css"
+
+
+def _unicode_range(ranges):
+    return ", ".join(f"U+{low:04X}" if low == high else f"U+{low:04X}-{high:04X}" for low, high in ranges)
+
+
+class SelfHostedFontTests(SimpleTestCase):
+    def test_stylesheet_has_no_remote_imports(self):
+        css = STYLES.read_text(encoding="utf-8")
+        self.assertNotIn("@import", css)
+        self.assertNotIn("fonts.googleapis.com", css)
+
+    def test_font_face_matches_the_subset(self):
+        face = re.search(r"@font-face\s*{(.*?)}", STYLES.read_text(encoding="utf-8"), re.S).group(1)
+        self.assertIn(f"unicode-range: {_unicode_range(UNICODE_RANGES)};", face)
+        self.assertIn(f"font-weight: {WEIGHTS[0]} {WEIGHTS[1]};", face)
+        self.assertIn("font-display: swap;", face)
+
+    @skipIf(TTFont is None, "fonttools is not installed")
+    def test_vendored_font_is_the_subset(self):
+        font = TTFont(OUTPUT)
+        codes = set(font.getBestCmap())
+        self.assertTrue(set(range(0x20, 0x7F)) <= codes)
+        self.assertTrue({ord(char) for char in "éŁ–“…€←−"} <= codes)
+        outside = [code for code in codes if not any(low <= code <= high for low, high in UNICODE_RANGES)]
+        self.assertEqual(outside, [])
+        axes = {axis.axisTag: (axis.minValue, axis.maxValue) for axis in font["fvar"].axes}
+        self.assertEqual(axes, {"wght": WEIGHTS})
+        # the OFL notices survive subsetting
+        self.assertIn("SIL Open Font License", font["name"].getDebugName(13))
+
+    @skipIf(TTFont is None, "fonttools is not installed")
+    def test_command_rejects_static_fonts(self):
+        from fontTools.fontBuilder import FontBuilder
+        from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+        builder = FontBuilder(1000, isTTF=True)
+        builder.setupGlyphOrder([".notdef"])
+        builder.setupCharacterMap({})
+        builder.setupGlyf({".notdef": TTGlyphPen(None).glyph()})
+        builder.setupHorizontalMetrics({".notdef": (500, 0)})
+        builder.setupHorizontalHeader()
+        builder.setupNameTable({"familyName": "Static", "styleName": "Regular"})
+        builder.setupOS2()
+        builder.setupPost()
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "static.ttf"
+            builder.save(source)
+            with self.assertRaisesMessage(CommandError, "is not a variable font"):
+                call_command("subset_font", str(source), "--output", str(Path(tmp) / "out.woff2"))
@@ -0,0 +1,79 @@
+import io
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase
+
+from ..forecast import WEEK_HOURS, fit, fitted_profiles, forecast, hourly_history
+from ..timeseries import REPORT_TZ
+from ..versioning import bump_data_version
+from .utils import ended_session, make_student
+
+
+# a Thursday; the last complete week started on Monday 2024-03-04
+NOW = datetime(2024, 3, 14, 15, 30, tzinfo=REPORT_TZ)
+MONDAY = datetime(2024, 3, 4, tzinfo=REPORT_TZ)
+
+
+class FitTests(SimpleTestCase):
+    def test_steady_weeks_forecast_the_same_week(self):
+        week = np.zeros(WEEK_HOURS)
+        week[[9, 10, 33]] = [2.0, 4.0, 1.0]
+        history = np.tile(week, (4, 1))
+        np.testing.assert_allclose(fit(history), week)
+
+    def test_level_follows_recent_weeks(self):
+        week = np.ones(WEEK_HOURS)
+        history = np.stack([week, week, week * 3])
+        expected_total = WEEK_HOURS * (0.49 * 1 + 0.21 * 1 + 0.3 * 3)
+        self.assertAlmostEqual(fit(history, alpha=0.3).sum(), expected_total)
+        # alpha=1 forgets everything but the newest week
+        self.assertAlmostEqual(fit(history, alpha=1).sum(), WEEK_HOURS * 3)
+
+    def test_empty_history(self):
+        self.assertEqual(fit(np.zeros((3, WEEK_HOURS))).tolist(), [0.0] * WEEK_HOURS)
+
+
+# data versions are bumped on commit, which TestCase never reaches
+class ForecastTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        student = make_student()
+        # two machines busy 09:00-11:00 every Monday of the last two weeks
+        for week in (0, 1):
+            start = MONDAY - timedelta(weeks=week) + timedelta(hours=9)
+            for _ in range(2):
+                ended_session(student, start, start + timedelta(hours=2), "100.00")
+
+    def test_hourly_history(self):
+        occupancy, revenue = hourly_history(MONDAY - timedelta(weeks=1), 2)
+        self.assertEqual(occupancy.shape, (2, WEEK_HOURS))
+        self.assertEqual(occupancy[:, 9:11].tolist(), [[2.0, 2.0], [2.0, 2.0]])
+        self.assertEqual(occupancy.sum(), 8.0)
+        # charges land in the hour the sessions ended
+        self.assertEqual(revenue[:, 11].tolist(), [200.0, 200.0])
+
+    def test_forecast(self):
+        hours, occupancy, revenue = forecast(days=7, weeks=2, now=NOW)
+        self.assertEqual(hours[0], datetime(2024, 3, 14, 15, tzinfo=REPORT_TZ))
+        monday_9 = hours.index(datetime(2024, 3, 18, 9, tzinfo=REPORT_TZ))
+        self.assertAlmostEqual(occupancy[monday_9], 2.0)
+        self.assertAlmostEqual(revenue[monday_9 + 2], 200.0)
+        self.assertAlmostEqual(occupancy.sum(), 4.0)
+
+    def test_profiles_are_cached_per_data_version(self):
+        fitted_profiles(weeks=2, now=NOW)
+        # a cache hit only reads the data version
+        with self.assertNumQueries(1):
+            fitted_profiles(weeks=2, now=NOW)
+        bump_data_version()
+        with self.assertNumQueries(2):
+            fitted_profiles(weeks=2, now=NOW)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("forecast_demand", "--days", "1", "--weeks", "2", "--json", stdout=out)
+        self.assertEqual(len(json.loads(out.getvalue())), 24)
@@ -0,0 +1,53 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..forms import PaymentForm
+from .utils import PLAIN_STATIC, make_student
+
+
+class StudentPickerTests(TestCase):
+    def setUp(self):
+        self.student = make_student()
+        for number in range(20):
+            make_student(f"2{number:03}")
+
+    def test_unbound_form_renders_without_queries(self):
+        with self.assertNumQueries(0):
+            html = str(PaymentForm()["student"])
+        self.assertIn('data-search-url="/search/students/"', html)
+        self.assertNotIn("<option", html)
+
+    def test_bound_form_loads_only_the_picked_student(self):
+        form = PaymentForm({"student": self.student.pk})
+        # rendering a bound field validates the form first
+        with CaptureQueriesContext(connection) as queries:
+            html = str(form["student"])
+        self.assertTrue(queries)
+        for query in queries:
+            self.assertIn(f'"cyberapp_student"."id" = {self.student.pk}', query["sql"])
+        self.assertIn('value="Amina Otieno (1001)"', html)
+        self.assertIn(f'value="{self.student.pk}"', html)
+
+    def test_garbage_value_renders_an_empty_label(self):
+        html = str(PaymentForm({"student": "abc"})["student"])
+        self.assertIn('type="search" value=""', html)
+
+    def test_validation(self):
+        data = {"amount": "50", "balance": "0", "date": date(2024, 5, 1)}
+        self.assertTrue(PaymentForm({**data, "student": self.student.pk}).is_valid())
+        form = PaymentForm({**data, "student": 999999})
+        self.assertFalse(form.is_valid())
+        self.assertIn("student", form.errors)
+
+    @override_settings(STORAGES=PLAIN_STATIC)
+    def test_add_payment_page_does_not_list_students(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("add_payment"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if "cyberapp_student" in query["sql"]])
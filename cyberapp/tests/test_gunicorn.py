@@ -0,0 +1,56 @@
+import os
+import runpy
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from gunicorn.config import Config
+
+
+CONFIG = Path(settings.BASE_DIR) / "gunicorn.conf.py"
+ENVIRONMENT = ("MPESA_ASYNC", "WEB_CONCURRENCY", "GUNICORN_THREADS", "GUNICORN_MAX_REQUESTS", "PORT")
+
+
+class GunicornConfigTests(SimpleTestCase):
+    def _load(self, cpus=2, **env):
+        environ = {key: value for key, value in os.environ.items() if key not in ENVIRONMENT}
+        with mock.patch.dict(os.environ, {**environ, **env}, clear=True), \
+                mock.patch("os.sched_getaffinity", return_value=set(range(cpus)), create=True):
+            namespace = runpy.run_path(str(CONFIG))
+        # gunicorn validates each setting the way it would at startup
+        config = Config()
+        for name, value in namespace.items():
+            if name in config.settings:
+                config.set(name, value)
+        return config
+
+    def test_sync_workers(self):
+        config = self._load(cpus=2)
+        self.assertEqual(config.wsgi_app, "cyber.wsgi:application")
+        self.assertEqual(config.worker_class_str, "gthread")
+        self.assertEqual((config.workers, config.threads), (5, 4))
+        self.assertTrue(config.preload_app)
+        self.assertGreater(config.timeout, 30)
+
+    def test_default_workers_are_capped(self):
+        self.assertEqual(self._load(cpus=64).workers, 8)
+        self.assertEqual(self._load(cpus=64, WEB_CONCURRENCY="12").workers, 12)
+
+    def test_async_workers(self):
+        config = self._load(cpus=2, MPESA_ASYNC="True", GUNICORN_THREADS="8")
+        self.assertEqual(config.wsgi_app, "cyber.asgi:application")
+        self.assertEqual(config.worker_class_str, "uvicorn_worker.UvicornWorker")
+        self.assertEqual(config.workers, 2)
+        # threads mean nothing to an event-loop worker
+        self.assertEqual(config.threads, 1)
+
+    def test_environment_overrides(self):
+        config = self._load(PORT="9000", GUNICORN_THREADS="2", GUNICORN_MAX_REQUESTS="50")
+        self.assertEqual(config.bind, ["0.0.0.0:9000"])
+        self.assertEqual((config.threads, config.max_requests), (2, 50))
+
+    def test_post_fork_drops_inherited_connections(self):
+        with mock.patch("django.db.connections") as connections:
+            self._load().post_fork(mock.Mock(), mock.Mock())
+        connections.close_all.assert_called_once_with()
@@ -0,0 +1,107 @@
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock, skipIf
+
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from ..images import VARIANT_DIR, VARIANT_INDEX, build_image_variants, referenced_images
+from .utils import PLAIN_STATIC
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+VARIANTS = [
+    ("image/avif", [(480, "images/variants/hero-480w.avif"), (960, "images/variants/hero-960w.avif")]),
+    ("image/webp", [(480, "images/variants/hero-480w.webp"), (960, "images/variants/hero-960w.webp")]),
+]
+
+
+@skipIf(Image is None, "Pillow is not installed")
+class BuildImageVariantsTests(SimpleTestCase):
+    def setUp(self):
+        tmp = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.source, self.build = tmp / "static", tmp / "build"
+        (self.source / "images").mkdir(parents=True)
+        for name, width in (("hero.jpg", 1200), ("unused.jpg", 800)):
+            Image.new("RGB", (width, width // 2), "teal").save(self.source / "images" / name)
+        self.logged = []
+
+    def _build(self, names=("images/hero.jpg",)):
+        return build_image_variants(self.source, self.build, set(names), log=self.logged.append)
+
+    def test_only_referenced_images_get_variants(self):
+        self.assertEqual(self._build(), 1)
+        index = json.loads((self.build / VARIANT_INDEX).read_text())
+        self.assertEqual(list(index), ["images/hero.jpg"])
+        entry = index["images/hero.jpg"]
+        self.assertIn("webp", entry["variants"])
+        # capped at the source width instead of upscaling
+        self.assertEqual([width for width, _ in entry["variants"]["webp"]], [480, 960, 1200])
+        for paths in entry["variants"].values():
+            for _, path in paths:
+                self.assertTrue((self.build / path).exists())
+        self.assertFalse(list((self.build / VARIANT_DIR).glob("unused-*")))
+
+    def test_unchanged_sources_are_skipped(self):
+        self._build()
+        self.assertEqual(self._build(), 0)
+        Image.new("RGB", (1200, 600), "orange").save(self.source / "images" / "hero.jpg")
+        self.assertEqual(self._build(), 1)
+
+    def test_variants_of_images_no_longer_used_are_removed(self):
+        self._build()
+        self._build(names=())
+        self.assertEqual(json.loads((self.build / VARIANT_INDEX).read_text()), {})
+        self.assertEqual([path.name for path in (self.build / VARIANT_DIR).iterdir()], ["index.json"])
+
+
+class ReferencedImagesTests(SimpleTestCase):
+    def test_tag_arguments_are_collected(self):
+        with tempfile.TemporaryDirectory() as templates:
+            Path(templates, "page.html").write_text(
+                "{% load responsive_images %}"
+                "{% responsive_image 'images/a.jpg' alt='A' %}"
+                "{% responsive_background '.hero' \"images/b.webp\" layers='linear-gradient(red, blue)' %}"
+                "<img src=\"{% static 'images/c.jpg' %}\">"
+            )
+            self.assertEqual(referenced_images(templates), {"images/a.jpg", "images/b.webp"})
+
+    def test_app_templates(self):
+        self.assertIn("images/keyboard.jpg", referenced_images(Path(__file__).resolve().parents[1] / "templates"))
+
+
+@override_settings(STORAGES=PLAIN_STATIC, STATIC_URL="/static/")
+class ResponsiveImageTagTests(SimpleTestCase):
+    def _render(self, source):
+        return Template("{% load responsive_images %}" + source).render(Context())
+
+    @mock.patch("cyberapp.templatetags.responsive_images.image_variants", return_value=VARIANTS)
+    def test_picture(self, _):
+        html = self._render("{% responsive_image 'images/hero.jpg' alt='Hero' sizes='50vw' class_='hero' %}")
+        self.assertIn(
+            '<source type="image/avif" srcset="/static/images/variants/hero-480w.avif 480w, '
+            '/static/images/variants/hero-960w.avif 960w" sizes="50vw">',
+            html,
+        )
+        self.assertIn('<img src="/static/images/hero.jpg" alt="Hero" loading="lazy" decoding="async" class="hero">', html)
+
+    @mock.patch("cyberapp.templatetags.responsive_images.image_variants", return_value=VARIANTS)
+    def test_background_steps_up_by_viewport(self, _):
+        css = self._render("{% responsive_background '.hero' 'images/hero.jpg' layers='linear-gradient(red, blue)' %}")
+        self.assertIn(
+            '.hero { background-image: linear-gradient(red, blue), image-set('
+            'url("/static/images/variants/hero-480w.avif") type("image/avif"), '
+            'url("/static/images/variants/hero-480w.webp") type("image/webp")); }',
+            css,
+        )
+        self.assertIn("@media (min-width: 481px) { .hero { background-image:", css)
+
+    @mock.patch("cyberapp.templatetags.responsive_images.image_variants", return_value=[])
+    def test_without_variants(self, _):
+        self.assertEqual(self._render("{% responsive_background '.hero' 'images/hero.jpg' %}"), "")
+        self.assertIn('<picture><img src="/static/images/hero.jpg"', self._render("{% responsive_image 'images/hero.jpg' %}"))
@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..ledger import current_balance, ledger_page
+from ..models import Payment
+from .utils import PLAIN_STATIC, ended_session, make_student, settled_payment
+
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.student = make_student()
+        t1 = datetime(2024, 3, 1, 10, tzinfo=dt_timezone.utc)
+        t3 = datetime(2024, 3, 3, 10, tzinfo=dt_timezone.utc)
+        ended_session(self.student, t1 - timedelta(hours=1), t1, "100.00")
+        settled_payment(self.student, date(2024, 3, 2), "30.00")
+        ended_session(self.student, t3 - timedelta(minutes=30), t3, "50.00", payment_status="paid")
+        # an unsettled STK payment is not on the statement
+        Payment.objects.create(student=self.student, date=date(2024, 3, 2), amount=999, balance=0,
+                               mpesa_status=Payment.STATUS_PENDING)
+        self.student.refresh_from_db()
+
+    def test_running_balance_newest_first(self):
+        page = ledger_page(self.student, page_size=10)
+        self.assertEqual(self.student.open_balance, Decimal("70.00"))
+        self.assertEqual(
+            [(entry.label, entry.amount, entry.balance) for entry in page.items],
+            [
+                ("Session paid via M-Pesa", Decimal("-50.00"), Decimal("70.00")),
+                ("Session charge", Decimal("50.00"), Decimal("120.00")),
+                ("Payment", Decimal("-30.00"), Decimal("70.00")),
+                ("Session charge", Decimal("100.00"), Decimal("100.00")),
+            ],
+        )
+        self.assertFalse(page.has_next)
+
+    def test_cursor_carries_the_balance(self):
+        first = ledger_page(self.student, page_size=2)
+        second = ledger_page(self.student, cursor=first.next_cursor, page_size=2)
+        self.assertEqual([entry.balance for entry in first.items], [Decimal("70.00"), Decimal("120.00")])
+        self.assertEqual([entry.balance for entry in second.items], [Decimal("70.00"), Decimal("100.00")])
+        self.assertFalse(second.has_next)
+
+    def test_shop_wide_ledger(self):
+        other = make_student("1002")
+        end = datetime(2024, 3, 4, 10, tzinfo=dt_timezone.utc)
+        ended_session(other, end - timedelta(hours=1), end, "40.00")
+        self.assertEqual(current_balance(), Decimal("110.00"))
+        page = ledger_page(page_size=10)
+        self.assertEqual(page.items[0].balance, Decimal("110.00"))
+        self.assertEqual(page.items[-1].balance, Decimal("100.00"))
+
+    def test_ledger_view(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        response = self.client.get(reverse("student_ledger", args=[self.student.idnumber]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["page"].items), 4)
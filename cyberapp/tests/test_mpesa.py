@@ -0,0 +1,103 @@
+import io
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import MpesaCallback, UsageSession
+from ..mpesa import CALLBACK_APPLIED, CALLBACK_DUPLICATE, CALLBACK_UNKNOWN, process_stk_callback
+from .utils import ended_session, make_student
+
+
+def stk_callback(checkout_request_id, receipt="QK12ABC", amount=100, result_code=0):
+    callback = {
+        "MerchantRequestID": "29115-34620561-1",
+        "CheckoutRequestID": checkout_request_id,
+        "ResultCode": result_code,
+        "ResultDesc": "The service request is processed successfully.",
+    }
+    if result_code == 0:
+        callback["CallbackMetadata"] = {"Item": [
+            {"Name": "Amount", "Value": amount},
+            {"Name": "MpesaReceiptNumber", "Value": receipt},
+            {"Name": "PhoneNumber", "Value": 254712345678},
+        ]}
+    return {"Body": {"stkCallback": callback}}
+
+
+class MpesaCallbackTests(TestCase):
+    def setUp(self):
+        self.student = make_student()
+        end = timezone.now()
+        self.session = ended_session(
+            self.student, end - timedelta(hours=1), end, "100.00",
+            payment_status="pending", mpesa_checkout_request_id="ws_CO_1",
+        )
+
+    def test_callback_marks_session_paid(self):
+        self.assertEqual(process_stk_callback(stk_callback("ws_CO_1")), CALLBACK_APPLIED)
+        self.session.refresh_from_db()
+        self.student.refresh_from_db()
+        self.assertEqual(self.session.payment_status, "paid")
+        self.assertEqual(self.session.mpesa_receipt_number, "QK12ABC")
+        self.assertEqual(self.student.total_paid, Decimal("100.00"))
+        self.assertEqual(self.student.open_balance, Decimal("0.00"))
+
+    def test_replayed_callback_is_a_no_op(self):
+        body = stk_callback("ws_CO_1")
+        process_stk_callback(body)
+        self.student.refresh_from_db()
+        paid_once = (self.student.total_paid, self.student.open_balance)
+
+        self.assertEqual(process_stk_callback(body), CALLBACK_DUPLICATE)
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.total_paid, self.student.open_balance), paid_once)
+        self.assertEqual(MpesaCallback.objects.count(), 1)
+
+    def test_unknown_checkout_is_not_logged(self):
+        body = stk_callback("ws_CO_2", receipt="QK34DEF")
+        with self.assertLogs("cyberapp.mpesa", "WARNING"):
+            self.assertEqual(process_stk_callback(body), CALLBACK_UNKNOWN)
+        self.assertFalse(MpesaCallback.objects.exists())
+
+        # Safaricom redelivers once the push's session row is committed
+        UsageSession.objects.filter(pk=self.session.pk).update(mpesa_checkout_request_id="ws_CO_2")
+        self.assertEqual(process_stk_callback(body), CALLBACK_APPLIED)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.payment_status, "paid")
+
+    def test_integrity_error_while_applying_is_raised(self):
+        with mock.patch("cyberapp.mpesa.apply_stk_callback", side_effect=IntegrityError("boom")):
+            with self.assertRaises(IntegrityError):
+                process_stk_callback(stk_callback("ws_CO_1"))
+        # nothing was logged, so the retry is applied
+        self.assertFalse(MpesaCallback.objects.exists())
+        self.assertEqual(process_stk_callback(stk_callback("ws_CO_1")), CALLBACK_APPLIED)
+
+    def test_view_acknowledges_replays(self):
+        url = reverse("mpesa_callback")
+        body = json.dumps(stk_callback("ws_CO_1"))
+        for _ in range(2):
+            response = self.client.post(url, body, content_type="application/json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["ResultCode"], 0)
+        self.assertEqual(MpesaCallback.objects.count(), 1)
+
+    def test_replay_command(self):
+        bodies = [stk_callback("ws_CO_1"), stk_callback("ws_CO_1"), stk_callback("ws_CO_9", receipt="QK99XYZ")]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as archive:
+            archive.write("\n".join(json.dumps(body) for body in bodies))
+            archive.flush()
+            out = io.StringIO()
+            with self.assertLogs("cyberapp.mpesa", "WARNING"):
+                call_command("replay_mpesa_callbacks", archive.name, stdout=out)
+        self.assertIn("applied=1, duplicate=1, unknown=1", out.getvalue())
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.payment_status, "paid")
@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..models import UsageSession
+from ..occupancy import occupancy_for_dates, occupancy_profile, sweep
+from ..timeseries import REPORT_TZ
+from .utils import ended_session, make_student
+
+
+MONDAY = datetime(2024, 3, 11, tzinfo=REPORT_TZ)
+
+
+def at(hours):
+    return int((MONDAY + timedelta(hours=hours)).timestamp())
+
+
+class SweepTests(SimpleTestCase):
+    def setUp(self):
+        # 09:00-11:00, 10:00-10:30 and 11:00-12:00 on a Monday, Nairobi time
+        self.starts = np.array([at(9), at(10), at(11)], dtype=np.int64)
+        self.ends = np.array([at(11), at(10.5), at(12)], dtype=np.int64)
+
+    def test_back_to_back_sessions_do_not_overlap(self):
+        times, occupancy = sweep(self.starts, self.ends, at(0), at(24))
+        self.assertEqual(occupancy.max(), 2)
+        # at 11:00 the first session ends before the third starts
+        self.assertEqual(occupancy[np.searchsorted(times, at(11), side="right") - 1], 1)
+        self.assertEqual(occupancy[-1], 0)
+
+    def test_intervals_are_clipped_to_the_range(self):
+        times, occupancy = sweep(self.starts, self.ends, at(10.25), at(10.75))
+        self.assertEqual((times.min(), times.max()), (at(10.25), at(10.75)))
+        self.assertEqual(occupancy.max(), 2)
+        # sessions entirely outside the range vanish
+        _, occupancy = sweep(self.starts, self.ends, at(13), at(14))
+        self.assertEqual(occupancy.tolist(), [0])
+
+    def test_profile(self):
+        profile = occupancy_profile(self.starts, self.ends, at(0), at(24), include_minutes=True)
+        self.assertEqual(profile["peak"], 2)
+        self.assertEqual(profile["peak_at"], "2024-03-11T10:00:00+03:00")
+        self.assertAlmostEqual(profile["average"], 3.5 / 24)
+
+        monday_average, monday_peak = profile["heatmap_average"][0], profile["heatmap_peak"][0]
+        self.assertEqual(monday_average[8:13], [0.0, 1.0, 1.5, 1.0, 0.0])
+        self.assertEqual(monday_peak[8:13], [0, 1, 2, 1, 0])
+        self.assertEqual(sum(map(sum, profile["heatmap_average"][1:])), 0)
+
+        self.assertEqual(len(profile["minutes"]), 24 * 60)
+        self.assertEqual(profile["minutes"][10 * 60 + 29], 2)
+        self.assertEqual(profile["minutes"][10 * 60 + 30], 1)
+
+    def test_empty_range(self):
+        empty = np.array([], dtype=np.int64)
+        profile = occupancy_profile(empty, empty, at(0), at(24))
+        self.assertEqual((profile["peak"], profile["peak_at"], profile["average"]), (0, None, 0.0))
+
+
+class OccupancyQueryTests(TestCase):
+    def setUp(self):
+        student = make_student()
+        ended_session(student, MONDAY + timedelta(hours=9), MONDAY + timedelta(hours=11), "100.00")
+        # spills over midnight into Tuesday
+        ended_session(student, MONDAY + timedelta(hours=23), MONDAY + timedelta(hours=25), "100.00")
+
+    def test_sessions_are_cut_at_the_day_boundary(self):
+        profile = occupancy_for_dates(date(2024, 3, 11), date(2024, 3, 11), now=MONDAY + timedelta(days=2))
+        self.assertEqual(profile["sessions"], 2)
+        self.assertAlmostEqual(profile["average"], 3 / 24)
+        self.assertEqual(profile["heatmap_average"][1], [0.0] * 24)
+
+    def test_running_sessions_end_now(self):
+        student = make_student("1002")
+        UsageSession.objects.create(student=student, start_time=MONDAY + timedelta(days=1, hours=8), is_active=True)
+        profile = occupancy_for_dates(date(2024, 3, 12), date(2024, 3, 12), now=MONDAY + timedelta(days=1, hours=10))
+        self.assertEqual(profile["heatmap_average"][1][:10], [1.0] + [0.0] * 7 + [1.0, 1.0])
+
+    def test_api(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        url = reverse("occupancy_api")
+        response = self.client.get(url, {"start": "2024-03-11", "end": "2024-03-11", "minutes": "1"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["peak"], data["capacity"]), (1, 30))
+        self.assertEqual(len(data["minutes"]), 24 * 60)
+        for params in ({"start": "2024-02-30"}, {"start": "2024-03-12", "end": "2024-03-11"},
+                       {"start": "2023-01-01", "end": "2024-12-31", "minutes": "1"}):
+            self.assertEqual(self.client.get(url, params).status_code, 400)
@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import routers
+from ..models import Payment
+from ..routers import PIN_COOKIE, REPLICA_ALIAS, ReplicaPinningMiddleware, ReplicaRouter, read_from_replica
+
+
+@mock.patch.dict("django.conf.settings.DATABASES", {REPLICA_ALIAS: {}})
+@mock.patch("cyberapp.routers.connections", {"default": mock.Mock(in_atomic_block=False)})
+@override_settings(REPLICA_PIN_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def _serve(self, view, **cookies):
+        request = RequestFactory().get("/")
+        request.COOKIES.update(cookies)
+        return ReplicaPinningMiddleware(view)(request)
+
+    def test_reads_go_to_replica_only_inside_marked_views(self):
+        routed = {}
+
+        @read_from_replica
+        def view(request):
+            routed["payment"] = self.router.db_for_read(Payment)
+            routed["user"] = self.router.db_for_read(User)
+            return HttpResponse()
+
+        def unmarked(request):
+            routed["unmarked"] = self.router.db_for_read(Payment)
+            return HttpResponse()
+
+        self._serve(view)
+        self._serve(unmarked)
+        self.assertEqual(routed, {"payment": REPLICA_ALIAS, "user": None, "unmarked": None})
+        self.assertIsNone(self.router.db_for_read(Payment))
+
+    def test_write_sets_pin_cookie(self):
+        @read_from_replica
+        def view(request):
+            self.assertEqual(self.router.db_for_write(Payment), "default")
+            return HttpResponse()
+
+        response = self._serve(view)
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], 10)
+        self.assertTrue(cookie["httponly"])
+        self.assertNotIn(PIN_COOKIE, self._serve(read_from_replica(lambda request: HttpResponse())).cookies)
+
+    def test_pinned_client_reads_primary(self):
+        routed = []
+
+        @read_from_replica
+        def view(request):
+            routed.append(self.router.db_for_read(Payment))
+            return HttpResponse()
+
+        self._serve(view, **{PIN_COOKIE: "1"})
+        self.assertEqual(routed, [None])
+
+    def test_transactions_read_primary(self):
+        routed = []
+
+        @read_from_replica
+        def view(request):
+            routers.connections["default"].in_atomic_block = True
+            try:
+                routed.append(self.router.db_for_read(Payment))
+            finally:
+                routers.connections["default"].in_atomic_block = False
+            return HttpResponse()
+
+        self._serve(view)
+        self.assertEqual(routed, [None])
+
+    def test_replica_is_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate(REPLICA_ALIAS, "cyberapp"))
+        self.assertTrue(self.router.allow_migrate("default", "cyberapp"))
+
+    async def test_async_handler_pins_after_write(self):
+        async def get_response(request):
+            self.router.db_for_write(Payment)
+            return HttpResponse()
+
+        response = await ReplicaPinningMiddleware(get_response)(RequestFactory().get("/"))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_unused_without_replica(self):
+        with mock.patch.dict("django.conf.settings.DATABASES", clear=True, default={}):
+            with self.assertRaises(MiddlewareNotUsed):
+                ReplicaPinningMiddleware(lambda request: HttpResponse())
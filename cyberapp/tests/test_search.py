@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..search import search_students, student_search_queryset
+from .utils import make_student
+
+
+class StudentSearchTests(TestCase):
+    def setUp(self):
+        make_student("1001", firstname="Amina", lastname="Otieno", phonenumber="0712345678")
+        make_student("1002", firstname="Zoë", lastname="Achieng", phonenumber="0722000111")
+        make_student("2001", firstname="Brian", lastname="Kamau", phonenumber="0733999888")
+        make_student("2002", firstname="Amos", lastname="Kamau", phonenumber="0744555666")
+
+    def _ids(self, term, **kwargs):
+        page, timed_out = search_students(term, **kwargs)
+        self.assertFalse(timed_out)
+        return [student.idnumber for student in page.items]
+
+    def _check_matches(self):
+        # word prefixes, in directory order (lastname, firstname, id)
+        self.assertEqual(self._ids("am"), ["2002", "1001"])
+        self.assertEqual(self._ids("kam am"), ["2002"])
+        # accents are folded both ways
+        self.assertEqual(self._ids("zoe"), ["1002"])
+        self.assertEqual(self._ids("ZOË"), ["1002"])
+        # ID numbers and either spelling of a phone number, spaces ignored
+        self.assertEqual(self._ids("200"), ["2002", "2001"])
+        self.assertEqual(self._ids("0712 345"), ["1001"])
+        self.assertEqual(self._ids("254712"), ["1001"])
+        # only prefixes match, not inner substrings
+        self.assertEqual(self._ids("mina"), [])
+
+    @mock.patch.object(search, "_fts_ready", {})
+    def test_fts_index(self):
+        self.assertTrue(search._has_fts(connection))
+        self.assertIn(search.FTS_TABLE, str(student_search_queryset("am").query))
+        self._check_matches()
+
+    @mock.patch.object(search, "_has_fts", return_value=False)
+    def test_like_fallback(self, _):
+        self.assertNotIn(search.FTS_TABLE, str(student_search_queryset("am").query))
+        self._check_matches()
+
+    @mock.patch.object(search, "_fts_ready", {})
+    def test_index_follows_renames_and_deletes(self):
+        student = make_student("3001", firstname="Wanjiru", lastname="Mwangi", phonenumber="0755111222")
+        self.assertEqual(self._ids("wanj"), ["3001"])
+        student.firstname = "Njeri"
+        student.save()
+        self.assertEqual(self._ids("wanj"), [])
+        self.assertEqual(self._ids("njer"), ["3001"])
+        student.delete()
+        self.assertEqual(self._ids("njer"), [])
+
+    def test_cursor_pages_through_matches(self):
+        first, _ = search_students("", limit=3)
+        self.assertEqual([student.idnumber for student in first.items], ["1002", "2002", "2001"])
+        second, _ = search_students("", limit=3, cursor=first.next_cursor)
+        self.assertEqual([student.idnumber for student in second.items], ["1001"])
+        self.assertFalse(second.has_next)
+
+    def test_over_budget_returns_an_empty_page(self):
+        with mock.patch.object(search, "paginate_keyset", side_effect=OperationalError("interrupted")):
+            with self.assertLogs("cyberapp.search", "WARNING"):
+                page, timed_out = search_students("am")
+        self.assertTrue(timed_out)
+        self.assertEqual(page.items, [])
+
+    def test_view(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        response = self.client.get(reverse("student_search"), {"q": "kamau", "limit": "1"})
+        data = response.json()
+        self.assertEqual([result["idnumber"] for result in data["results"]], ["2002"])
+        self.assertEqual(data["results"][0]["url"], reverse("student_detail", args=["2002"]))
+        self.assertIsNotNone(data["next_cursor"])
+        more = self.client.get(reverse("student_search"), {"q": "kamau", "cursor": data["next_cursor"]}).json()
+        self.assertEqual([result["idnumber"] for result in more["results"]], ["2001"])
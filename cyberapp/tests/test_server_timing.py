@@ -0,0 +1,55 @@
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from .. import timing
+from ..middleware import ServerTimingMiddleware
+from ..models import Student
+
+
+@override_settings(SERVER_TIMING=True, SERVER_TIMING_BUDGETS={"total": None, "db": None, "queries": 5})
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.added_timer = timing._time_query not in connection.execute_wrappers
+        timing.install_query_timer(sender=None, connection=connection)
+
+    def tearDown(self):
+        if self.added_timer:
+            connection.execute_wrappers.remove(timing._time_query)
+
+    @staticmethod
+    def _view(queries):
+        def view(request):
+            for _ in range(queries):
+                Student.objects.count()
+            with timing.timed("http"):
+                pass
+            return HttpResponse()
+
+        return view
+
+    def test_header(self):
+        response = ServerTimingMiddleware(self._view(2))(RequestFactory().get("/"))
+        metrics = dict(part.split(";", 1) for part in response["Server-Timing"].split(", "))
+        self.assertEqual(set(metrics), {"db", "tpl", "http", "total"})
+        self.assertIn('desc="2 queries"', metrics["db"])
+
+    def test_over_budget_is_logged(self):
+        with self.assertLogs("cyberapp.middleware", "WARNING") as logs:
+            ServerTimingMiddleware(self._view(6))(RequestFactory().get("/students/"))
+        self.assertIn("queries 6 > 5", logs.output[0])
+
+    async def test_async_handler(self):
+        async def get_response(request):
+            with timing.timed("http"):
+                pass
+            return HttpResponse()
+
+        response = await ServerTimingMiddleware(get_response)(RequestFactory().get("/"))
+        self.assertIn('desc="0 queries"', response["Server-Timing"])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_unused_when_off(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ServerTimingMiddleware(self._view(0))
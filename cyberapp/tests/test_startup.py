@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+# Runs in a fresh interpreter: load what a worker needs for its first page
+# without touching the database, then list the heavy modules it imported.
+BOOT_SCRIPT = """
+import json, sys
+import django
+django.setup()
+from django.template.loader import get_template
+from django.urls import get_resolver
+get_resolver().url_patterns
+get_template("login.html").render({})
+heavy = ("django_daraja.mpesa", "requests", "cryptography", "numpy", "pyarrow", "httpx", "rest_framework")
+print(json.dumps([name for name in heavy if name in sys.modules]))
+"""
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_boot_leaves_payment_and_report_stacks_unloaded(self):
+        result = subprocess.run(
+            [sys.executable, "-c", BOOT_SCRIPT],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "cyber.settings")},
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        self.assertEqual(json.loads(result.stdout.strip().splitlines()[-1]), [])
+
+    def test_payment_stack_loads_on_first_use(self):
+        from ..views import _stk_push_params
+
+        with self.assertRaisesMessage(ValueError, "Phone number is required"):
+            _stk_push_params(phone_input="", amount_decimal=100, account_reference="", transaction_desc="", request=None)
+        self.assertIn("django_daraja.mpesa.utils", sys.modules)
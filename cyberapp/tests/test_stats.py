@@ -0,0 +1,83 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Student, UsageSession
+from .utils import PLAIN_STATIC, ended_session, make_student, settled_payment
+
+
+class StudentStatsTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        self.student = make_student()
+
+    def _verify(self, *args):
+        out = io.StringIO()
+        call_command("verify_student_stats", *args, stdout=out)
+        return out.getvalue()
+
+    def test_session_and_payment_deltas_match_recomputation(self):
+        self.client.get(reverse("start_session", args=[self.student.idnumber]))
+        # bill two hours
+        UsageSession.objects.update(start_time=timezone.now() - timedelta(hours=2))
+        self.client.post(reverse("end_session", args=[self.student.idnumber]))
+        settled_payment(self.student, timezone.localdate(), "150.00")
+
+        self.student.refresh_from_db()
+        self.assertAlmostEqual(self.student.total_charged, Decimal("200.00"), delta=Decimal("0.10"))
+        self.assertEqual(self.student.total_paid, Decimal("150.00"))
+        self.assertEqual(self.student.open_balance, self.student.total_charged - Decimal("150.00"))
+        self.assertIn("0 drifted", self._verify())
+
+        annotated = Student.objects.with_lifetime_totals().get(pk=self.student.pk)
+        self.assertEqual(
+            (annotated.lifetime_time, annotated.lifetime_charged, annotated.lifetime_paid, annotated.lifetime_balance),
+            (self.student.total_time, self.student.total_charged, self.student.total_paid, self.student.open_balance),
+        )
+
+    def test_repeated_end_is_counted_once(self):
+        self.client.get(reverse("start_session", args=[self.student.idnumber]))
+        UsageSession.objects.update(start_time=timezone.now() - timedelta(hours=1))
+        url = reverse("end_session", args=[self.student.idnumber])
+        self.client.post(url, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.student.refresh_from_db()
+        ended_once = (self.student.total_time, self.student.total_charged, self.student.open_balance)
+
+        response = self.client.post(url, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        self.assertEqual(response.json()["status"], "error")
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.total_time, self.student.total_charged, self.student.open_balance), ended_once)
+        self.assertIn("0 drifted", self._verify())
+
+    def test_drift_is_reported_and_fixed(self):
+        end = timezone.now()
+        ended_session(self.student, end - timedelta(hours=1), end, "100.00")
+        Student.objects.filter(pk=self.student.pk).update(total_paid=Decimal("40.00"))
+        with self.assertRaises(CommandError):
+            self._verify()
+        self.assertIn("all repaired", self._verify("--fix"))
+        self.assertIn("0 drifted", self._verify())
+
+    @override_settings(STORAGES=PLAIN_STATIC)
+    def test_roster_sorts_by_stats(self):
+        end = timezone.now()
+        owes = make_student("1002", lastname="Zulu")
+        ended_session(owes, end - timedelta(hours=3), end, "150.00")
+        ended_session(self.student, end - timedelta(hours=1), end - timedelta(minutes=30), "25.00")
+
+        def roster(sort):
+            response = self.client.get(reverse("students_list"), {"sort": sort})
+            return [student.idnumber for student in response.context["students"]]
+
+        self.assertEqual(roster("name"), ["1001", "1002"])
+        self.assertEqual(roster("owed"), ["1002", "1001"])
+        self.assertEqual(roster("hours"), ["1002", "1001"])
+        self.assertEqual(roster("last_seen"), ["1002", "1001"])
+        # unknown sorts fall back to the name order
+        self.assertEqual(roster("nonsense"), ["1001", "1002"])
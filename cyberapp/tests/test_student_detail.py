@@ -0,0 +1,58 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Payment
+from ..views import HISTORY_PAGE_SIZE
+from .utils import PLAIN_STATIC, ended_session, make_student, settled_payment
+
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class StudentDetailTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        self.student = make_student()
+        start = datetime(2024, 3, 1, 9, tzinfo=dt_timezone.utc)
+        ended_session(self.student, start, start + timedelta(hours=2), "100.00")
+        ended_session(self.student, start + timedelta(days=1), start + timedelta(days=1, minutes=30), "25.00",
+                      payment_status="paid")
+        settled_payment(self.student, date(2024, 3, 5), "40.00")
+        # pending STK payments are not money received yet
+        Payment.objects.create(student=self.student, date=date(2024, 3, 6), amount=500, balance=0,
+                               mpesa_status=Payment.STATUS_PENDING)
+
+    def test_profile_and_totals_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("student_detail", args=[self.student.idnumber]))
+        self.assertEqual(response.status_code, 200)
+        app_queries = [query for query in queries if "cyberapp_" in query["sql"]]
+        self.assertEqual(len(app_queries), 1)
+
+        student = response.context["student"]
+        self.assertEqual(student.lifetime_charged, Decimal("125.00"))
+        self.assertEqual(student.lifetime_paid, Decimal("65.00"))
+        self.assertEqual(student.lifetime_balance, Decimal("60.00"))
+        self.assertEqual(response.context["total_time"], "02:30:00")
+
+    def test_unknown_student(self):
+        self.assertEqual(self.client.get(reverse("student_detail", args=["nobody"])).status_code, 404)
+
+    def test_history_fragments_are_paginated(self):
+        for day in range(HISTORY_PAGE_SIZE + 5):
+            Payment.objects.create(student=self.student, date=date(2024, 1, 1) + timedelta(days=day),
+                                   amount=10, balance=0)
+        url = reverse("student_payments", args=[self.student.idnumber])
+        first = self.client.get(url).context["page"]
+        self.assertEqual(len(first.items), HISTORY_PAGE_SIZE)
+        self.assertEqual(first.items[0].date, date(2024, 3, 6))
+        rest = self.client.get(url, {"cursor": first.next_cursor}).context["page"]
+        self.assertEqual(len(rest.items), 7)
+        self.assertFalse(rest.has_next)
+
+        sessions = self.client.get(reverse("student_sessions", args=[self.student.idnumber])).context["page"]
+        self.assertEqual([session.amount_charged for session in sessions.items], [Decimal("25.00"), Decimal("100.00")])
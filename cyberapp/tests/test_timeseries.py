@@ -0,0 +1,91 @@
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import timeseries
+from ..models import MpesaCallback, Payment
+from ..timeseries import REPORT_TZ, bucket_range, compute_series, get_series
+from .utils import ended_session, make_student
+
+
+NOW = datetime(2024, 3, 14, 15, 30, tzinfo=REPORT_TZ)
+
+
+class TimeseriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        student = make_student()
+        yesterday = datetime(2024, 3, 13, 9, tzinfo=REPORT_TZ)
+        ended_session(student, yesterday, yesterday + timedelta(hours=2), "100.00")
+        ended_session(student, yesterday + timedelta(hours=3), yesterday + timedelta(hours=3, minutes=30), "25.00",
+                      payment_status="paid")
+        # ends at 00:30 Nairobi on the 14th, which is still the 13th in UTC
+        late = datetime(2024, 3, 13, 23, 0, tzinfo=REPORT_TZ)
+        ended_session(student, late, late + timedelta(minutes=90), "75.00")
+
+        Payment.objects.create(student=student, date=date(2024, 3, 13), amount=40, balance=0)
+        Payment.objects.create(student=student, date=date(2024, 3, 14), amount=60, balance=0,
+                               mpesa_status=Payment.STATUS_PAID)
+        # not received (yet)
+        Payment.objects.create(student=student, date=date(2024, 3, 14), amount=500, balance=0,
+                               mpesa_status=Payment.STATUS_PENDING)
+
+        for code in (0, 0, 1032):
+            callback = MpesaCallback.objects.create(checkout_request_id=f"ws_CO_{code}_{MpesaCallback.objects.count()}",
+                                                    result_code=code, payload={})
+            MpesaCallback.objects.filter(pk=callback.pk).update(received_at=datetime(2024, 3, 14, 8, tzinfo=REPORT_TZ))
+
+    def test_bucket_range(self):
+        self.assertEqual(bucket_range("day", 2, NOW), [
+            datetime(2024, 3, 13, tzinfo=REPORT_TZ), datetime(2024, 3, 14, tzinfo=REPORT_TZ),
+        ])
+        # weeks start on Monday, months on the 1st
+        self.assertEqual(bucket_range("week", 1, NOW), [datetime(2024, 3, 11, tzinfo=REPORT_TZ)])
+        self.assertEqual(bucket_range("month", 3, NOW)[0], datetime(2024, 1, 1, tzinfo=REPORT_TZ))
+
+    def test_daily_series(self):
+        data = compute_series("day", 3, now=NOW)
+        self.assertEqual(data["buckets"][-1], "2024-03-14T00:00:00+03:00")
+        series = data["series"]
+        # settled payments plus the STK-paid session
+        self.assertEqual(series["revenue"], [0.0, 65.0, 60.0])
+        self.assertEqual(series["charges"], [0.0, 125.0, 75.0])
+        self.assertEqual(series["sessions"], [0, 2, 1])
+        self.assertEqual(series["hours"], [0.0, 2.5, 1.5])
+        self.assertEqual(series["mpesa_success_rate"], [None, None, 0.6667])
+
+    def test_coarser_buckets_add_up(self):
+        for granularity in ("week", "month"):
+            series = compute_series(granularity, 1, now=NOW)["series"]
+            self.assertEqual(series["revenue"], [125.0])
+            self.assertEqual(series["charges"], [200.0])
+            self.assertEqual(series["sessions"], [3])
+
+    def test_cache_serves_stale_copies_while_refreshing(self):
+        with mock.patch.object(timeseries, "compute_series", wraps=compute_series) as compute:
+            first = get_series("day", 3)
+            self.assertFalse(first["stale"])
+            self.assertEqual(get_series("day", 3)["generated_at"], first["generated_at"])
+            self.assertEqual(compute.call_count, 1)
+
+            with mock.patch.object(timeseries.time, "time", return_value=first["generated_at"] + 120), \
+                    mock.patch.object(timeseries.threading, "Thread") as thread:
+                stale = get_series("day", 3)
+                get_series("day", 3)
+            self.assertTrue(stale["stale"])
+            # one refresh per key, however many requests see the stale copy
+            thread.assert_called_once()
+
+    def test_api(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        url = reverse("timeseries_api")
+        response = self.client.get(url, {"granularity": "week", "points": "4"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()["series"]), set(timeseries.METRICS))
+        self.assertEqual(len(response.json()["buckets"]), 4)
+        for params in ({"granularity": "hour"}, {"granularity": "year"}, {"points": "many"}):
+            self.assertEqual(self.client.get(url, params).status_code, 400)
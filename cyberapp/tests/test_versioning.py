@@ -0,0 +1,94 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Payment, Student, UsageSession
+from ..versioning import bump_data_version, data_version
+from .utils import PLAIN_STATIC, make_student
+
+
+# a fixed time bucket, so a bucket rollover can't change the ETag mid-test
+@override_settings(STORAGES=PLAIN_STATIC)
+@mock.patch("cyberapp.versioning._bucket_start", return_value=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+class ConditionalPageTests(TransactionTestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        Payment.objects.create(student=make_student(), date=date(2024, 1, 1), amount=10, balance=0)
+        self.url = reverse("payment_list")
+
+    def test_unchanged_page_answers_304(self, _):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # the view body, and so the payment queries, never ran
+        self.assertFalse([query for query in queries if "cyberapp_payment" in query["sql"]])
+
+    def test_data_version_bump_invalidates(self, _):
+        etag = self.client.get(self.url)["ETag"]
+        bump_data_version()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_differs_per_user(self, _):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.force_login(User.objects.create_user("other", password="pw"))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+# bumps wait for the commit, which TestCase never reaches
+class DataVersionTests(TransactionTestCase):
+    def test_one_bump_per_transaction(self):
+        with transaction.atomic():
+            student = make_student()
+            make_student("1002")
+            Student.objects.filter(pk=student.pk).update(firstname="Aminah")
+            with transaction.atomic():
+                Payment.objects.create(student=student, date=date(2024, 1, 1), amount=10, balance=0)
+            # not visible before the commit
+            self.assertEqual(data_version()[0], 0)
+        self.assertEqual(data_version()[0], 1)
+
+    def test_rollback_leaves_version(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            make_student()
+            raise RuntimeError
+        self.assertEqual(data_version()[0], 0)
+
+    def test_rolled_back_savepoint_keeps_outer_bump(self):
+        with transaction.atomic():
+            make_student()
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                make_student("1002")
+                raise RuntimeError
+        self.assertEqual(data_version()[0], 1)
+
+    def test_update_bumps_only_when_rows_change(self):
+        student = make_student()
+        self.assertEqual(data_version()[0], 1)
+        Student.objects.filter(pk=student.pk + 1).update(firstname="Nobody")
+        self.assertEqual(data_version()[0], 1)
+        UsageSession.objects.filter(student=student).update(is_active=False)
+        self.assertEqual(data_version()[0], 1)
+        Student.objects.filter(pk=student.pk).update(firstname="Aminah")
+        self.assertEqual(data_version()[0], 2)
+
+    def test_end_session_bumps_once(self):
+        self.client.force_login(User.objects.create_user("clerk", password="pw"))
+        student = make_student()
+        UsageSession.objects.create(student=student, start_time=timezone.now() - timedelta(hours=1), is_active=True)
+        version = data_version()[0]
+        self.client.post(reverse("end_session", args=[student.idnumber]))
+        # the session update and the student stats update share one bump
+        self.assertEqual(data_version()[0], version + 1)
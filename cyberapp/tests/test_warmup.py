@@ -0,0 +1,62 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .. import warmup
+from ..timeseries import get_series
+from ..views import DASHBOARD_TREND_DAYS
+from .utils import PLAIN_STATIC
+
+
+@override_settings(STORAGES=PLAIN_STATIC, MPESA_CONSUMER_KEY="")
+class WarmUpTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_summary_times_every_step(self):
+        summary = warmup.warm_up()
+        for label, _ in warmup.WARM_UP_STEPS:
+            self.assertRegex(summary, rf"{label} \d+ ms")
+        self.assertRegex(summary, r"daraja token \d+ ms \(skipped, no credentials\)$")
+
+    def test_dashboard_series_are_cached(self):
+        warmup.warm_up()
+        with mock.patch("cyberapp.timeseries.compute_series") as compute:
+            self.assertFalse(get_series("day", DASHBOARD_TREND_DAYS)["stale"])
+            get_series("day")
+        compute.assert_not_called()
+
+    def test_failing_step_is_logged_not_raised(self):
+        def broken():
+            raise RuntimeError("template missing")
+
+        steps = (("templates", broken), ("urls", warmup._load_urls))
+        with mock.patch.object(warmup, "WARM_UP_STEPS", steps), self.assertLogs("cyberapp.warmup", "WARNING"):
+            summary = warmup.warm_up()
+        self.assertIn("(failed: template missing)", summary)
+        self.assertRegex(summary, r"urls \d+ ms$")
+
+    @override_settings(MPESA_CONSUMER_KEY="key", MPESA_ASYNC=True)
+    def test_async_workers_fetch_the_token_with_the_async_client(self):
+        client = mock.Mock(access_token=mock.AsyncMock(), aclose=mock.AsyncMock())
+        with mock.patch("cyberapp.daraja.AsyncDarajaClient", return_value=client) as factory:
+            self.assertIsNone(warmup._fetch_token())
+        factory.assert_called_once_with(timeout=warmup.TOKEN_TIMEOUT)
+        client.access_token.assert_awaited_once()
+        client.aclose.assert_awaited_once()
+
+    @override_settings(MPESA_CONSUMER_KEY="key", MPESA_ASYNC=False)
+    def test_sync_token_fetch_gives_up_on_a_slow_daraja(self):
+        release = threading.Event()
+        with mock.patch.object(warmup, "TOKEN_TIMEOUT", 0.05), \
+                mock.patch("django_daraja.mpesa.utils.mpesa_access_token", side_effect=release.wait):
+            self.assertEqual(warmup._fetch_token(), "gave up after 0.05s")
+        release.set()
+
+    @override_settings(MPESA_CONSUMER_KEY="key", MPESA_ASYNC=False)
+    def test_sync_token_errors_reach_warm_up(self):
+        with mock.patch("django_daraja.mpesa.utils.mpesa_access_token", side_effect=ConnectionError("offline")):
+            with self.assertRaises(ConnectionError):
+                warmup._fetch_token()
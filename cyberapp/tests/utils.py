@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+from ..models import Payment, Student, UsageSession
+from ..stats import PAYMENT_STATS_FIELDS, SESSION_STATS_FIELDS, record_payment_change, record_session_change, stats_snapshot
+
+
+# pages render {% static %} without a collectstatic manifest
+PLAIN_STATIC = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def make_student(idnumber="1001", **kwargs):
+    fields = {"firstname": "Amina", "lastname": "Otieno", "phonenumber": "0712345678", **kwargs}
+    return Student.objects.create(idnumber=idnumber, **fields)
+
+
+def ended_session(student, start, end, amount, payment_status="not_requested", **kwargs):
+    """An ended session, folded into the student's stats like the views do."""
+    session = UsageSession.objects.create(
+        student=student,
+        start_time=start,
+        end_time=end,
+        is_active=False,
+        amount_charged=Decimal(amount),
+        payment_status=payment_status,
+        **kwargs,
+    )
+    record_session_change(None, stats_snapshot(session, SESSION_STATS_FIELDS))
+    return session
+
+
+def settled_payment(student, on, amount):
+    payment = Payment.objects.create(student=student, date=on, amount=Decimal(amount), balance=Decimal("0.00"))
+    record_payment_change(None, stats_snapshot(payment, PAYMENT_STATS_FIELDS))
+    return payment
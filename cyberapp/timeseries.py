@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import MpesaCallback, Payment, UsageSession
+
+
+logger = logging.getLogger(__name__)
+
+
+REPORT_TZ = ZoneInfo("Africa/Nairobi")
+METRICS = ("revenue", "charges", "sessions", "hours", "mpesa_success_rate")
+
+# granularity -> (Trunc function, default number of buckets, max buckets).
+# No hourly buckets: Payment.date has no time of day, so revenue can't be
+# split below a day.
+GRANULARITIES = {
+    "day": (TruncDay, 30, 366),
+    "week": (TruncWeek, 12, 104),
+    "month": (TruncMonth, 12, 60),
+}
+
+# Serve cached series for FRESH_SECONDS; for the next STALE_SECONDS keep serving
+# the old copy while one background thread recomputes it.
+FRESH_SECONDS = 60
+STALE_SECONDS = 15 * 60
+CACHE_PREFIX = "timeseries"
+
+
+def _bucket_start(moment, granularity):
+    day = moment.astimezone(REPORT_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _step(bucket, granularity):
+    # step in local calendar terms, then re-attach the zone (no DST in Nairobi,
+    # but months still vary in length)
+    naive = bucket.replace(tzinfo=None)
+    if granularity == "day":
+        naive += timedelta(days=1)
+    elif granularity == "week":
+        naive += timedelta(weeks=1)
+    else:
+        naive = (naive.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return naive.replace(tzinfo=REPORT_TZ)
+
+
+def bucket_range(granularity, points, now):
+    """
+    The ``points`` bucket starts ending with the one containing ``now``.
+    """
+    buckets = [_bucket_start(now, granularity)]
+    while len(buckets) < points:
+        previous = _bucket_start(buckets[0] - timedelta(seconds=1), granularity)
+        buckets.insert(0, previous)
+    return buckets
+
+
+def _grouped(queryset, field, trunc, **aggregates):
+    """
+    ``{bucket: {name: value}}`` with the bucketing done in SQL.
+    """
+    rows = (
+        queryset.annotate(bucket=trunc(field, tzinfo=REPORT_TZ))
+        .order_by()
+        .values("bucket")
+        .annotate(**aggregates)
+    )
+    return {row.pop("bucket").astimezone(REPORT_TZ): row for row in rows}
+
+
+def _grouped_by_date(queryset, field, trunc, **aggregates):
+    """
+    ``_grouped`` for a ``DateField``, which holds local (Nairobi) days
+    already; buckets come back as local midnights.
+    """
+    rows = queryset.annotate(bucket=trunc(field)).order_by().values("bucket").annotate(**aggregates)
+    return {datetime.combine(row.pop("bucket"), dt_time.min, REPORT_TZ): row for row in rows}
+
+
+def compute_series(granularity, points, now=None):
+    """
+    Revenue received (settled payments by ``Payment.date`` plus sessions
+    paid by STK, by the day they ended: the same money as the students'
+    ``total_paid``), charges billed for sessions ended in the bucket,
+    completed session count and hours, and the share of STK callbacks that
+    succeeded, one value per bucket in Nairobi time. Three grouped queries
+    in total.
+    """
+    trunc = GRANULARITIES[granularity][0]
+    now = now or datetime.now(REPORT_TZ)
+    buckets = bucket_range(granularity, points, now)
+    start, end = buckets[0], _step(buckets[-1], granularity)
+
+    sessions = _grouped(
+        UsageSession.objects.filter(end_time__gte=start, end_time__lt=end),
+        "end_time",
+        trunc,
+        charges=Sum("amount_charged"),
+        paid=Sum("amount_charged", filter=Q(payment_status="paid")),
+        sessions=Count("id"),
+        duration=Sum(ExpressionWrapper(F("end_time") - F("start_time"), output_field=DurationField())),
+    )
+    payments = _grouped_by_date(
+        Payment.objects.filter(
+            date__gte=start.date(), date__lt=end.date(), mpesa_status__in=Payment.SETTLED_STATUSES
+        ),
+        "date",
+        trunc,
+        received=Sum("amount"),
+    )
+    callbacks = _grouped(
+        MpesaCallback.objects.filter(received_at__gte=start, received_at__lt=end),
+        "received_at",
+        trunc,
+        total=Count("id"),
+        succeeded=Count("id", filter=Q(result_code=0)),
+    )
+
+    series = {metric: [] for metric in METRICS}
+    for bucket in buckets:
+        usage = sessions.get(bucket, {})
+        stk = callbacks.get(bucket, {})
+        duration = usage.get("duration") or timedelta(0)
+        received = payments.get(bucket, {}).get("received") or Decimal("0")
+        series["revenue"].append(float(received + (usage.get("paid") or Decimal("0"))))
+        series["charges"].append(float(usage.get("charges") or Decimal("0")))
+        series["sessions"].append(usage.get("sessions", 0))
+        series["hours"].append(round(duration.total_seconds() / 3600, 2))
+        series["mpesa_success_rate"].append(
+            round(stk["succeeded"] / stk["total"], 4) if stk.get("total") else None
+        )
+
+    return {
+        "granularity": granularity,
+        "timezone": str(REPORT_TZ),
+        "buckets": [bucket.isoformat() for bucket in buckets],
+        "series": series,
+        "generated_at": time.time(),
+    }
+
+
+def _refresh(key, granularity, points):
+    try:
+        cache.set(key, compute_series(granularity, points), FRESH_SECONDS + STALE_SECONDS)
+    except Exception:
+        logger.exception("Background refresh of %s failed", key)
+    finally:
+        cache.delete(f"{key}:refreshing")
+        close_old_connections()
+
+
+def get_series(granularity, points=None):
+    """
+    Cached ``compute_series``. Fresh copies are returned as-is; stale ones are
+    returned immediately while a single background thread recomputes them;
+    only a cold cache makes the caller wait. Adds ``stale`` to the payload.
+    """
+    _, default_points, max_points = GRANULARITIES[granularity]
+    points = max(1, min(int(points or default_points), max_points))
+    key = f"{CACHE_PREFIX}:{granularity}:{points}"
+
+    data = cache.get(key)
+    if data is None:
+        data = compute_series(granularity, points)
+        cache.set(key, data, FRESH_SECONDS + STALE_SECONDS)
+        return {**data, "stale": False}
+
+    stale = time.time() - data["generated_at"] > FRESH_SECONDS
+    # cache.add is atomic, so only one request per key starts a refresh
+    if stale and cache.add(f"{key}:refreshing", True, STALE_SECONDS):
+        threading.Thread(target=_refresh, args=(key, granularity, points), daemon=True).start()
+    return {**data, "stale": stale}
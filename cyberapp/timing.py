@@ -0,0 +1,81 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+
+# the RequestTimings of the request being served, set by ServerTimingMiddleware
+_current = ContextVar("server_timing", default=None)
+
+
+class RequestTimings:
+    """Milliseconds spent per ``Server-Timing`` metric, plus the query count."""
+
+    def __init__(self):
+        self.durations = {"db": 0.0, "tpl": 0.0, "http": 0.0}
+        self.queries = 0
+
+
+def start():
+    """Begin collecting for the current request; returns the token for ``stop``."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the block's duration to metric ``name`` of the current request, if any."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] += (time.perf_counter() - started) * 1000
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.durations["db"] += (time.perf_counter() - started) * 1000
+        timings.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver adding the query timer to each new
+    connection once, so requests sharing a connection thread (ASGI) still
+    count only their own queries.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class _TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        # includes and extends happen inside this call; queries that
+        # templates trigger count towards both tpl and db
+        with timed("tpl"):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each top-level render."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name).template, self)
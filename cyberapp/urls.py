@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from django.shortcuts import redirect
 from . import views
 
+# native async Daraja views when served by an ASGI server, blocking ones under WSGI
+if settings.MPESA_ASYNC:
+    send_stk, stk_status, mpesa_callback = views.send_stk_async, views.stk_status_async, views.mpesa_callback_async
+else:
+    send_stk, stk_status, mpesa_callback = views.send_stk, views.stk_status, views.mpesa_callback
+
 urlpatterns = [
     path('',lambda request: redirect('login'), name='root_redirect'),
     path('login/', views.login_view, name='login'),
@@ -11,6 +18,7 @@ urlpatterns = [
 
     path('home/', views.home, name='home'),
     path('students/', views.students_list, name='students_list'),
+    path('search/students/', views.student_search, name='student_search'),
     path('students/<str:idnumber>/', views.student_detail, name='student_detail'),
     path('add_student/', views.add_student, name='add_student'),
     path('update_student/<str:idnumber>/', views.update_student, name='update_student'),
@@ -18,14 +26,22 @@ urlpatterns = [
 
     path('payments/', views.payment_list, name='payment_list'),
     path('students/<str:idnumber>/payments/', views.student_payments, name='student_payments'),
+    path('students/<str:idnumber>/sessions/', views.student_sessions, name='student_sessions'),
+    path('students/<str:idnumber>/ledger/', views.student_ledger, name='student_ledger'),
+    path('ledger/', views.ledger, name='ledger'),
+    path('api/timeseries/', views.timeseries_api, name='timeseries_api'),
+    path('api/occupancy/', views.occupancy_api, name='occupancy_api'),
+    path('api/metrics/', views.metrics_api, name='metrics_api'),
     path('add_payment/', views.add_payment, name='add_payment'),
     path('delete_payment/<int:payment_id>/', views.delete_payment, name='delete_payment'),
+    path('exports/<slug:dataset>.csv', views.export_csv, name='export_csv'),
 
     path("sessions/active/", views.active_sessions, name="active_sessions"),
     path("sessions/summary/", views.summary_session, name="summary_session"),
     path('start_session/<str:idnumber>/', views.start_session, name='start_session'),
     path('end_session/<str:idnumber>/', views.end_session, name='end_session'),
-    path('sessions/<int:session_id>/stk/', views.send_stk, name='send_stk'),
-    path('mpesa/callback/', views.mpesa_callback, name='mpesa_callback'),
+    path('sessions/<int:session_id>/stk/', send_stk, name='send_stk'),
+    path('sessions/<int:session_id>/stk/status/', stk_status, name='stk_status'),
+    path('mpesa/callback/', mpesa_callback, name='mpesa_callback'),
     
     ]
\ No newline at end of file
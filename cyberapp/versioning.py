@@ -0,0 +1,132 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache, partial
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import DataVersion
+
+
+VERSION_PK = 1
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+TEMPLATES_DIR = Path(settings.BASE_DIR) / "cyberapp" / "templates"
+
+
+def _bump(using):
+    now = timezone.now()
+    bumped = DataVersion.objects.using(using).filter(pk=VERSION_PK).update(
+        version=F("version") + 1, changed_at=now
+    )
+    if not bumped:
+        DataVersion.objects.using(using).get_or_create(pk=VERSION_PK, defaults={"version": 1, "changed_at": now})
+
+
+# one hook per database, so a transaction can tell whether it is queued
+_hooks = {}
+
+
+def bump_data_version(using="default", **kwargs):
+    """
+    Record that shop data changed. Inside a transaction the bump is queued
+    once, on commit, however many rows the transaction writes: the counter
+    row is then only locked for a statement of its own, after the data
+    rows, and a rolled-back transaction leaves it alone. Accepts signal
+    keyword arguments so it can be connected directly.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        _bump(using)
+        return
+    hook = _hooks.setdefault(using, partial(_bump, using))
+    if not any(func is hook for _, func, _ in connection.run_on_commit):
+        transaction.on_commit(hook, using=using)
+
+
+def data_version():
+    """
+    ``(version, changed_at)`` of the shop data; ``(0, EPOCH)`` before the
+    first write.
+    """
+    row = DataVersion.objects.filter(pk=VERSION_PK).values_list("version", "changed_at").first()
+    return row or (0, EPOCH)
+
+
+@lru_cache(maxsize=1)
+def _release():
+    """
+    ``(token, released_at)`` for the deployed templates and static files, so
+    a deploy invalidates cached pages even when no data changed.
+    """
+    released_at = max((path.stat().st_mtime for path in TEMPLATES_DIR.rglob("*.html")), default=0)
+    manifest_hash = getattr(staticfiles_storage, "manifest_hash", "") or ""
+    return f"{released_at:.0f}:{manifest_hash}", datetime.fromtimestamp(released_at, dt_timezone.utc)
+
+
+def _bucket_start(seconds):
+    """Start of the current local-time bucket of ``seconds``, as an aware UTC datetime."""
+    offset = timezone.localtime().utcoffset().total_seconds()
+    now = time.time() + offset
+    return datetime.fromtimestamp(now - now % seconds - offset, dt_timezone.utc)
+
+
+def _state(request, bucket_seconds):
+    """
+    Everything a conditional page's representation depends on, computed once
+    per request; ``None`` when the page must render (pending flash messages).
+    """
+    if getattr(request, "_conditional_state", None) is None:
+        if len(get_messages(request)):
+            request._conditional_state = False
+        else:
+            version, changed_at = data_version()
+            request._conditional_state = (version, changed_at, _bucket_start(bucket_seconds))
+    return request._conditional_state or None
+
+
+def conditional_page(bucket_seconds=60):
+    """
+    Answer ``GET``/``HEAD`` with ``304 Not Modified`` while the data version,
+    the user, the deployed release and the current time bucket are
+    unchanged. ``bucket_seconds`` bounds how stale time-dependent content
+    (running timers, "today" figures) may get; the view body, and so its
+    queries, only runs on a miss. Responses are ``private, no-cache`` so
+    browsers always revalidate instead of guessing a freshness lifetime.
+    """
+    def etag(request, *args, **kwargs):
+        state = _state(request, bucket_seconds)
+        if state is None:
+            return None
+        version, _, bucket = state
+        parts = (
+            version,
+            bucket.timestamp(),
+            _release()[0],
+            request.user.pk,
+            # pages embed a CSRF token, which must follow cookie rotation
+            request.META.get("CSRF_COOKIE", ""),
+            request.get_full_path(),
+        )
+        return hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        state = _state(request, bucket_seconds)
+        if state is None:
+            return None
+        _, changed_at, bucket = state
+        last_login = getattr(request.user, "last_login", None) or EPOCH
+        return max(changed_at, bucket, _release()[1], last_login)
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+        return cache_control(private=True, no_cache=True)(view)
+
+    return decorator
@@ -1,30 +1,45 @@
 import json
 import logging
+import time
 from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.db import router, transaction
 from django.db.models import Sum
-from django.http import JsonResponse
-from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django_daraja.mpesa.core import MpesaClient
-from django_daraja.mpesa.exceptions import (
-    IllegalPhoneNumberException,
-    MpesaConnectionError,
-    MpesaInvalidParameterException,
-)
-from django_daraja.mpesa.utils import format_phone_number as daraja_format_phone_number
 
+from . import metrics
+from .daraja import async_client, query_stk
+from .exports import EXPORT_DATASETS, export_filename, gzip_stream, iter_csv
 from .forms import StudentForm, PaymentForm
+from .ledger import current_balance, ledger_page
 from .models import Student, Payment, UsageSession
+from .mpesa import process_stk_callback
+from .pagination import estimated_count, paginate_keyset
+from .routers import read_from_replica
+from .search import search_students, serialize_student
+from .stats import (
+    PAYMENT_STATS_FIELDS,
+    SESSION_STATS_FIELDS,
+    record_payment_change,
+    record_session_change,
+    stats_snapshot,
+)
+from .timeseries import GRANULARITIES, get_series
+from .timing import timed
+from .versioning import conditional_page
 
 
 # Create your views here.
@@ -35,6 +50,31 @@ logger = logging.getLogger(__name__)
 TOTAL_MACHINES = 30
 REGISTER_TEMPLATE = 'register.html'
 
+# Keyset orderings must match the composite indexes declared on the models.
+LIST_PAGE_SIZE = 50
+PAYMENT_LIST_ORDERING = ('-date', '-id')
+STUDENT_LIST_ORDERING = ('lastname', 'firstname', 'id')
+# roster ?sort= key -> (label, keyset ordering, filter); each has an index on Student
+STUDENT_LIST_SORTS = {
+    'name': ('Name', STUDENT_LIST_ORDERING, {}),
+    'last_seen': ('Last visit', ('-last_seen', '-id'), {'last_seen__isnull': False}),
+    'hours': ('Total hours', ('-total_time', '-id'), {}),
+    'owed': ('Amount owed', ('-open_balance', '-id'), {}),
+}
+HISTORY_PAGE_SIZE = 20
+DASHBOARD_TREND_DAYS = 14
+OCCUPANCY_MAX_DAYS = 366
+OCCUPANCY_MINUTES_MAX_DAYS = 31
+# how long a conditional GET may keep answering 304 while only the clock moved:
+# running timers on the dashboards, "today" on the lists, open sessions in the APIs
+DASHBOARD_ETAG_SECONDS = 60
+LIST_ETAG_SECONDS = 24 * 60 * 60
+API_ETAG_SECONDS = 60
+CALLBACK_ACCEPTED = {'ResultCode': 0, 'ResultDesc': 'Accepted'}
+CALLBACK_INVALID = {'ResultCode': 1, 'ResultDesc': 'Invalid JSON'}
+STUDENT_HISTORY_PAYMENT_ORDERING = ('-date', '-id')
+STUDENT_HISTORY_SESSION_ORDERING = ('-start_time', '-id')
+
 
 def _prepare_phone_number(raw_phone: str) -> str:
     """
@@ -63,7 +103,16 @@ def _resolve_callback_url(request):
     return callback_url
 
 
-def _send_stk_request(*, phone_input, amount_decimal, account_reference, transaction_desc, request):
+def _stk_push_params(*, phone_input, amount_decimal, account_reference, transaction_desc, request):
+    """
+    Validate and normalise an STK push; returns the ``stk_push`` keyword
+    arguments shared by the blocking and async clients. Raises ``ValueError``.
+    """
+    # the payment stack (requests, cryptography) loads on the first payment,
+    # not on every worker boot
+    from django_daraja.mpesa.exceptions import IllegalPhoneNumberException
+    from django_daraja.mpesa.utils import format_phone_number as daraja_format_phone_number
+
     phone_input = _prepare_phone_number(phone_input)
     if not phone_input:
         raise ValueError("Phone number is required for STK push.")
@@ -77,18 +126,24 @@ def _send_stk_request(*, phone_input, amount_decimal, account_reference, transac
     if amount_decimal <= 0:
         raise ValueError("Amount must be greater than zero.")
 
-    amount_integer = int(amount_decimal.quantize(Decimal("1"), rounding=ROUND_HALF_UP))
-    callback_url = _resolve_callback_url(request)
+    return {
+        'phone_number': formatted_phone,
+        'amount': int(amount_decimal.quantize(Decimal("1"), rounding=ROUND_HALF_UP)),
+        'account_reference': account_reference[:12],
+        'transaction_desc': transaction_desc[:13],
+        'callback_url': _resolve_callback_url(request),
+    }
+
 
+def _send_stk_request(*, request, **stk):
+    from django_daraja.mpesa.core import MpesaClient
+    from django_daraja.mpesa.exceptions import MpesaConnectionError, MpesaInvalidParameterException
+
+    params = _stk_push_params(request=request, **stk)
     client = MpesaClient()
     try:
-        response = client.stk_push(
-            phone_number=formatted_phone,
-            amount=amount_integer,
-            account_reference=account_reference[:12],
-            transaction_desc=transaction_desc[:13],
-            callback_url=callback_url,
-        )
+        with timed("http"):
+            response = client.stk_push(**params)
     except (MpesaConnectionError, MpesaInvalidParameterException) as exc:
         raise RuntimeError(str(exc)) from exc
     except Exception as exc:  # pragma: no cover - safety net
@@ -103,7 +158,7 @@ def _send_stk_request(*, phone_input, amount_decimal, account_reference, transac
     else:
         response_data = response
 
-    return response_data, formatted_phone
+    return response_data, params['phone_number']
 
 
 def _format_duration(seconds: int) -> str:
@@ -114,6 +169,8 @@ def _format_duration(seconds: int) -> str:
 
 
 @login_required
+@read_from_replica
+@conditional_page(DASHBOARD_ETAG_SECONDS)
 def home(request):
     """
     Feed every dashboard widget with realtime, financial, and roster data.
@@ -164,9 +221,10 @@ def home(request):
         .get("total")
     ) or Decimal("0.00")
 
+    # debt owed by students, from the ledger-maintained open balances
     outstanding_balance = (
-        Payment.objects.filter(balance__gt=0)
-        .aggregate(total=Sum("balance"))
+        Student.objects.filter(open_balance__gt=0)
+        .aggregate(total=Sum("open_balance"))
         .get("total")
     ) or Decimal("0.00")
 
@@ -175,6 +233,9 @@ def home(request):
         .order_by("-date", "-id")[:6]
     )
 
+    # cached, so the sparklines cost nothing on most page loads
+    trends = get_series("day", DASHBOARD_TREND_DAYS)
+
     for student in students:
         sessions = student.usagesession_set.all()
         active_session = next(
@@ -201,24 +262,196 @@ def home(request):
         "revenue_today": revenue_today,
         "outstanding_balance": outstanding_balance,
         "recent_payments": recent_payments,
+        "trends": trends["series"],
+        "trend_days": DASHBOARD_TREND_DAYS,
     }
     return render(request, "home.html", context)
 
 @login_required
+@read_from_replica
 def students_list(request):
-    students = Student.objects.all()
-    return render(request, 'students_list.html', {'students': students})
+    sort = request.GET.get('sort')
+    if sort not in STUDENT_LIST_SORTS:
+        sort = 'name'
+    _, ordering, filters = STUDENT_LIST_SORTS[sort]
+    page = paginate_keyset(
+        Student.objects.filter(**filters),
+        ordering,
+        cursor=request.GET.get('cursor'),
+        page_size=LIST_PAGE_SIZE,
+    )
+    context = {
+        'students': page.items,
+        'page': page,
+        'total_estimate': estimated_count(Student),
+        'sort': sort,
+        'sort_options': [(key, label) for key, (label, _, _) in STUDENT_LIST_SORTS.items()],
+        'page_query': '' if sort == 'name' else f'sort={sort}&',
+    }
+    return render(request, 'students_list.html', context)
+
+@login_required
+@require_http_methods(["GET"])
+def student_search(request):
+    """
+    Typeahead/picker JSON: one keyset page of word-prefix matches on name,
+    ID number and phone. An empty ``q`` pages through the whole directory.
+    """
+    term = (request.GET.get('q') or '').strip()[:64]
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+
+    started = time.perf_counter()
+    page, timed_out = search_students(term, limit=limit, cursor=request.GET.get('cursor'))
+    return JsonResponse({
+        'query': term,
+        'results': [serialize_student(student) for student in page.items],
+        'next_cursor': page.next_cursor,
+        'timed_out': timed_out,
+        'took_ms': round((time.perf_counter() - started) * 1000, 1),
+    })
 
 @login_required
 def student_detail(request, idnumber):
-    student = Student.objects.get(idnumber=idnumber)
-    payments = student.payments.all()
-    return render(request, 'student_detail.html', {'student': student, 'payments': payments})
+    """
+    Profile plus lifetime totals in a single query; the session and payment
+    histories are fetched lazily as paginated fragments.
+    """
+    student = get_object_or_404(Student.objects.with_lifetime_totals(), idnumber=idnumber)
+    total_seconds = int(student.lifetime_time.total_seconds())
+    context = {
+        'student': student,
+        'total_time': _format_duration(total_seconds),
+    }
+    return render(request, 'student_detail.html', context)
 
+@login_required
 def student_payments(request, idnumber):
-    student = Student.objects.get(idnumber=idnumber)
-    payments = student.payments.all()
-    return render(request, 'student_payments.html', {'student': student, 'payments': payments})
+    """
+    Fragment: one keyset page of a student's payments, newest first.
+    """
+    page = paginate_keyset(
+        Payment.objects.filter(student__idnumber=idnumber),
+        STUDENT_HISTORY_PAYMENT_ORDERING,
+        cursor=request.GET.get('cursor'),
+        page_size=HISTORY_PAGE_SIZE,
+    )
+    return render(request, 'student_payments_fragment.html', {'page': page, 'idnumber': idnumber})
+
+@login_required
+def student_sessions(request, idnumber):
+    """
+    Fragment: one keyset page of a student's sessions, newest first.
+    """
+    page = paginate_keyset(
+        UsageSession.objects.filter(student__idnumber=idnumber),
+        STUDENT_HISTORY_SESSION_ORDERING,
+        cursor=request.GET.get('cursor'),
+        page_size=HISTORY_PAGE_SIZE,
+    )
+    return render(request, 'student_sessions_fragment.html', {'page': page, 'idnumber': idnumber})
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
+@conditional_page(API_ETAG_SECONDS)
+def timeseries_api(request):
+    """
+    Revenue, session charges, session count, session hours and M-Pesa success
+    rate per day/week/month bucket (Africa/Nairobi), served
+    stale-while-revalidate.
+    """
+    granularity = request.GET.get('granularity', 'day')
+    if granularity == 'hour':
+        return JsonResponse(
+            {'success': False, 'message': 'Payments are recorded per day, so there are no hourly buckets.'},
+            status=400,
+        )
+    if granularity not in GRANULARITIES:
+        return JsonResponse(
+            {'success': False, 'message': f"granularity must be one of {', '.join(GRANULARITIES)}."},
+            status=400,
+        )
+    try:
+        points = int(request.GET['points']) if request.GET.get('points') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'points must be a whole number.'}, status=400)
+    return JsonResponse(get_series(granularity, points))
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
+@conditional_page(API_ETAG_SECONDS)
+def occupancy_api(request):
+    """
+    Concurrent machine use over an inclusive ``start``/``end`` date range
+    (default today): peak, average and hour-of-week heatmaps. ``?minutes=1``
+    adds the per-minute series for ranges up to a month.
+    """
+    today = timezone.localdate()
+    bounds = {}
+    for key in ('start', 'end'):
+        raw_value = request.GET.get(key)
+        try:
+            bounds[key] = parse_date(raw_value) if raw_value else today
+        except ValueError:
+            bounds[key] = None
+        if bounds[key] is None:
+            return JsonResponse({'success': False, 'message': f'Invalid {key} date, use YYYY-MM-DD.'}, status=400)
+
+    days = (bounds['end'] - bounds['start']).days + 1
+    if days < 1 or days > OCCUPANCY_MAX_DAYS:
+        return JsonResponse(
+            {'success': False, 'message': f'Pick a range of 1 to {OCCUPANCY_MAX_DAYS} days.'},
+            status=400,
+        )
+    include_minutes = request.GET.get('minutes') in ('1', 'true', 'yes')
+    if include_minutes and days > OCCUPANCY_MINUTES_MAX_DAYS:
+        return JsonResponse(
+            {'success': False, 'message': f'Per-minute series is limited to {OCCUPANCY_MINUTES_MAX_DAYS} days.'},
+            status=400,
+        )
+
+    # numpy loads with the first occupancy report rather than at boot
+    from .occupancy import occupancy_for_dates
+
+    profile = occupancy_for_dates(bounds['start'], bounds['end'], include_minutes=include_minutes)
+    profile['capacity'] = TOTAL_MACHINES
+    profile['peak_utilization'] = round(profile['peak'] / TOTAL_MACHINES, 4) if TOTAL_MACHINES else None
+    return JsonResponse(profile)
+
+@login_required
+@require_http_methods(["GET"])
+def metrics_api(request):
+    """
+    Counters and timing summaries of the worker that serves the request
+    (compression ratios, CPU time, ...). Staff only.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'message': 'Staff only.'}, status=403)
+    return JsonResponse(metrics.snapshot())
+
+@login_required
+@read_from_replica
+def ledger(request):
+    """
+    Shop-wide statement: every charge and payment with the running balance.
+    """
+    balance = current_balance()
+    page = ledger_page(cursor=request.GET.get('cursor'), balance=balance)
+    return render(request, 'ledger.html', {'page': page, 'balance': balance, 'student': None})
+
+@login_required
+@read_from_replica
+def student_ledger(request, idnumber):
+    """
+    One student's statement, newest first, with the running balance.
+    """
+    student = get_object_or_404(Student, idnumber=idnumber)
+    page = ledger_page(student, cursor=request.GET.get('cursor'))
+    return render(request, 'ledger.html', {'page': page, 'balance': student.open_balance, 'student': student})
 
 @login_required
 def add_student(request):
@@ -245,14 +478,61 @@ def delete_student(request, idnumber):
     messages.success(request, f'Student {student_name} deleted successfully.')
     return redirect('home')
 
+@read_from_replica
+@conditional_page(LIST_ETAG_SECONDS)
 def payment_list(request):
-    payments = Payment.objects.select_related('student').all().order_by('-date')
-    return render(request, 'payment_list.html', {'payments': payments})
+    page = paginate_keyset(
+        Payment.objects.select_related('student'),
+        PAYMENT_LIST_ORDERING,
+        cursor=request.GET.get('cursor'),
+        page_size=LIST_PAGE_SIZE,
+    )
+    context = {
+        'payments': page.items,
+        'page': page,
+        'total_estimate': estimated_count(Payment),
+    }
+    return render(request, 'payment_list.html', context)
+
+@login_required
+@read_from_replica
+def export_csv(request, dataset):
+    """
+    Stream a CSV export of payments or sessions, optionally limited to an
+    inclusive ``start``/``end`` date range and gzipped with ``?gzip=1``.
+    """
+    if dataset not in EXPORT_DATASETS:
+        raise Http404("Unknown export.")
+
+    bounds = {}
+    for key in ('start', 'end'):
+        raw_value = request.GET.get(key)
+        try:
+            bounds[key] = parse_date(raw_value) if raw_value else None
+        except ValueError:
+            bounds[key] = None
+        if raw_value and bounds[key] is None:
+            return JsonResponse({'success': False, 'message': f'Invalid {key} date, use YYYY-MM-DD.'}, status=400)
+
+    compress = request.GET.get('gzip') in ('1', 'true', 'yes')
+    # resolved now: the rows are read after the view has returned
+    using = router.db_for_read(EXPORT_DATASETS[dataset][0])
+    stream = iter_csv(dataset, start=bounds['start'], end=bounds['end'], using=using)
+    if compress:
+        response = StreamingHttpResponse(gzip_stream(stream), content_type='application/gzip')
+    else:
+        response = StreamingHttpResponse(stream, content_type='text/csv; charset=utf-8')
+    filename = export_filename(dataset, bounds['start'], bounds['end'], compress=compress)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 def delete_payment(request, payment_id):
-    payment = get_object_or_404(Payment, id=payment_id)
+    payment = get_object_or_404(Payment.objects.select_related('student'), id=payment_id)
     payment_name = f"{payment.student.firstname} {payment.student.lastname} - {payment.amount} on {payment.date}"
-    payment.delete()
+    with transaction.atomic():
+        before = stats_snapshot(payment, PAYMENT_STATS_FIELDS)
+        payment.delete()
+        record_payment_change(before, None)
     messages.success(request, f'Payment {payment_name} deleted successfully.')
     return redirect('payment_list')
 
@@ -282,7 +562,10 @@ def add_payment(request):
                     payment.mpesa_status = Payment.STATUS_PENDING
                     payment.mpesa_checkout_request_id = response.get("CheckoutRequestID")
                     payment.mpesa_phone_number = formatted_phone
-                    payment.save()
+                    with transaction.atomic():
+                        payment.save()
+                        # pending until the callback settles it, so normally a no-op
+                        record_payment_change(None, stats_snapshot(payment, PAYMENT_STATS_FIELDS))
                     messages.success(
                         request,
                         "Payment saved and STK push sent. Ask the customer to enter their PIN.",
@@ -316,21 +599,29 @@ def update_student(request, idnumber):
 def start_session(request, idnumber):
     student = get_object_or_404(Student, idnumber=idnumber)
 
-    # End any existing active sessions for this student
-    UsageSession.objects.filter(
-        student=student,
-        is_active=True,
-        end_time__isnull=True
-        ).update(
-        is_active=False,
-        end_time=timezone.now()
-    )
+    now = timezone.now()
+    with transaction.atomic():
+        # End any existing active sessions for this student
+        stale = UsageSession.objects.filter(
+            student=student,
+            is_active=True,
+            end_time__isnull=True
+        )
+        closed = list(stale.select_for_update().values(*SESSION_STATS_FIELDS))
+        stale.update(
+            is_active=False,
+            end_time=now,
+            updated_at=now
+        )
+        for before in closed:
+            record_session_change(before, {**before, 'end_time': now})
 
-    # Start a new session (always triggered when link is clicked)
-    UsageSession.objects.create(
-        student=student,
-        start_time=timezone.now(),
-        is_active=True)
+        # Start a new session (always triggered when link is clicked)
+        session = UsageSession.objects.create(
+            student=student,
+            start_time=now,
+            is_active=True)
+        record_session_change(None, stats_snapshot(session, SESSION_STATS_FIELDS))
 
     # Add a small success message
     messages.success(request, f"Session started for {student.firstname} {student.lastname}.")
@@ -351,11 +642,21 @@ def end_session(request, idnumber):
     
     if session:
         if request.method == 'POST':
+            before = stats_snapshot(session, SESSION_STATS_FIELDS)
             session.end_time = timezone.now()
             session.is_active = False
             amount_due = session.total_amount()
             session.amount_charged = amount_due
-            session.save()
+            with transaction.atomic():
+                # conditional update so a double-submitted end is only counted once
+                ended = UsageSession.objects.filter(pk=session.pk, end_time__isnull=True).update(
+                    end_time=session.end_time,
+                    is_active=False,
+                    amount_charged=amount_due,
+                    updated_at=session.end_time,
+                )
+                if ended:
+                    record_session_change(before, stats_snapshot(session, SESSION_STATS_FIELDS))
             
             # Add message only for non-AJAX (AJAX uses toast)
             if not request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -376,6 +677,7 @@ def end_session(request, idnumber):
         messages.error(request, error_msg)
         return redirect('active_sessions')
 
+@conditional_page(DASHBOARD_ETAG_SECONDS)
 def active_sessions(request):
     sessions = UsageSession.objects.filter(
         is_active=True,
@@ -409,19 +711,51 @@ def summary_session(request):
 @login_required
 @require_http_methods(["POST"])
 def send_stk(request, session_id):
-    session = get_object_or_404(UsageSession, pk=session_id)
+    session = get_object_or_404(UsageSession.objects.select_related('student'), pk=session_id)
+    try:
+        stk = _session_stk_request(request, session)
+        response, formatted_phone = _send_stk_request(request=request, **stk)
+    except ValueError as exc:
+        return JsonResponse({'success': False, 'message': str(exc)}, status=400)
+    except RuntimeError as exc:
+        logger.exception("STK push error for session %s", session.id)
+        return JsonResponse({'success': False, 'message': str(exc)}, status=502)
+    return _stk_push_result(session, response, formatted_phone)
+
 
+@login_required
+@require_http_methods(["POST"])
+async def send_stk_async(request, session_id):
+    """
+    ``send_stk`` for ASGI workers: the Daraja round trips are awaited, so a
+    worker keeps serving other requests while Safaricom responds.
+    """
+    session = await aget_object_or_404(UsageSession.objects.select_related('student'), pk=session_id)
+    try:
+        stk = _session_stk_request(request, session)
+        params = _stk_push_params(request=request, **stk)
+        response = await async_client().stk_push(**params)
+    except ValueError as exc:
+        return JsonResponse({'success': False, 'message': str(exc)}, status=400)
+    except RuntimeError as exc:
+        logger.exception("STK push error for session %s", session.id)
+        return JsonResponse({'success': False, 'message': str(exc)}, status=502)
+    return await sync_to_async(_stk_push_result)(session, response, params['phone_number'])
+
+
+def _session_stk_request(request, session):
+    """
+    STK arguments for an ended session, from the posted phone number or the
+    student's. Raises ``ValueError`` for a running session or a bad payload.
+    """
     if session.is_active or session.end_time is None:
-        return JsonResponse(
-            {'success': False, 'message': 'Please end the session before sending an STK push.'},
-            status=400
-        )
+        raise ValueError('Please end the session before sending an STK push.')
 
     if request.content_type == "application/json":
         try:
             payload = json.loads(request.body or "{}")
-        except json.JSONDecodeError:
-            return JsonResponse({'success': False, 'message': 'Invalid JSON payload.'}, status=400)
+        except json.JSONDecodeError as exc:
+            raise ValueError('Invalid JSON payload.') from exc
     else:
         payload = request.POST
 
@@ -429,32 +763,34 @@ def send_stk(request, session_id):
     if not phone_input:
         phone_input = str(session.student.phonenumber or "").strip()
 
-    amount = session.amount_charged or session.total_amount()
+    return {
+        'phone_input': phone_input,
+        'amount_decimal': session.amount_charged or session.total_amount(),
+        'account_reference': f"Session-{session.id}-{session.student.idnumber}",
+        'transaction_desc': f"Session {session.id}",
+    }
 
-    try:
-        response, formatted_phone = _send_stk_request(
-            phone_input=phone_input,
-            amount_decimal=amount,
-            account_reference=f"Session-{session.id}-{session.student.idnumber}",
-            transaction_desc=f"Session {session.id}",
-            request=request,
-        )
-    except ValueError as exc:
-        return JsonResponse({'success': False, 'message': str(exc)}, status=400)
-    except RuntimeError as exc:
-        logger.exception("STK push error for session %s", session.id)
-        return JsonResponse({'success': False, 'message': str(exc)}, status=502)
 
+def _stk_push_result(session, response, formatted_phone):
+    """
+    Mark the session pending when Safaricom accepted the push, and build the
+    JSON reply either way.
+    """
     if response.get('ResponseCode') == '0':
+        before = stats_snapshot(session, SESSION_STATS_FIELDS)
         session.payment_status = 'pending'
         session.mpesa_checkout_request_id = response.get('CheckoutRequestID')
         session.mpesa_phone_number = formatted_phone
-        session.save(update_fields=[
-            'payment_status',
-            'mpesa_checkout_request_id',
-            'mpesa_phone_number',
-            'amount_charged'
-        ])
+        with transaction.atomic():
+            session.save(update_fields=[
+                'payment_status',
+                'mpesa_checkout_request_id',
+                'mpesa_phone_number',
+                'amount_charged',
+                'updated_at'
+            ])
+            # re-sending for an already paid session takes it out of total_paid
+            record_session_change(before, stats_snapshot(session, SESSION_STATS_FIELDS))
         return JsonResponse({
             'success': True,
             'message': 'STK push sent. Ask the customer to check their phone.',
@@ -468,78 +804,82 @@ def send_stk(request, session_id):
     }, status=400)
 
 
+@login_required
+@require_http_methods(["GET"])
+def stk_status(request, session_id):
+    """
+    Ask Safaricom for the state of the session's last STK push (the
+    callback remains the source of truth for recording payments).
+    """
+    session = get_object_or_404(UsageSession, pk=session_id)
+    if not session.mpesa_checkout_request_id:
+        return JsonResponse({'success': False, 'message': 'No STK push was sent for this session.'}, status=400)
+    try:
+        result = query_stk(session.mpesa_checkout_request_id)
+    except RuntimeError as exc:
+        logger.exception("STK query error for session %s", session.id)
+        return JsonResponse({'success': False, 'message': str(exc)}, status=502)
+    return JsonResponse(_stk_status_payload(session, result))
+
+
+@login_required
+@require_http_methods(["GET"])
+async def stk_status_async(request, session_id):
+    """``stk_status`` for ASGI workers."""
+    session = await aget_object_or_404(UsageSession, pk=session_id)
+    if not session.mpesa_checkout_request_id:
+        return JsonResponse({'success': False, 'message': 'No STK push was sent for this session.'}, status=400)
+    try:
+        result = await async_client().stk_query(session.mpesa_checkout_request_id)
+    except RuntimeError as exc:
+        logger.exception("STK query error for session %s", session.id)
+        return JsonResponse({'success': False, 'message': str(exc)}, status=502)
+    return JsonResponse(_stk_status_payload(session, result))
+
+
+def _stk_status_payload(session, result):
+    return {
+        'success': 'ResultCode' in result,
+        'checkout_request_id': session.mpesa_checkout_request_id,
+        'payment_status': session.payment_status,
+        'result_code': result.get('ResultCode'),
+        'message': result.get('ResultDesc') or result.get('errorMessage', 'No result yet.'),
+    }
+
+
+def _parse_callback(request):
+    try:
+        return json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        return None
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def mpesa_callback(request):
     """
     Endpoint Safaricom hits with the result of an STK push. Must be publicly reachable.
     """
-    try:
-        body = json.loads(request.body or "{}")
-    except json.JSONDecodeError:
-        return JsonResponse({'ResultCode': 1, 'ResultDesc': 'Invalid JSON'}, status=400)
+    body = _parse_callback(request)
+    if body is None:
+        return JsonResponse(CALLBACK_INVALID, status=400)
 
-    callback = body.get('Body', {}).get('stkCallback', {})
-    checkout_request_id = callback.get('CheckoutRequestID')
-    result_code = callback.get('ResultCode')
+    # Duplicate deliveries are rejected by the MpesaCallback unique index
+    # before any session or payment is read.
+    process_stk_callback(body)
 
-    session = UsageSession.objects.filter(mpesa_checkout_request_id=checkout_request_id).first()
-    payment = None
-    if not session:
-        payment = Payment.objects.filter(mpesa_checkout_request_id=checkout_request_id).first()
+    return JsonResponse(CALLBACK_ACCEPTED)
 
-    target = session or payment
-    if not target:
-        logger.warning("Received callback for unknown CheckoutRequestID %s", checkout_request_id)
-    else:
-        if result_code == 0:
-            metadata = callback.get('CallbackMetadata', {}).get('Item', [])
-            metadata_map = {item.get('Name'): item.get('Value') for item in metadata if item.get('Name')}
-
-            amount_value = metadata_map.get('Amount')
-            receipt_number = metadata_map.get('MpesaReceiptNumber')
-            phone_number = metadata_map.get('PhoneNumber')
-
-            if session:
-                session.payment_status = 'paid'
-                session.mpesa_receipt_number = receipt_number
-                if phone_number:
-                    session.mpesa_phone_number = str(phone_number)
-                if amount_value is not None:
-                    try:
-                        session.amount_charged = Decimal(str(amount_value))
-                    except Exception:
-                        pass
-                session.save(update_fields=[
-                    'payment_status',
-                    'mpesa_receipt_number',
-                    'mpesa_phone_number',
-                    'amount_charged'
-                ])
-            else:
-                payment.mpesa_status = Payment.STATUS_PAID
-                payment.mpesa_receipt_number = receipt_number
-                if phone_number:
-                    payment.mpesa_phone_number = str(phone_number)
-                payment.save(update_fields=[
-                    'mpesa_status',
-                    'mpesa_receipt_number',
-                    'mpesa_phone_number',
-                ])
-        else:
-            result_desc = callback.get('ResultDesc', 'Payment failed')
-            if session:
-                session.payment_status = 'failed'
-                session.save(update_fields=['payment_status'])
-            if payment:
-                payment.mpesa_status = Payment.STATUS_FAILED
-                payment.save(update_fields=['mpesa_status'])
-            logger.info("STK payment failed for checkout %s: %s", checkout_request_id, result_desc)
 
-    return JsonResponse({
-        'ResultCode': 0,
-        'ResultDesc': 'Accepted'
-    })
+@csrf_exempt
+@require_http_methods(["POST"])
+async def mpesa_callback_async(request):
+    """``mpesa_callback`` for ASGI workers; the transaction runs in the sync thread."""
+    body = _parse_callback(request)
+    if body is None:
+        return JsonResponse(CALLBACK_INVALID, status=400)
+    await sync_to_async(process_stk_callback)(body)
+    return JsonResponse(CALLBACK_ACCEPTED)
 
 # login function view
 def login_view(request):
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver, resolve, reverse
+
+
+logger = logging.getLogger(__name__)
+
+
+# pages whose templates are compiled before the first request
+HOT_TEMPLATES = ("home.html", "active_sessions.html", "payment_list.html")
+# a worker never waits longer than this on Daraja while booting
+TOKEN_TIMEOUT = 5
+
+
+def _check_databases():
+    # opens the psycopg pool when configured; per-thread connections come later
+    for connection in connections.all():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    return f"{len(connections.all())} alias(es)"
+
+
+def _load_urls():
+    # imports the views and compiles every pattern and the reverse lookup
+    # tables; the middleware chain is built when the application is loaded
+    get_resolver().url_patterns
+    resolve(reverse("login"))
+
+
+def _compile_templates():
+    for name in HOT_TEMPLATES:
+        get_template(name)
+
+
+def _prime_caches():
+    from .timeseries import get_series
+    from .views import DASHBOARD_TREND_DAYS
+
+    # a cold series cache makes the first dashboard wait on the computation
+    get_series("day", DASHBOARD_TREND_DAYS)
+    get_series("day")
+
+
+async def _async_token():
+    from .daraja import AsyncDarajaClient
+
+    client = AsyncDarajaClient(timeout=TOKEN_TIMEOUT)
+    try:
+        await client.access_token()
+    finally:
+        await client.aclose()
+
+
+def _fetch_token():
+    if not getattr(settings, "MPESA_CONSUMER_KEY", ""):
+        return "skipped, no credentials"
+    if settings.MPESA_ASYNC:
+        # cached for the async views in this worker's cache
+        asyncio.run(_async_token())
+        return None
+
+    # django_daraja keeps the token in the database and sets no timeout
+    from django_daraja.mpesa.utils import mpesa_access_token
+
+    failure = []
+
+    def fetch():
+        try:
+            mpesa_access_token()
+        except Exception as exc:
+            failure.append(exc)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=fetch, daemon=True)
+    thread.start()
+    thread.join(TOKEN_TIMEOUT)
+    if thread.is_alive():
+        return f"gave up after {TOKEN_TIMEOUT}s"
+    if failure:
+        raise failure[0]
+    return None
+
+
+WARM_UP_STEPS = (
+    ("database", _check_databases),
+    ("urls", _load_urls),
+    ("templates", _compile_templates),
+    ("caches", _prime_caches),
+    ("daraja token", _fetch_token),
+)
+
+
+def warm_up():
+    """
+    Do the work a freshly booted worker would otherwise leave to its first
+    requests: health-check the databases, load the URL resolver, compile
+    the hot templates, fill the dashboard series cache and fetch a Daraja
+    token.
+
+    Returns a one-line summary of each step's timing. A failing step is
+    logged and skipped, never raised.
+    """
+    timings = []
+    try:
+        for label, step in WARM_UP_STEPS:
+            started = time.perf_counter()
+            try:
+                note = step()
+            except Exception as exc:
+                logger.warning("Worker warm-up step %r failed: %s", label, exc)
+                note = f"failed: {exc}"
+            elapsed = (time.perf_counter() - started) * 1000
+            timings.append(f"{label} {elapsed:.0f} ms" + (f" ({note})" if note else ""))
+    finally:
+        # request threads open their own connections; don't hold this one
+        connections.close_all()
+    return ", ".join(timings)
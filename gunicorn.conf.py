@@ -0,0 +1,65 @@
+"""
+Gunicorn settings, read from the working directory at startup.
+
+Sizes derive from the CPUs available to the process and can be overridden
+with WEB_CONCURRENCY (workers), GUNICORN_THREADS, GUNICORN_MAX_REQUESTS and
+GUNICORN_MAX_REQUESTS_JITTER. With DATABASE_POOL, keep
+workers x DATABASE_POOL_MAX_SIZE under the database's connection limit;
+without it each thread holds its own connection.
+"""
+import multiprocessing
+import os
+
+
+MPESA_ASYNC = os.getenv("MPESA_ASYNC", "False") == "True"
+CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else multiprocessing.cpu_count()
+# every worker imports Django, numpy and the payment stack; bound memory on
+# big hosts unless WEB_CONCURRENCY asks for more
+MAX_DEFAULT_WORKERS = 8
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+if MPESA_ASYNC:
+    # one event loop per CPU keeps many Daraja calls in flight per worker
+    wsgi_app = "cyber.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    default_workers = CPUS
+else:
+    # threads let a worker keep serving while others wait on Daraja
+    wsgi_app = "cyber.wsgi:application"
+    worker_class = "gthread"
+    default_workers = CPUS * 2 + 1
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(default_workers, MAX_DEFAULT_WORKERS))))
+
+# import the project once in the master so workers share its memory
+# copy-on-write and boot in milliseconds
+preload_app = True
+
+# recycle workers to cap slow memory growth; jitter keeps them from all
+# restarting at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Daraja calls time out after 30 s; give a request that long plus margin
+timeout = 45
+graceful_timeout = 30
+keepalive = 5
+
+# heartbeat files on tmpfs so a slow disk can't get workers killed
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def post_fork(server, worker):
+    # database connections must not be shared with the master or siblings
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    from cyberapp.warmup import warm_up
+
+    worker.log.info("Worker warm-up: %s", warm_up())